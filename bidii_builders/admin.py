@@ -1,31 +1,204 @@
 # bidii_builders/admin.py
-from django.contrib import admin
+import csv
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils.functional import cached_property
 from .models import (
+    AuditLog,
+    BackfillCheckpoint,
     Customer,
+    DeletionRequest,
     Property,
     Estimate,
     Job,
     Material,
+    MaterialItem,
     JobMaterial,
     Invoice,
     Payment,
+    UnmatchedStatementLine,
 )
+from .invoicing import generate_invoices
+from .provisioning import provision_accounts
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids an exact COUNT(*) on large unfiltered tables.
+
+    Unfiltered changelists use the database's row estimate (PostgreSQL
+    statistics, or SQLite's ``sqlite_stat1`` once ANALYZE has run) when it
+    passes ``exact_count_limit``; filtered or small result sets, and tables
+    without statistics, are counted exactly.
+    """
+
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, "query", None) is None or queryset.query.where:
+            return super().count
+        estimate = self._estimated_count(queryset.model, queryset.db)
+        if estimate is None or estimate < self.exact_count_limit:
+            return super().count
+        return estimate
+
+    def _estimated_count(self, model, using):
+        connection = connections[using]
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            return row[0] if row and row[0] > 0 else None
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                    "AND name = 'sqlite_stat1'"
+                )
+                if cursor.fetchone() is None:
+                    return None
+                # The first number of an index's stat is the rows it covers
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s",
+                    [model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+        # The highest primary key overstates tables that deletion and
+        # archiving have thinned out, so other databases count exactly
+        return None
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """Changelist defaults for tables too large to count on every page view"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class OutstandingBalanceFilter(admin.SimpleListFilter):
+    title = "outstanding balance"
+    parameter_name = "outstanding"
+
+    def lookups(self, request, model_admin):
+        return [("yes", "Has outstanding balance"), ("no", "Fully paid")]
+
+    def queryset(self, request, queryset):
+        if self.value() == "yes":
+            return queryset.filter(summary__outstanding_balance__gt=0)
+        if self.value() == "no":
+            return queryset.exclude(summary__outstanding_balance__gt=0)
+        return queryset
+
+
+class OpenJobsFilter(admin.SimpleListFilter):
+    title = "open jobs"
+    parameter_name = "open_jobs"
+
+    def lookups(self, request, model_admin):
+        return [("yes", "Has open jobs"), ("no", "No open jobs")]
+
+    def queryset(self, request, queryset):
+        if self.value() == "yes":
+            return queryset.filter(summary__open_jobs__gt=0)
+        if self.value() == "no":
+            return queryset.exclude(summary__open_jobs__gt=0)
+        return queryset
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
-    list_display = ["full_name", "email", "phone", "created_at"]
+class CustomerAdmin(ScalableModelAdmin):
+    list_display = [
+        "full_name",
+        "email",
+        "phone",
+        "lifetime_revenue",
+        "outstanding_balance",
+        "open_jobs",
+        "last_activity",
+        "created_at",
+    ]
+    list_filter = [OutstandingBalanceFilter, OpenJobsFilter]
     search_fields = ["first_name", "last_name", "email"]
+    actions = ["create_portal_accounts"]
+
+    @admin.action(description="Create portal accounts")
+    def create_portal_accounts(self, request, queryset):
+        run = provision_accounts(queryset)
+        if run.skipped:
+            self.message_user(
+                request,
+                f"Skipped {len(run.skipped)} customers already linked or "
+                "without a usable email address.",
+                messages.WARNING,
+            )
+        if not run.accounts:
+            self.message_user(request, "No accounts were created.", messages.WARNING)
+            return None
+        # The links are one-time credentials, so hand them over as a download
+        # instead of showing them on the page
+        response = HttpResponse(content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="portal_accounts.csv"'
+        writer = csv.writer(response)
+        writer.writerow(["customer_id", "username", "login_url"])
+        for account in run.accounts:
+            writer.writerow(
+                [
+                    account.customer_id,
+                    account.username,
+                    request.build_absolute_uri(account.login_path),
+                ]
+            )
+        return response
+
+    def get_queryset(self, request):
+        # Summary columns come from the indexed CustomerSummary table
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                summary_revenue=F("summary__lifetime_revenue"),
+                summary_balance=F("summary__outstanding_balance"),
+                summary_open_jobs=F("summary__open_jobs"),
+                summary_activity=F("summary__last_activity"),
+            )
+        )
+
+    @admin.display(ordering="summary__lifetime_revenue", description="Revenue")
+    def lifetime_revenue(self, obj):
+        return obj.summary_revenue
+
+    @admin.display(ordering="summary__outstanding_balance", description="Outstanding")
+    def outstanding_balance(self, obj):
+        return obj.summary_balance
+
+    @admin.display(ordering="summary__open_jobs", description="Open jobs")
+    def open_jobs(self, obj):
+        return obj.summary_open_jobs
+
+    @admin.display(ordering="summary__last_activity", description="Last activity")
+    def last_activity(self, obj):
+        return obj.summary_activity
 
 
 @admin.register(Property)
-class PropertyAdmin(admin.ModelAdmin):
+class PropertyAdmin(ScalableModelAdmin):
     list_display = ["customer", "address", "property_type"]
     list_filter = ["property_type"]
+    list_select_related = ["customer"]
+    search_fields = ["address", "customer__first_name", "customer__last_name"]
+    autocomplete_fields = ["customer"]
 
 
 @admin.register(Estimate)
-class EstimateAdmin(admin.ModelAdmin):
+class EstimateAdmin(ScalableModelAdmin):
     list_display = [
         "id",
         "customer",
@@ -34,16 +207,191 @@ class EstimateAdmin(admin.ModelAdmin):
         "status",
         "estimate_date",
     ]
-    list_filter = ["status", "estimate_date"]
+    list_filter = ["status"]
+    # Property.__str__ also shows the property's customer
+    list_select_related = ["customer", "property_obj__customer"]
+    date_hierarchy = "estimate_date"
+    search_fields = ["=id", "customer__first_name", "customer__last_name"]
+    autocomplete_fields = ["customer", "property_obj"]
 
 
 @admin.register(Job)
-class JobAdmin(admin.ModelAdmin):
-    list_display = ["id", "estimate", "start_date", "status", "scheduled_date"]
-    list_filter = ["status", "start_date"]
+class JobAdmin(ScalableModelAdmin):
+    list_display = [
+        "id",
+        "estimate",
+        "start_date",
+        "status",
+        "scheduled_date",
+        "labour_cost",
+    ]
+    list_filter = ["status"]
+    list_select_related = ["estimate__customer"]
+    date_hierarchy = "start_date"
+    search_fields = [
+        "=id",
+        "estimate__customer__first_name",
+        "estimate__customer__last_name",
+    ]
+    autocomplete_fields = ["estimate"]
+    actions = ["invoice_completed_jobs"]
+
+    @admin.action(description="Invoice selected completed jobs")
+    def invoice_completed_jobs(self, request, queryset):
+        run = generate_invoices(jobs=queryset)
+        self.message_user(
+            request,
+            f"Created {len(run.created)} invoices totalling KES {run.total:,.2f}.",
+            messages.SUCCESS,
+        )
+        if run.skipped:
+            self.message_user(
+                request,
+                f"Skipped {len(run.skipped)} jobs with nothing to bill.",
+                messages.WARNING,
+            )
+
+
+@admin.register(MaterialItem)
+class MaterialItemAdmin(admin.ModelAdmin):
+    list_display = ["name", "key"]
+    search_fields = ["name", "key"]
+
+
+@admin.register(Material)
+class MaterialAdmin(ScalableModelAdmin):
+    list_display = [
+        "name",
+        "item",
+        "unit",
+        "unit_price",
+        "supplier",
+        "quantity_on_hand",
+        "quantity_reserved",
+        "reorder_level",
+        "created_at",
+    ]
+    list_select_related = ["item"]
+    search_fields = ["name", "supplier"]
+
+
+@admin.register(JobMaterial)
+class JobMaterialAdmin(ScalableModelAdmin):
+    list_display = ["id", "job", "material", "quantity", "unit_price", "total_price"]
+    list_select_related = ["job__estimate__customer", "material"]
+    search_fields = ["=job__id", "material__name"]
+    autocomplete_fields = ["job", "material"]
 
 
 @admin.register(Invoice)
-class InvoiceAdmin(admin.ModelAdmin):
+class InvoiceAdmin(ScalableModelAdmin):
     list_display = ["id", "job", "amount", "issue_date", "is_paid"]
-    list_filter = ["is_paid", "issue_date"]
+    list_filter = ["is_paid"]
+    list_select_related = ["job__estimate__customer"]
+    date_hierarchy = "issue_date"
+    search_fields = [
+        "=id",
+        "job__estimate__customer__first_name",
+        "job__estimate__customer__last_name",
+    ]
+    autocomplete_fields = ["job"]
+
+
+@admin.register(Payment)
+class PaymentAdmin(ScalableModelAdmin):
+    list_display = [
+        "id",
+        "invoice",
+        "amount",
+        "payment_method",
+        "reference_number",
+        "payment_date",
+    ]
+    list_filter = ["payment_method"]
+    list_select_related = ["invoice__job__estimate__customer"]
+    date_hierarchy = "payment_date"
+    search_fields = ["=id", "reference_number", "=invoice__id"]
+    autocomplete_fields = ["invoice"]
+
+
+@admin.register(UnmatchedStatementLine)
+class UnmatchedStatementLineAdmin(ScalableModelAdmin):
+    list_display = [
+        "transaction_id",
+        "transaction_date",
+        "amount",
+        "phone",
+        "reference",
+        "reason",
+        "resolved",
+    ]
+    list_filter = ["resolved"]
+    search_fields = ["=transaction_id", "phone", "reference"]
+    actions = ["mark_resolved"]
+
+    @admin.action(description="Mark selected lines as resolved")
+    def mark_resolved(self, request, queryset):
+        count = queryset.update(resolved=True)
+        self.message_user(request, f"Marked {count} lines as resolved.")
+
+
+@admin.register(DeletionRequest)
+class DeletionRequestAdmin(ScalableModelAdmin):
+    list_display = [
+        "description",
+        "status",
+        "rows_deleted",
+        "requested_by",
+        "created_at",
+        "finished_at",
+    ]
+    list_filter = ["status", "target"]
+    readonly_fields = [
+        "target",
+        "object_id",
+        "description",
+        "requested_by",
+        "rows_deleted",
+        "error",
+        "started_at",
+        "finished_at",
+    ]
+
+
+@admin.register(BackfillCheckpoint)
+class BackfillCheckpointAdmin(admin.ModelAdmin):
+    list_display = [
+        "name",
+        "last_pk",
+        "rows_done",
+        "started_at",
+        "updated_at",
+        "finished_at",
+    ]
+    readonly_fields = ["last_pk", "rows_done", "started_at", "finished_at"]
+
+
+@admin.register(AuditLog)
+class AuditLogAdmin(ScalableModelAdmin):
+    list_display = ["created_at", "model_name", "object_id", "action", "user"]
+    list_filter = ["action", "model_name"]
+    list_select_related = ["user"]
+    search_fields = ["=object_id"]
+    readonly_fields = [
+        "model_name",
+        "object_id",
+        "action",
+        "changes",
+        "user",
+        "created_at",
+    ]
+
+    # The trail is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BidiiBuildersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "bidii_builders"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,175 @@
+# bidii_builders/archive.py
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from django.db import router, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from .audit import AUDITED_MODELS, record_deleted
+from .dashboard import invalidate_dashboard_stats
+from .models import (
+    ArchivedInvoice,
+    ArchivedJob,
+    ArchivedJobMaterial,
+    ArchivedPayment,
+    Invoice,
+    Job,
+    JobMaterial,
+    Payment,
+)
+from .summaries import refresh_customer_summaries
+
+# Jobs closed for longer than this are moved to the archive tables
+ARCHIVE_AFTER_DAYS = 365
+
+# Jobs moved per transaction, with their material lines, invoices and payments
+ARCHIVE_CHUNK_SIZE = 500
+
+# Hot model, archive model, the job lookup and the customer lookup, in the
+# order the hot rows can be deleted without cascading
+ARCHIVE_PLAN = [
+    (
+        Payment,
+        ArchivedPayment,
+        "invoice__job_id",
+        "invoice__job__estimate__customer_id",
+    ),
+    (JobMaterial, ArchivedJobMaterial, "job_id", "job__estimate__customer_id"),
+    (Invoice, ArchivedInvoice, "job_id", "job__estimate__customer_id"),
+    (Job, ArchivedJob, "pk", "estimate__customer_id"),
+]
+
+
+@dataclass
+class ArchiveRun:
+    jobs: int = 0
+    rows: int = 0
+    elapsed: float = 0.0
+
+
+def archivable_jobs(cutoff):
+    """Closed jobs untouched since ``cutoff`` with nothing left to collect.
+
+    Cancelled jobs qualify; completed ones only once invoiced and every
+    invoice is paid, so uninvoiced work stays visible to ``generate_invoices``.
+    """
+    invoices = Invoice.objects.filter(job=OuterRef("pk"))
+    return Job.objects.alias(
+        invoiced=Exists(invoices),
+        unpaid=Exists(invoices.filter(is_paid=False)),
+    ).filter(
+        Q(status="cancelled") | Q(status="completed", invoiced=True),
+        updated_at__lt=cutoff,
+        pending_deletion=False,
+        unpaid=False,
+    )
+
+
+def _archive_copies(job_ids):
+    """(model, archive model, columns, archive rows) for each step of the plan"""
+    copies = []
+    for model, archive_model, job_lookup, customer_lookup in ARCHIVE_PLAN:
+        names = [
+            field.attname
+            for field in archive_model._meta.concrete_fields
+            if field.name not in ("customer_id", "archived_at")
+        ]
+        rows = (
+            model.objects.filter(**{f"{job_lookup}__in": job_ids})
+            .annotate(archive_customer_id=F(customer_lookup))
+            .values(*names, "archive_customer_id")
+        )
+        copies.append(
+            (
+                model,
+                archive_model,
+                names,
+                [
+                    archive_model(customer_id=row.pop("archive_customer_id"), **row)
+                    for row in rows
+                ],
+            )
+        )
+    return copies
+
+
+def _archive_chunk(job_ids, cutoff):
+    """Copy ``job_ids`` and their rows to the archive, then drop the hot rows.
+
+    Returns the jobs archived, the rows moved and the customers touched.
+    The archive is written first, with conflicts ignored, so if the hot
+    delete fails the chunk can simply be archived again. The jobs are
+    re-checked and locked, with their invoices, before the rows are read in
+    the same transaction, so nothing added meanwhile can be left behind.
+    """
+    archive_db = router.db_for_write(ArchivedJob)
+    with transaction.atomic(), transaction.atomic(using=archive_db):
+        job_ids = list(
+            archivable_jobs(cutoff)
+            .filter(pk__in=job_ids)
+            .select_for_update()
+            .values_list("pk", flat=True)
+        )
+        list(
+            Invoice.objects.select_for_update().filter(job_id__in=job_ids).values("pk")
+        )
+        copies = _archive_copies(job_ids)
+        for _, archive_model, _, objects in copies:
+            archive_model.objects.bulk_create(objects, ignore_conflicts=True)
+        for model, _, names, objects in copies:
+            # Closed and paid rows feed no signals worth keeping, and children
+            # are deleted before their parents, so nothing cascades; only the
+            # audit trail is written by hand
+            if model in AUDITED_MODELS:
+                record_deleted(
+                    [
+                        model(**{name: getattr(obj, name) for name in names})
+                        for obj in objects
+                    ]
+                )
+            model.objects.filter(pk__in=[obj.id for obj in objects])._raw_delete(
+                model.objects.db
+            )
+    customer_ids = {obj.customer_id for obj in copies[-1][3]}
+    return len(job_ids), sum(len(objects) for _, _, _, objects in copies), customer_ids
+
+
+def archive_closed_jobs(
+    cutoff=None, chunk_size=ARCHIVE_CHUNK_SIZE, dry_run=False, progress=None
+):
+    """Move archivable jobs older than ``cutoff`` into the archive tables.
+
+    Jobs are walked in primary key order ``chunk_size`` at a time, each
+    chunk in its own short transaction. ``cutoff`` defaults to
+    ``ARCHIVE_AFTER_DAYS`` ago; ``progress(run)`` is called after each chunk.
+    """
+    started = time.perf_counter()
+    cutoff = cutoff or timezone.now() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    run = ArchiveRun()
+    jobs = archivable_jobs(cutoff).order_by("pk")
+    if dry_run:
+        run.jobs = jobs.count()
+        run.elapsed = time.perf_counter() - started
+        return run
+
+    customer_ids = set()
+    last_pk = 0
+    while True:
+        job_ids = list(
+            jobs.filter(pk__gt=last_pk).values_list("pk", flat=True)[:chunk_size]
+        )
+        if not job_ids:
+            break
+        archived, rows, customers = _archive_chunk(job_ids, cutoff)
+        run.jobs += archived
+        run.rows += rows
+        customer_ids |= customers
+        last_pk = job_ids[-1]
+        if progress:
+            progress(run)
+
+    if customer_ids:
+        refresh_customer_summaries(customer_ids)
+        invalidate_dashboard_stats()
+    run.elapsed = time.perf_counter() - started
+    return run
@@ -0,0 +1,202 @@
+# bidii_builders/audit.py
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from .models import AuditLog, Estimate, Invoice, Job, Payment
+
+logger = logging.getLogger(__name__)
+
+AUDITED_MODELS = (Estimate, Job, Invoice, Payment)
+
+# Entries held in memory before they are written with one bulk_create
+AUDIT_BUFFER_SIZE = 200
+
+# ... or once the oldest buffered entry is this many seconds old
+AUDIT_FLUSH_SECONDS = 5.0
+
+# Timestamps that change on every save and say nothing about the change
+IGNORED_FIELDS = {"created_at", "updated_at"}
+
+_local = threading.local()
+
+
+def _state():
+    if not hasattr(_local, "buffer"):
+        _local.buffer = []
+        _local.started = None
+        _local.user = None
+    return _local
+
+
+@contextmanager
+def audit_user(user):
+    """Attribute the writes made inside the block to ``user``"""
+    state = _state()
+    previous, state.user = state.user, user
+    try:
+        yield
+    finally:
+        state.user = previous
+
+
+def _current_user_id():
+    user = _state().user
+    if user is not None and user.is_authenticated:
+        return user.pk
+    return None
+
+
+def audited_values(instance, loaded=None):
+    """{attname: value} of the audited columns in ``loaded``.
+
+    ``loaded`` defaults to the instance's current ``__dict__``. Deferred
+    columns are left out rather than fetched, and delta-maintained totals
+    are skipped: the instance never holds their stored values.
+    """
+    loaded = instance.__dict__ if loaded is None else loaded
+    skip = IGNORED_FIELDS.union(getattr(instance, "delta_fields", ()))
+    values = {}
+    for field in instance._meta.concrete_fields:
+        if field.primary_key or field.name in skip or field.attname not in loaded:
+            continue
+        value = loaded[field.attname]
+        try:
+            # Views assign raw form strings; compare them as stored values
+            value = field.to_python(value)
+        except ValidationError:
+            pass
+        values[field.attname] = value
+    return values
+
+
+def snapshot(instance):
+    """Remember what ``instance`` was loaded with, to diff its next save.
+
+    Runs for every audited row loaded, so it only copies the raw values;
+    they are normalized when a save actually needs the diff.
+    """
+    loaded = instance.__dict__
+    instance._audit_snapshot = {
+        field.attname: loaded[field.attname]
+        for field in instance._meta.concrete_fields
+        if field.attname in loaded
+    }
+
+
+def _initial_values(values):
+    return {name: value for name, value in values.items() if value not in (None, "")}
+
+
+def record(instance, action):
+    """Buffer an audit entry for a save or delete of ``instance``"""
+    values = audited_values(instance)
+    if action == "update":
+        previous = getattr(instance, "_audit_snapshot", None)
+        previous = audited_values(instance, previous) if previous else {}
+        changes = {
+            name: [previous[name], value]
+            for name, value in values.items()
+            if name in previous and previous[name] != value
+        }
+    elif action == "create":
+        changes = _initial_values(values)
+    else:
+        changes = values
+    if action != "delete":
+        snapshot(instance)
+    if changes:
+        record_many(instance._meta.model_name, [(instance.pk, action, changes)])
+
+
+def record_many(model_name, entries):
+    """Buffer ``(object_id, action, changes)`` entries for bulk writes.
+
+    For paths that bypass the model signals (``bulk_create``,
+    ``queryset.update()``). Entries join the buffer when the surrounding
+    transaction commits, so rolled-back writes are never logged.
+    """
+    user_id = _current_user_id()
+    now = timezone.now()
+    logs = [
+        AuditLog(
+            model_name=model_name,
+            object_id=object_id,
+            action=action,
+            changes=changes,
+            user_id=user_id,
+            created_at=now,
+        )
+        for object_id, action, changes in entries
+    ]
+    if logs:
+        transaction.on_commit(partial(_enqueue, logs))
+
+
+def snapshot_on_load(sender, instance, **kwargs):
+    snapshot(instance)
+
+
+def record_save(sender, instance, created, raw=False, **kwargs):
+    # Fixture loads are not business writes
+    if not raw:
+        record(instance, "create" if created else "update")
+
+
+def record_delete(sender, instance, **kwargs):
+    record(instance, "delete")
+
+
+def record_created(objects):
+    """Buffer "create" entries for rows inserted with ``bulk_create``"""
+    if objects:
+        record_many(
+            objects[0]._meta.model_name,
+            [
+                (obj.pk, "create", _initial_values(audited_values(obj)))
+                for obj in objects
+            ],
+        )
+
+
+def record_deleted(objects):
+    """Buffer "delete" entries for rows removed without ``Model.delete()``"""
+    if objects:
+        record_many(
+            objects[0]._meta.model_name,
+            [(obj.pk, "delete", audited_values(obj)) for obj in objects],
+        )
+
+
+def _enqueue(logs):
+    state = _state()
+    if not state.buffer:
+        state.started = time.monotonic()
+    state.buffer.extend(logs)
+    if (
+        len(state.buffer) >= AUDIT_BUFFER_SIZE
+        or time.monotonic() - state.started >= AUDIT_FLUSH_SECONDS
+    ):
+        flush()
+
+
+def flush():
+    """Write the buffered entries with one bulk_create"""
+    state = _state()
+    logs, state.buffer = state.buffer, []
+    if not logs:
+        return
+    try:
+        AuditLog.objects.bulk_create(logs, batch_size=500)
+    except DatabaseError:
+        # The trail is best effort; never fail the write being audited
+        logger.exception("Could not write %d audit log entries", len(logs))
+
+
+# Management commands and shells have no request end to flush at
+atexit.register(flush)
@@ -0,0 +1,133 @@
+# bidii_builders/backfill.py
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .models import BackfillCheckpoint
+
+# Rows visited per transaction
+BACKFILL_CHUNK_SIZE = 1000
+
+
+@dataclass
+class BackfillRun:
+    name: str = ""
+    total: int = 0
+    rows: int = 0
+    changed: int = 0
+    chunks: int = 0
+    last_pk: int = 0
+    resumed_from: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left at the rate so far, or None before the first chunk"""
+        if not self.rows_per_second:
+            return None
+        return max(self.total - self.rows, 0) / self.rows_per_second
+
+
+def format_progress(run):
+    """One status line for ``run``: rows done, rate and time left"""
+    percent = f" ({run.rows / run.total:.0%})" if run.total else ""
+    eta = "?" if run.eta is None else timedelta(seconds=round(run.eta))
+    return (
+        f"{run.name or 'backfill'}: {run.rows:,}/{run.total:,}{percent}, "
+        f"{run.rows_per_second:,.0f} rows/sec, ETA {eta}"
+    )
+
+
+def add_backfill_arguments(parser, chunk_size=BACKFILL_CHUNK_SIZE):
+    """The --chunk-size, --pause and --restart options of backfill commands"""
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=chunk_size,
+        help=f"Rows visited per transaction (default: {chunk_size})",
+    )
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=0,
+        help="Seconds to wait between chunks, to leave room for other writers",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Start from the first row instead of the last checkpoint",
+    )
+
+
+def run_backfill(
+    queryset,
+    process,
+    name=None,
+    chunk_size=BACKFILL_CHUNK_SIZE,
+    pause=0,
+    restart=False,
+    progress=None,
+    checkpoint_model=BackfillCheckpoint,
+):
+    """Call ``process(chunk)`` over ``queryset`` one primary key range at a time.
+
+    ``chunk`` is ``queryset`` narrowed to the next ``chunk_size`` rows by a
+    ``pk`` range, so each step is an index range scan, never a full table
+    rewrite. Each chunk runs in its own transaction; ``process`` may return
+    how many rows it changed. ``progress(run)`` is called after each chunk
+    and ``pause`` seconds are slept between chunks.
+
+    With a ``name``, the last primary key done is checkpointed in the same
+    transaction as the chunk, and an interrupted run resumes after it
+    unless ``restart``. Works in data migrations too: pass the historical
+    ``checkpoint_model`` from ``apps.get_model()``, and declare them
+    ``atomic = False`` so the chunks really commit separately.
+    """
+    run = BackfillRun(name=name or "")
+    checkpoint = None
+    if name:
+        checkpoint, _ = checkpoint_model.objects.get_or_create(name=name)
+        if restart or checkpoint.finished_at:
+            checkpoint.last_pk = checkpoint.rows_done = 0
+            checkpoint.started_at = timezone.now()
+            checkpoint.finished_at = None
+            checkpoint.save()
+        run.last_pk = run.resumed_from = checkpoint.last_pk
+
+    queryset = queryset.order_by("pk")
+    run.total = queryset.filter(pk__gt=run.last_pk).count()
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=run.last_pk).values_list("pk", flat=True)[
+                :chunk_size
+            ]
+        )
+        if not ids:
+            break
+        chunk = queryset.filter(pk__gt=run.last_pk, pk__lte=ids[-1])
+        with transaction.atomic(using=queryset.db):
+            run.changed += process(chunk) or 0
+            if checkpoint:
+                checkpoint.last_pk = ids[-1]
+                checkpoint.rows_done += len(ids)
+                checkpoint.save(update_fields=["last_pk", "rows_done", "updated_at"])
+        run.rows += len(ids)
+        run.chunks += 1
+        run.last_pk = ids[-1]
+        run.elapsed = time.perf_counter() - run.started
+        if progress:
+            progress(run)
+        if pause:
+            time.sleep(pause)
+
+    if checkpoint:
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save(update_fields=["finished_at", "updated_at"])
+    run.elapsed = time.perf_counter() - run.started
+    return run
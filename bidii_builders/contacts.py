@@ -0,0 +1,39 @@
+# bidii_builders/contacts.py
+import re
+
+KENYA_COUNTRY_CODE = "254"
+
+# Domains that ignore dots and "+tag" suffixes in the local part
+DOTLESS_EMAIL_DOMAINS = {"gmail.com", "googlemail.com"}
+
+
+def normalize_email(email):
+    """Comparison key for an email address: lower-cased, Gmail aliases folded"""
+    email = (email or "").strip().lower()
+    local, at, domain = email.rpartition("@")
+    if not at or not local:
+        return email
+    if domain in DOTLESS_EMAIL_DOMAINS:
+        local = local.split("+", 1)[0].replace(".", "")
+        domain = "gmail.com"
+    return f"{local}@{domain}"
+
+
+def normalize_phone(phone):
+    """Comparison key for a phone number, Kenyan numbers in 2547XXXXXXXX form.
+
+    Accepts the usual local spellings: ``0712 345 678``, ``+254 712 345678``,
+    ``00254712345678``, ``712345678`` and the newer ``011x`` numbers. Other
+    numbers are reduced to their digits; too short to mean anything is "".
+    """
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if digits.startswith(KENYA_COUNTRY_CODE + "0") and len(digits) == 13:
+        # +254 0712..., the trunk zero written after the country code
+        digits = KENYA_COUNTRY_CODE + digits[4:]
+    elif digits.startswith("0") and len(digits) == 10:
+        digits = KENYA_COUNTRY_CODE + digits[1:]
+    elif len(digits) == 9 and digits[0] in "17":
+        digits = KENYA_COUNTRY_CODE + digits
+    return digits if len(digits) >= 7 else ""
@@ -0,0 +1,55 @@
+# bidii_builders/dashboard.py
+from datetime import date
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from .models import ArchivedInvoice, ArchivedJob, Customer, Estimate, Invoice, Job
+
+DASHBOARD_STATS_CACHE_KEY = "bidii:dashboard-stats"
+# Also bounds how stale the date-based overdue count can get
+DASHBOARD_STATS_TIMEOUT = 300
+
+
+def _compute_dashboard_stats():
+    estimates = Estimate.objects.active().aggregate(
+        pending_estimates=Count("pk", filter=Q(status="pending")),
+        accepted_estimates=Count("pk", filter=Q(status="accepted")),
+    )
+    jobs = Job.objects.active().aggregate(
+        active_jobs=Count("pk", filter=Q(status="in_progress")),
+        completed_jobs=Count("pk", filter=Q(status="completed")),
+    )
+    invoices = Invoice.objects.active().aggregate(
+        total_revenue=Sum("amount", filter=Q(is_paid=True)),
+        overdue_invoices=Count(
+            "pk", filter=Q(is_paid=False, due_date__lt=date.today())
+        ),
+    )
+    # Completed work and revenue also count what has been archived
+    archived_jobs = ArchivedJob.objects.filter(status="completed").count()
+    archived_revenue = ArchivedInvoice.objects.filter(is_paid=True).aggregate(
+        total=Sum("amount")
+    )["total"]
+    zero = Decimal("0.00")
+    return {
+        "total_customers": Customer.objects.active().count(),
+        **estimates,
+        **jobs,
+        "completed_jobs": jobs["completed_jobs"] + archived_jobs,
+        "total_revenue": (invoices["total_revenue"] or zero)
+        + (archived_revenue or zero),
+        "overdue_invoices": invoices["overdue_invoices"],
+    }
+
+
+def dashboard_stats():
+    """Headline counts for the staff dashboard, cached until the next write"""
+    stats = cache.get(DASHBOARD_STATS_CACHE_KEY)
+    if stats is None:
+        stats = _compute_dashboard_stats()
+        cache.set(DASHBOARD_STATS_CACHE_KEY, stats, DASHBOARD_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats():
+    cache.delete(DASHBOARD_STATS_CACHE_KEY)
@@ -0,0 +1,264 @@
+# bidii_builders/dedup.py
+import time
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from itertools import combinations
+from django.db import router, transaction
+from django.db.models import Count, Q
+from .contacts import normalize_email, normalize_phone
+from .dashboard import invalidate_dashboard_stats
+from .middleware import invalidate_customer_cache
+from .models import (
+    ArchivedInvoice,
+    ArchivedJob,
+    ArchivedJobMaterial,
+    ArchivedPayment,
+    Customer,
+    Estimate,
+    Property,
+)
+from .summaries import refresh_customer_summaries
+
+# Pairs scoring at least this much are treated as the same customer
+DUPLICATE_THRESHOLD = 0.6
+
+# Evidence weights; names only count in proportion to how alike they are
+EMAIL_WEIGHT = 0.4
+PHONE_WEIGHT = 0.3
+NAME_WEIGHT = 0.3
+
+# Blocks bigger than this are a shared office number or placeholder address,
+# not one customer entered many times, and comparing them is quadratic
+MAX_BLOCK_SIZE = 50
+
+# Block keys whose members are fetched per query
+BLOCK_CHUNK_SIZE = 500
+
+MATCH_FIELDS = ("pk", "email_key", "phone_key", "first_name", "last_name", "user_id")
+
+
+@dataclass
+class DuplicatePair:
+    first_id: int
+    second_id: int
+    score: float
+    reasons: list
+
+
+@dataclass
+class DedupRun:
+    pairs: list = field(default_factory=list)
+    clusters: list = field(default_factory=list)
+    oversized_blocks: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+def _name(first_name, last_name):
+    return " ".join(f"{first_name} {last_name}".lower().split())
+
+
+def score_pair(a, b):
+    """(score, reasons) for two rows shaped like ``MATCH_FIELDS`` dicts"""
+    score = 0.0
+    reasons = []
+    if a["email_key"] and a["email_key"] == b["email_key"]:
+        score += EMAIL_WEIGHT
+        reasons.append("email")
+    if a["phone_key"] and a["phone_key"] == b["phone_key"]:
+        score += PHONE_WEIGHT
+        reasons.append("phone")
+    similarity = SequenceMatcher(
+        None,
+        _name(a["first_name"], a["last_name"]),
+        _name(b["first_name"], b["last_name"]),
+    ).ratio()
+    if similarity >= 0.5:
+        score += NAME_WEIGHT * similarity
+        reasons.append("name" if similarity == 1 else f"name {similarity:.0%}")
+    return round(score, 3), reasons
+
+
+def matching_customers(
+    email, phone, first_name, last_name, threshold=DUPLICATE_THRESHOLD
+):
+    """Existing customers that look like the one described, best match first.
+
+    One query on the indexed match keys, so it is cheap enough to run on
+    every create and registration.
+    """
+    candidate = {
+        "email_key": normalize_email(email),
+        "phone_key": normalize_phone(phone),
+        "first_name": first_name or "",
+        "last_name": last_name or "",
+    }
+    lookup = Q()
+    if candidate["email_key"]:
+        lookup |= Q(email_key=candidate["email_key"])
+    if candidate["phone_key"]:
+        lookup |= Q(phone_key=candidate["phone_key"])
+    if not lookup:
+        return []
+
+    matches = []
+    for customer in Customer.objects.filter(lookup)[:MAX_BLOCK_SIZE]:
+        score, _ = score_pair(
+            candidate,
+            {name: getattr(customer, name) for name in candidate},
+        )
+        if score >= threshold:
+            matches.append((score, customer))
+    matches.sort(key=lambda match: (-match[0], match[1].pk))
+    return [customer for _, customer in matches]
+
+
+def _blocks(key_field, run):
+    """Rows sharing a non-empty ``key_field`` value, one list per value.
+
+    The shared keys come from one grouped query over the index; their
+    members are then fetched ``BLOCK_CHUNK_SIZE`` keys at a time, so only
+    customers that have a potential duplicate are ever loaded.
+    """
+    sizes = (
+        Customer.objects.exclude(**{key_field: ""})
+        .order_by()
+        .values_list(key_field)
+        .annotate(size=Count("pk"))
+        .filter(size__gt=1)
+        .values_list(key_field, "size")
+    )
+    keys = []
+    for key, size in sizes:
+        if size > MAX_BLOCK_SIZE:
+            run.oversized_blocks.append((key_field, key, size))
+        else:
+            keys.append(key)
+
+    for start in range(0, len(keys), BLOCK_CHUNK_SIZE):
+        members = {}
+        for row in Customer.objects.filter(
+            **{f"{key_field}__in": keys[start : start + BLOCK_CHUNK_SIZE]}
+        ).values(*MATCH_FIELDS):
+            members.setdefault(row[key_field], []).append(row)
+        yield from members.values()
+
+
+def _cluster(pairs):
+    """Connected groups of customer ids, via union-find over the pairs"""
+    parent = {}
+
+    def find(pk):
+        parent.setdefault(pk, pk)
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    for pair in pairs:
+        parent[find(pair.second_id)] = find(pair.first_id)
+    groups = {}
+    for pk in parent:
+        groups.setdefault(find(pk), []).append(pk)
+    return sorted(sorted(group) for group in groups.values())
+
+
+def find_duplicates(threshold=DUPLICATE_THRESHOLD):
+    """Score every pair of customers that share an email or phone key.
+
+    Blocking on the normalized keys keeps this near linear in the number of
+    customers: only rows inside the same block are compared. Pairs at or
+    above ``threshold`` are returned, and grouped into ``clusters`` of
+    customer ids that should become one customer.
+    """
+    started = time.perf_counter()
+    run = DedupRun()
+    seen = set()
+    for key_field in ("email_key", "phone_key"):
+        for block in _blocks(key_field, run):
+            for a, b in combinations(sorted(block, key=lambda row: row["pk"]), 2):
+                if (a["pk"], b["pk"]) in seen:
+                    continue
+                seen.add((a["pk"], b["pk"]))
+                score, reasons = score_pair(a, b)
+                if score >= threshold:
+                    run.pairs.append(DuplicatePair(a["pk"], b["pk"], score, reasons))
+    run.clusters = _cluster(run.pairs)
+    run.elapsed = time.perf_counter() - started
+    return run
+
+
+def merge_customers(survivor, duplicates):
+    """Fold ``duplicates`` into ``survivor`` and delete them.
+
+    Properties and estimates are re-pointed with one UPDATE each; jobs,
+    invoices and payments hang off the estimates, so their history moves
+    with them. Archived rows carry their own customer_id, so each archive
+    table gets one UPDATE on the archive database as well. Blank contact details on the survivor are filled from the
+    duplicates, and a portal account moves across if the survivor has none.
+    Raises ValueError if more than one of the customers has an account.
+    """
+    duplicates = [c for c in duplicates if c.pk != survivor.pk]
+    if not duplicates:
+        return survivor
+    duplicate_ids = [c.pk for c in duplicates]
+    users = [c.user_id for c in [survivor, *duplicates] if c.user_id]
+    if len(users) > 1:
+        raise ValueError(
+            f"Customers {sorted([survivor.pk, *duplicate_ids])} have separate "
+            "portal accounts; merge them by hand."
+        )
+
+    archive_db = router.db_for_write(ArchivedJob)
+    with transaction.atomic(), transaction.atomic(using=archive_db):
+        Property.objects.filter(customer_id__in=duplicate_ids).update(customer=survivor)
+        Estimate.objects.filter(customer_id__in=duplicate_ids).update(customer=survivor)
+        for archive_model in (
+            ArchivedJob,
+            ArchivedJobMaterial,
+            ArchivedInvoice,
+            ArchivedPayment,
+        ):
+            archive_model.objects.using(archive_db).filter(
+                customer_id__in=duplicate_ids
+            ).update(customer_id=survivor.pk)
+        for duplicate in duplicates:
+            for name in ("email", "phone", "address"):
+                if not getattr(survivor, name) and getattr(duplicate, name):
+                    setattr(survivor, name, getattr(duplicate, name))
+        if users and not survivor.user_id:
+            # The account has to leave the duplicate first: it's one-to-one
+            Customer.objects.filter(pk__in=duplicate_ids).update(user=None)
+            survivor.user_id = users[0]
+        survivor.save()
+        Customer.objects.filter(pk__in=duplicate_ids).delete()
+
+    if users:
+        invalidate_customer_cache(users[0])
+    refresh_customer_summaries([survivor.pk])
+    invalidate_dashboard_stats()
+    return survivor
+
+
+def merge_clusters(clusters):
+    """Merge each cluster of customer ids into its survivor.
+
+    The survivor is the customer with a portal account, else the oldest.
+    Returns ``(merged, skipped)``: the number of customers removed, and
+    ``(cluster, reason)`` for clusters that could not be merged.
+    """
+    merged = 0
+    skipped = []
+    for cluster in clusters:
+        customers = sorted(
+            Customer.objects.filter(pk__in=cluster),
+            key=lambda c: (c.user_id is None, c.pk),
+        )
+        if len(customers) < 2:
+            continue
+        try:
+            merge_customers(customers[0], customers[1:])
+        except ValueError as e:
+            skipped.append((cluster, str(e)))
+            continue
+        merged += len(customers) - 1
+    return merged, skipped
@@ -0,0 +1,161 @@
+# bidii_builders/deletion.py
+import time
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .audit import AUDITED_MODELS, record_deleted
+from .dashboard import invalidate_dashboard_stats
+from .middleware import invalidate_customer_cache
+from .models import (
+    ArchivedInvoice,
+    ArchivedJob,
+    ArchivedJobMaterial,
+    ArchivedPayment,
+    Customer,
+    CustomerSummary,
+    DeletionRequest,
+    Estimate,
+    Invoice,
+    Job,
+    JobMaterial,
+    Payment,
+    Property,
+)
+from .stock import release_lines
+from .summaries import refresh_customer_summaries
+
+# Rows deleted per transaction, small enough to keep each write lock short
+DELETION_CHUNK_SIZE = 500
+
+
+def request_deletion(obj, user=None):
+    """Hide ``obj`` (a Customer or Job) now and queue it for deletion"""
+    target = obj._meta.model_name
+    with transaction.atomic():
+        type(obj).objects.filter(pk=obj.pk).update(pending_deletion=True)
+        deletion = DeletionRequest.objects.create(
+            target=target,
+            object_id=obj.pk,
+            description=f"{obj._meta.verbose_name} #{obj.pk} ({obj})",
+            requested_by=user,
+        )
+    if target == "customer" and obj.user_id:
+        invalidate_customer_cache(obj.user_id)
+    invalidate_dashboard_stats()
+    return deletion
+
+
+def _deletion_plan(target, object_id):
+    """(label, queryset) pairs in the order they can be deleted safely.
+
+    Children come before their parents, so no step cascades: every chunk
+    deletes exactly the rows it selected. The querysets cover the same rows
+    Django's cascade would have removed.
+    """
+    if target == "customer":
+        estimates = Estimate.objects.filter(
+            Q(customer_id=object_id) | Q(property_obj__customer_id=object_id)
+        )
+        jobs = Job.objects.filter(estimate__in=estimates)
+    else:
+        jobs = Job.objects.filter(pk=object_id)
+    plan = [
+        ("payments", Payment.objects.filter(invoice__job__in=jobs)),
+        ("material lines", JobMaterial.objects.filter(job__in=jobs)),
+        ("invoices", Invoice.objects.filter(job__in=jobs)),
+        ("jobs", jobs),
+    ]
+    if target == "customer":
+        plan += [
+            (label, model.objects.filter(customer_id=object_id))
+            for label, model in [
+                ("archived payments", ArchivedPayment),
+                ("archived material lines", ArchivedJobMaterial),
+                ("archived invoices", ArchivedInvoice),
+                ("archived jobs", ArchivedJob),
+            ]
+        ]
+        plan += [
+            ("estimates", estimates),
+            ("properties", Property.objects.filter(customer_id=object_id)),
+            ("summary", CustomerSummary.objects.filter(customer_id=object_id)),
+            ("customer", Customer.objects.filter(pk=object_id)),
+        ]
+    return plan
+
+
+def _delete_in_chunks(queryset, chunk_size, pause):
+    """Delete ``queryset`` ``chunk_size`` rows per transaction; yield counts"""
+    model = queryset.model
+    while True:
+        ids = list(queryset.order_by("pk").values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return
+        with transaction.atomic(using=queryset.db):
+            # Everything below these rows is already gone and everything
+            # derived from them is rebuilt afterwards, so the per-row signals
+            # and cascade collection of Model.delete() are skipped; material
+            # reservations aren't rebuilt, so they are released here, and
+            # the audit trail is written here too
+            if model is JobMaterial:
+                release_lines(ids)
+            if model in AUDITED_MODELS:
+                record_deleted(list(model.objects.filter(pk__in=ids)))
+            deleted = model.objects.filter(pk__in=ids)._raw_delete(queryset.db)
+        yield deleted
+        if pause:
+            time.sleep(pause)
+
+
+def process_deletion(deletion, chunk_size=DELETION_CHUNK_SIZE, pause=0, progress=None):
+    """Carry out one DeletionRequest, bottom-up in short transactions.
+
+    Progress is saved on the request after every chunk, and reported to
+    ``progress(deletion, label, deleted)`` if given. A run that fails part
+    way leaves the request ``failed``; running it again carries on.
+    """
+    customer_id = None
+    user_id = None
+    if deletion.target == "customer":
+        user_id = (
+            Customer.objects.filter(pk=deletion.object_id)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+    else:
+        customer_id = (
+            Job.objects.filter(pk=deletion.object_id)
+            .values_list("estimate__customer_id", flat=True)
+            .first()
+        )
+
+    DeletionRequest.objects.filter(pk=deletion.pk).update(
+        status="running", started_at=timezone.now(), error=""
+    )
+    try:
+        for label, queryset in _deletion_plan(deletion.target, deletion.object_id):
+            for deleted in _delete_in_chunks(queryset, chunk_size, pause):
+                deletion.rows_deleted += deleted
+                DeletionRequest.objects.filter(pk=deletion.pk).update(
+                    rows_deleted=deletion.rows_deleted
+                )
+                if progress:
+                    progress(deletion, label, deleted)
+    except Exception as e:
+        deletion.status = "failed"
+        DeletionRequest.objects.filter(pk=deletion.pk).update(
+            status="failed", error=str(e)
+        )
+        raise
+
+    deletion.status = "done"
+    deletion.finished_at = timezone.now()
+    DeletionRequest.objects.filter(pk=deletion.pk).update(
+        status="done", finished_at=deletion.finished_at
+    )
+    if user_id:
+        invalidate_customer_cache(user_id)
+    if customer_id:
+        refresh_customer_summaries([customer_id])
+    invalidate_dashboard_stats()
+    return deletion
@@ -0,0 +1,84 @@
+# bidii_builders/fields.py
+import base64
+import zlib
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+# Shorter values are stored as written: a street address or a one-line note
+# doesn't shrink, and leaving it plain keeps it readable in the database
+COMPRESS_MIN_LENGTH = 200
+
+# Stored values starting with a marker are compressed; the letter names the
+# codec. ESC never appears in text typed into a form.
+MARKER_PREFIX = "\x1b"
+ZLIB_MARKER = "\x1bz:"
+ZSTD_MARKER = "\x1bZ:"
+
+
+def _codec():
+    name = getattr(settings, "BIDII_TEXT_COMPRESSION", "zlib")
+    if name == "zstd":
+        if zstandard is None:
+            raise ImproperlyConfigured(
+                "BIDII_TEXT_COMPRESSION=zstd needs the zstandard package."
+            )
+        return ZSTD_MARKER, zstandard.ZstdCompressor(level=9).compress
+    return ZLIB_MARKER, zlib.compress
+
+
+def compress_text(value):
+    """The stored form of ``value``: itself, or a marker and compressed text.
+
+    Values are only compressed when that makes them shorter, except that
+    anything starting with the marker character is always encoded so it
+    can't be mistaken for a compressed value on the way back.
+    """
+    if not isinstance(value, str):
+        return value
+    collides = value.startswith(MARKER_PREFIX)
+    if len(value) < COMPRESS_MIN_LENGTH and not collides:
+        return value
+    marker, compress = _codec()
+    stored = marker + base64.b64encode(compress(value.encode())).decode("ascii")
+    if len(stored) >= len(value) and not collides:
+        return value
+    return stored
+
+
+def decompress_text(value):
+    """The text a stored value holds; plain values come back unchanged"""
+    if not isinstance(value, str) or not value.startswith(MARKER_PREFIX):
+        return value
+    marker, payload = value[: len(ZLIB_MARKER)], value[len(ZLIB_MARKER) :]
+    if marker == ZLIB_MARKER:
+        return zlib.decompress(base64.b64decode(payload)).decode()
+    if marker == ZSTD_MARKER:
+        if zstandard is None:
+            raise ImproperlyConfigured(
+                "Reading zstd-compressed text needs the zstandard package."
+            )
+        data = zstandard.ZstdDecompressor().decompress(base64.b64decode(payload))
+        return data.decode()
+    return value
+
+
+class CompressedTextField(models.TextField):
+    """TextField whose long values are stored compressed.
+
+    Reads always give back plain text, so forms, views and templates never
+    see the stored form. Exact lookups still work (compression is
+    deterministic), but ``contains`` and the like only match short values,
+    so don't use this for columns people search on.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        return decompress_text(value)
+
+    def get_prep_value(self, value):
+        return compress_text(super().get_prep_value(value))
@@ -0,0 +1,155 @@
+# bidii_builders/importer.py
+import csv
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from .models import Customer, Material, MaterialItem, Property, material_item_key
+
+# Rows validated, looked up and inserted per transaction
+IMPORT_BATCH_SIZE = 1000
+
+# Row errors kept for the report; later ones are counted but not stored
+MAX_REPORTED_ERRORS = 1000
+
+# Columns read from the CSV for each kind of import, validated with the model
+# field's own clean() so the rules match the rest of the app
+IMPORT_SPECS = {
+    "customers": (Customer, ["first_name", "last_name", "email", "phone", "address"]),
+    "properties": (Property, ["address", "property_type", "description"]),
+    "materials": (Material, ["name", "unit_price", "unit", "supplier"]),
+}
+
+
+@dataclass
+class ImportResult:
+    kind: str
+    rows: int = 0
+    created: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _clean_row(model, columns, row):
+    """Model instance built from one CSV row; raises ValidationError"""
+    values = {}
+    problems = []
+    for name in columns:
+        raw = (row.get(name) or "").strip()
+        try:
+            values[name] = model._meta.get_field(name).clean(raw, None)
+        except ValidationError as e:
+            problems.append(f"{name}: {' '.join(e.messages)}")
+    if problems:
+        raise ValidationError("; ".join(problems))
+    return model(**values)
+
+
+def _property_owners(rows):
+    """{(column, value): customer_id} for the customer references in a batch.
+
+    Properties name their customer by ``customer_id`` or ``customer_email``;
+    both are resolved with one query each per batch.
+    """
+    ids = set()
+    emails = set()
+    for _, row in rows:
+        customer_id = (row.get("customer_id") or "").strip()
+        if customer_id.isdigit():
+            ids.add(int(customer_id))
+        elif row.get("customer_email"):
+            emails.add(row["customer_email"].strip())
+
+    owners = {}
+    for pk in Customer.objects.filter(pk__in=ids).values_list("pk", flat=True):
+        owners["customer_id", str(pk)] = pk
+    for pk, email in (
+        Customer.objects.filter(email__in=emails)
+        .order_by("-pk")
+        .values_list("pk", "email")
+    ):
+        # Oldest customer wins when several share an email address
+        owners["customer_email", email] = pk
+    return owners
+
+
+def _import_batch(kind, rows, result, dry_run):
+    model, columns = IMPORT_SPECS[kind]
+    owners = _property_owners(rows) if kind == "properties" else None
+
+    objects = []
+    for line, row in rows:
+        try:
+            obj = _clean_row(model, columns, row)
+        except ValidationError as e:
+            result.add_error(line, " ".join(e.messages))
+            continue
+        if owners is not None:
+            customer_id = (row.get("customer_id") or "").strip()
+            if customer_id:
+                key = ("customer_id", customer_id)
+            else:
+                key = ("customer_email", (row.get("customer_email") or "").strip())
+            if key not in owners:
+                result.add_error(line, f"{key[0]}: no customer matches {key[1]!r}")
+                continue
+            obj.customer_id = owners[key]
+        if model is Customer:
+            obj.set_match_keys()
+        objects.append((line, obj))
+
+    if dry_run or not objects:
+        result.created += len(objects)
+        return
+    try:
+        with transaction.atomic():
+            if model is Material:
+                # bulk_create skips Material.save(), so the batch is grouped
+                # into items here, with two queries for all of its names
+                items = MaterialItem.objects.ids_for(obj.name for _, obj in objects)
+                for _, obj in objects:
+                    obj.item_id = items[material_item_key(obj.name)]
+            model.objects.bulk_create([obj for _, obj in objects])
+    except DatabaseError as e:
+        for line, _ in objects:
+            result.add_error(line, f"batch not saved: {e}")
+        return
+    result.created += len(objects)
+
+
+def import_csv(kind, stream, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    """Import ``stream`` (a text file of CSV with a header row) as ``kind``.
+
+    Rows are read lazily and handled ``batch_size`` at a time: each batch is
+    validated, its lookups resolved with one query, and its valid rows
+    inserted with a single ``bulk_create`` in their own transaction. Invalid
+    rows are reported by line number in the returned ``ImportResult`` and do
+    not stop the import.
+    """
+    if kind not in IMPORT_SPECS:
+        raise ValueError(f"Unknown import kind {kind!r}")
+    result = ImportResult(kind=kind)
+    started = time.perf_counter()
+
+    reader = csv.DictReader(stream)
+    rows = ((reader.line_num, row) for row in reader)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        result.rows += len(batch)
+        _import_batch(kind, batch, result, dry_run)
+
+    result.elapsed = time.perf_counter() - started
+    return result
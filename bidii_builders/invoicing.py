@@ -0,0 +1,93 @@
+# bidii_builders/invoicing.py
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F
+from .audit import record_created
+from .models import Invoice, Job
+from .summaries import refresh_customer_summaries
+
+INVOICE_DUE_DAYS = 30
+INVOICE_CHUNK_SIZE = 500
+
+
+@dataclass
+class InvoiceRun:
+    created: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def total(self):
+        return sum((invoice.amount for invoice in self.created), Decimal("0.00"))
+
+
+def uninvoiced_jobs(jobs=None):
+    """Completed jobs without an invoice, annotated with their invoice amount.
+
+    One query: the missing invoice is an anti-join and the amount is the
+    job's maintained materials_total plus labour. Jobs queued for deletion
+    are never billed.
+    """
+    jobs = Job.objects.all() if jobs is None else jobs
+    return (
+        jobs.active()
+        .filter(status="completed", invoice__isnull=True)
+        .annotate(
+            invoice_amount=F("materials_total") + F("labour_cost"),
+            customer_id=F("estimate__customer_id"),
+        )
+        .order_by("pk")
+        .values_list("pk", "customer_id", "invoice_amount")
+    )
+
+
+def generate_invoices(
+    jobs=None,
+    dry_run=False,
+    due_days=INVOICE_DUE_DAYS,
+    chunk_size=INVOICE_CHUNK_SIZE,
+):
+    """Invoice every completed, uninvoiced job in ``jobs`` (default: all jobs).
+
+    Jobs with nothing to bill are skipped. Invoices are inserted with
+    ``bulk_create`` ``chunk_size`` at a time, each chunk in its own
+    transaction; with ``dry_run`` they are built but not saved.
+    """
+    started = time.perf_counter()
+    run = InvoiceRun()
+    due_date = date.today() + timedelta(days=due_days)
+
+    pending = []
+    customer_ids = set()
+    for job_id, customer_id, amount in uninvoiced_jobs(jobs):
+        if amount <= 0:
+            run.skipped.append(job_id)
+            continue
+        pending.append(
+            Invoice(
+                job_id=job_id,
+                amount=amount,
+                due_date=due_date,
+                # bulk_create skips Invoice.save(), so open the ledger here
+                balance=amount,
+            )
+        )
+        customer_ids.add(customer_id)
+
+    if dry_run:
+        run.created = pending
+    else:
+        for start in range(0, len(pending), chunk_size):
+            with transaction.atomic():
+                created = Invoice.objects.bulk_create(
+                    pending[start : start + chunk_size]
+                )
+                record_created(created)
+            run.created += created
+        refresh_customer_summaries(customer_ids)
+
+    run.elapsed = time.perf_counter() - started
+    return run
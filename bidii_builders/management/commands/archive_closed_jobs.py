@@ -0,0 +1,45 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from bidii_builders.archive import (
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_CHUNK_SIZE,
+    archive_closed_jobs,
+)
+
+
+class Command(BaseCommand):
+    help = "Move old closed jobs, with their invoices and payments, to the archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=ARCHIVE_AFTER_DAYS,
+            help=f"Archive jobs untouched for this many days (default: {ARCHIVE_AFTER_DAYS})",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=ARCHIVE_CHUNK_SIZE,
+            help=f"Jobs moved per transaction (default: {ARCHIVE_CHUNK_SIZE})",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count the jobs that would be archived without moving them",
+        )
+
+    def handle(self, *args, **options):
+        run = archive_closed_jobs(
+            cutoff=timezone.now() - timedelta(days=options["days"]),
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+            progress=lambda run: self.stdout.write(
+                f"{run.jobs} jobs archived ({run.rows} rows)"
+            ),
+        )
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} {run.jobs} jobs in {run.elapsed:.1f}s")
+        )
@@ -0,0 +1,154 @@
+import random
+import sys
+import time
+from datetime import date
+from unittest import mock
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from bidii_builders import fields
+from bidii_builders.models import Customer, Estimate
+
+PHRASES = [
+    "Remove the old iron sheets and replace with 28 gauge pre-painted sheets.",
+    "Supply and fix new fascia boards and PVC gutters along the front elevation.",
+    "Hack the existing plaster, apply a cement-sand render and two coats of paint.",
+    "Excavate for the strip foundation to a depth of 900mm and cast blinding.",
+    "Lay 150mm hardcore, apply anti-termite treatment and a DPM before the slab.",
+    "Build the perimeter wall in machine-cut stone to ring beam level.",
+    "Install a 10,000 litre tank on a raised stand with an overflow to the soakpit.",
+    "Tile the kitchen floor and backsplash; the client supplies the tiles.",
+    "Re-wire the main house and fit a new consumer unit with RCD protection.",
+    "Allow two days for site clearance and removal of debris from the compound.",
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare database size and list query times with and without compressed text"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=5000,
+            help="Estimates to create for each run (default: 5000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Runs per query; the best time is reported",
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        # Compression off: nothing reaches the threshold
+        with mock.patch.object(fields, "COMPRESS_MIN_LENGTH", sys.maxsize):
+            results["plain"] = self._measure(options["rows"], options["repeat"])
+        results["compressed"] = self._measure(options["rows"], options["repeat"])
+
+        for label, result in results.items():
+            db_size = (
+                f"{result['db_size'] / 1024 / 1024:8.2f} MB"
+                if result["db_size"] is not None
+                else "     n/a"
+            )
+            self.stdout.write(
+                f"{label:<10} text {result['text_bytes'] / 1024 / 1024:7.2f} MB, "
+                f"database {db_size}, scan {result['scan']:6.3f}s, "
+                f"list {result['list']:6.3f}s, full load {result['load']:6.3f}s"
+            )
+        plain, compressed = results["plain"], results["compressed"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Text stored in {compressed['text_bytes'] / plain['text_bytes']:.0%} "
+                "of the space it takes uncompressed."
+            )
+        )
+
+    def _measure(self, row_count, repeat):
+        # Everything is rolled back so the benchmark leaves no rows behind
+        result = {}
+        try:
+            with transaction.atomic():
+                self._create_estimates(row_count)
+                result["text_bytes"] = self._text_bytes()
+                result["db_size"] = self._database_size()
+                # A scan reads every page of the table; the list page query
+                # leaves the text out, while a full load decodes every row
+                result["scan"] = self._best(
+                    repeat,
+                    lambda: Estimate.objects.filter(total_cost__gt=0).count(),
+                )
+                result["list"] = self._best(
+                    repeat,
+                    lambda: list(
+                        Estimate.objects.defer(
+                            "initial_outline", "detailed_estimate"
+                        ).order_by("-pk")
+                    ),
+                )
+                result["load"] = self._best(
+                    repeat, lambda: list(Estimate.objects.order_by("-pk"))
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
+        return result
+
+    def _create_estimates(self, count):
+        rng = random.Random(42)
+        customer = Customer.objects.create(
+            first_name="Benchmark",
+            last_name="Customer",
+            email="benchmark@example.com",
+            phone="0700000000",
+            address="Plot 1 Ngong Road",
+        )
+        Estimate.objects.bulk_create(
+            [
+                Estimate(
+                    customer=customer,
+                    visit_date=date.today(),
+                    initial_outline=" ".join(rng.choices(PHRASES, k=4)),
+                    detailed_estimate="\n".join(
+                        rng.choices(PHRASES, k=rng.randint(15, 40))
+                    ),
+                    total_cost=rng.randint(10000, 2000000),
+                )
+                for _ in range(count)
+            ],
+            batch_size=1000,
+        )
+
+    def _text_bytes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT SUM(LENGTH(initial_outline) + LENGTH(detailed_estimate)) "
+                f"FROM {connection.ops.quote_name(Estimate._meta.db_table)}"
+            )
+            return cursor.fetchone()[0] or 0
+
+    def _database_size(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("PRAGMA page_count")
+                pages = cursor.fetchone()[0]
+                cursor.execute("PRAGMA page_size")
+                return pages * cursor.fetchone()[0]
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT pg_database_size(current_database())")
+                return cursor.fetchone()[0]
+        return None
+
+    def _best(self, repeat, query):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,55 @@
+import io
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bidii_builders.importer import IMPORT_BATCH_SIZE, import_csv
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measure bulk CSV import throughput in rows/sec"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[10000, 50000],
+            help="Row counts to import (default: 10000 50000)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f"Rows inserted per transaction (default: {IMPORT_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        for row_count in options["rows"]:
+            stream = self._customers_csv(row_count)
+            # Everything is rolled back so the benchmark leaves no rows behind
+            try:
+                with transaction.atomic():
+                    result = import_csv(
+                        "customers", stream, batch_size=options["batch_size"]
+                    )
+                    raise _Rollback
+            except _Rollback:
+                pass
+            self.stdout.write(
+                f"customers {row_count:>7} rows: {result.elapsed:6.2f}s, "
+                f"{result.rows_per_second:8.0f} rows/sec"
+            )
+
+    def _customers_csv(self, count):
+        stream = io.StringIO()
+        stream.write("first_name,last_name,email,phone,address\n")
+        for i in range(count):
+            stream.write(
+                f"Jane{i},Wanjiku,jane{i}@example.com,07{i % 100000000:08d},"
+                f"Plot {i} Ngong Road\n"
+            )
+        stream.seek(0)
+        return stream
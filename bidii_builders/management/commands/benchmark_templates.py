@@ -0,0 +1,92 @@
+import time
+from datetime import date
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.backends.jinja2 import Jinja2
+from django.test import RequestFactory
+from bidii_builders.models import Customer, Estimate, Invoice, Job
+
+
+class Command(BaseCommand):
+    help = "Compare Django template and Jinja2 render times for the list pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[1000, 10000],
+            help="Row counts to render (default: 1000 10000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Renders per engine and row count; the best time is reported",
+        )
+
+    def handle(self, *args, **options):
+        dtl = engines["django"]
+        # Built from settings directly so the comparison works whether or not
+        # BIDII_JINJA2_TEMPLATES is enabled
+        params = dict(settings.JINJA2_TEMPLATES, NAME="jinja2-benchmark")
+        params.pop("BACKEND")
+        jinja = Jinja2(params)
+
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+
+        pages = {
+            "bidii_builders/invoices/list.html": ("invoices", self._invoices),
+            "bidii_builders/jobs/list.html": ("jobs", self._jobs),
+        }
+        for template_name, (context_name, build_rows) in pages.items():
+            for row_count in options["rows"]:
+                rows = build_rows(row_count)
+                timings = {}
+                for label, engine in (("DTL", dtl), ("Jinja2", jinja)):
+                    template = engine.get_template(template_name)
+                    best = None
+                    for _ in range(options["repeat"]):
+                        started = time.perf_counter()
+                        template.render({context_name: rows}, request)
+                        elapsed = time.perf_counter() - started
+                        best = elapsed if best is None else min(best, elapsed)
+                    timings[label] = best
+
+                self.stdout.write(
+                    f"{template_name} {row_count:>6} rows: "
+                    f"DTL {timings['DTL'] * 1000:8.1f} ms, "
+                    f"Jinja2 {timings['Jinja2'] * 1000:8.1f} ms "
+                    f"({timings['DTL'] / timings['Jinja2']:.1f}x)"
+                )
+
+    def _invoices(self, count):
+        """Unsaved invoices, so the benchmark measures rendering only"""
+        return [
+            Invoice(
+                id=i,
+                job_id=i,
+                amount=Decimal("12500.00"),
+                issue_date=date(2024, 1, 1),
+                due_date=date(2024, 2, 1),
+                is_paid=bool(i % 2),
+            )
+            for i in range(1, count + 1)
+        ]
+
+    def _jobs(self, count):
+        customer = Customer(id=1, first_name="Jane", last_name="Wanjiku")
+        return [
+            Job(
+                id=i,
+                estimate=Estimate(id=i, customer=customer),
+                start_date=date(2024, 1, 1),
+                scheduled_date=date(2024, 1, 1),
+                status="scheduled",
+            )
+            for i in range(1, count + 1)
+        ]
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from bidii_builders.dedup import DUPLICATE_THRESHOLD, find_duplicates, merge_clusters
+
+
+class Command(BaseCommand):
+    help = "Find customers entered more than once and optionally merge them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=DUPLICATE_THRESHOLD,
+            help=f"Minimum match score, 0 to 1 (default: {DUPLICATE_THRESHOLD})",
+        )
+        parser.add_argument(
+            "--merge",
+            action="store_true",
+            help="Merge each group of duplicates instead of only listing them",
+        )
+
+    def handle(self, *args, **options):
+        run = find_duplicates(threshold=options["threshold"])
+        for pair in run.pairs:
+            self.stdout.write(
+                f"Customers #{pair.first_id} and #{pair.second_id}: "
+                f"{pair.score:.2f} ({', '.join(pair.reasons)})"
+            )
+        for key_field, key, size in run.oversized_blocks:
+            self.stdout.write(f"Not compared: {size} customers share {key_field} {key}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Found {len(run.pairs)} likely duplicate pairs in "
+                f"{len(run.clusters)} groups in {run.elapsed:.2f}s"
+            )
+        )
+
+        if options["merge"]:
+            merged, skipped = merge_clusters(run.clusters)
+            for cluster, reason in skipped:
+                self.stdout.write(f"Skipped {cluster}: {reason}")
+            self.stdout.write(self.style.SUCCESS(f"Merged away {merged} customers"))
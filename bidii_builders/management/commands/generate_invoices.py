@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from bidii_builders.invoicing import (
+    INVOICE_CHUNK_SIZE,
+    INVOICE_DUE_DAYS,
+    generate_invoices,
+)
+
+
+class Command(BaseCommand):
+    help = "Invoice every completed job that doesn't have an invoice yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the invoices that would be created without saving them",
+        )
+        parser.add_argument(
+            "--due-days",
+            type=int,
+            default=INVOICE_DUE_DAYS,
+            help=f"Days until the invoices fall due (default: {INVOICE_DUE_DAYS})",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=INVOICE_CHUNK_SIZE,
+            help=f"Invoices inserted per batch (default: {INVOICE_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        run = generate_invoices(
+            dry_run=options["dry_run"],
+            due_days=options["due_days"],
+            chunk_size=options["chunk_size"],
+        )
+        for invoice in run.created:
+            self.stdout.write(f"Job #{invoice.job_id}: KES {invoice.amount:,.2f}")
+        for job_id in run.skipped:
+            self.stdout.write(f"Job #{job_id}: skipped, nothing to bill")
+
+        verb = "Would create" if options["dry_run"] else "Created"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {len(run.created)} invoices totalling "
+                f"KES {run.total:,.2f} in {run.elapsed:.2f}s"
+            )
+        )
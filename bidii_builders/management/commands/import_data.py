@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from bidii_builders.importer import IMPORT_BATCH_SIZE, IMPORT_SPECS, import_csv
+
+
+class Command(BaseCommand):
+    help = "Bulk import customers, properties or materials from a CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORT_SPECS))
+        parser.add_argument("path", help="CSV file with a header row")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f"Rows inserted per transaction (default: {IMPORT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate every row without writing anything",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            stream = open(options["path"], newline="", encoding="utf-8-sig")
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        with stream:
+            result = import_csv(
+                options["kind"],
+                stream,
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+            )
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(
+                f"... and {result.error_count - len(result.errors)} more errors"
+            )
+
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {result.created} of {result.rows} {result.kind} "
+                f"({result.error_count} errors) in {result.elapsed:.1f}s, "
+                f"{result.rows_per_second:.0f} rows/sec"
+            )
+        )
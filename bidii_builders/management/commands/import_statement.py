@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from bidii_builders.statements import (
+    DEFAULT_PAYMENT_METHOD,
+    STATEMENT_BATCH_SIZE,
+    import_statement,
+)
+
+
+class Command(BaseCommand):
+    help = "Record the payments in an M-Pesa or bank statement CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Statement CSV with a header row")
+        parser.add_argument(
+            "--method",
+            default=DEFAULT_PAYMENT_METHOD,
+            help=f"Payment method recorded (default: {DEFAULT_PAYMENT_METHOD})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=STATEMENT_BATCH_SIZE,
+            help=f"Lines inserted per transaction (default: {STATEMENT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Match every line without writing anything",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            stream = open(options["path"], newline="", encoding="utf-8-sig")
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        with stream:
+            try:
+                result = import_statement(
+                    stream,
+                    payment_method=options["method"],
+                    batch_size=options["batch_size"],
+                    dry_run=options["dry_run"],
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        verb = "Would record" if options["dry_run"] else "Recorded"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {result.matched} payments totalling KES {result.total:,.2f} "
+                f"from {result.rows} lines in {result.elapsed:.1f}s "
+                f"({result.rows_per_second:.0f} lines/sec); "
+                f"{result.unmatched} queued for review, "
+                f"{result.duplicates} already imported"
+            )
+        )
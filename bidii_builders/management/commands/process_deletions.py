@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from bidii_builders.deletion import DELETION_CHUNK_SIZE, process_deletion
+from bidii_builders.models import DeletionRequest
+
+
+class Command(BaseCommand):
+    help = "Carry out queued customer and job deletions in small chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DELETION_CHUNK_SIZE,
+            help=f"Rows deleted per transaction (default: {DELETION_CHUNK_SIZE})",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between chunks, to leave room for other writers",
+        )
+
+    def handle(self, *args, **options):
+        # Failed and interrupted runs are picked up again where they stopped
+        queued = DeletionRequest.objects.exclude(status="done").order_by("pk")
+        done = 0
+        for deletion in queued:
+            self.stdout.write(f"Deleting {deletion.description}")
+            try:
+                process_deletion(
+                    deletion,
+                    chunk_size=options["chunk_size"],
+                    pause=options["pause"],
+                    progress=self.report,
+                )
+            except Exception as e:
+                self.stderr.write(f"  failed after {deletion.rows_deleted} rows: {e}")
+                continue
+            done += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Finished {done} of {len(queued)} queued deletions")
+        )
+
+    def report(self, deletion, label, deleted):
+        self.stdout.write(f"  {deleted} {label} ({deletion.rows_deleted} rows so far)")
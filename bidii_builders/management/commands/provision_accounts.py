@@ -0,0 +1,49 @@
+import csv
+from django.core.management.base import BaseCommand
+from bidii_builders.models import Customer
+from bidii_builders.provisioning import provision_accounts
+
+
+class Command(BaseCommand):
+    help = "Create portal accounts for customers without one and print login links"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--customer",
+            type=int,
+            action="append",
+            dest="customers",
+            help="Only this customer id (repeatable; default: every unlinked customer)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Processes used to hash passwords (default: one per CPU)",
+        )
+        parser.add_argument(
+            "--base-url",
+            default="",
+            help="Prefix for the login links, e.g. https://portal.example.com",
+        )
+
+    def handle(self, *args, **options):
+        customers = Customer.objects.all()
+        if options["customers"]:
+            customers = customers.filter(pk__in=options["customers"])
+        run = provision_accounts(customers, workers=options["workers"])
+
+        base_url = options["base_url"].rstrip("/")
+        writer = csv.writer(self.stdout)
+        writer.writerow(["customer_id", "username", "login_url"])
+        for account in run.accounts:
+            writer.writerow(
+                [account.customer_id, account.username, base_url + account.login_path]
+            )
+        for customer_id, reason in run.skipped:
+            self.stderr.write(f"Customer #{customer_id}: skipped, {reason}")
+
+        self.stderr.write(
+            self.style.SUCCESS(
+                f"Created {len(run.accounts)} accounts, skipped {len(run.skipped)}"
+            )
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from bidii_builders.backfill import (
+    add_backfill_arguments,
+    format_progress,
+    run_backfill,
+)
+from bidii_builders.models import Customer
+from bidii_builders.summaries import refresh_customer_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute every CustomerSummary row from scratch"
+
+    def add_arguments(self, parser):
+        add_backfill_arguments(parser, chunk_size=500)
+
+    def handle(self, *args, **options):
+        run = run_backfill(
+            Customer.objects.all(),
+            lambda chunk: refresh_customer_summaries(
+                chunk.values_list("pk", flat=True)
+            ),
+            name="rebuild_customer_summaries",
+            chunk_size=options["chunk_size"],
+            pause=options["pause"],
+            restart=options["restart"],
+            progress=self.report,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {run.rows} customer summaries"))
+
+    def report(self, run):
+        self.stdout.write(format_progress(run))
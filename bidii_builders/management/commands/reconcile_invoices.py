@@ -0,0 +1,81 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from bidii_builders.audit import record_many
+from bidii_builders.backfill import (
+    add_backfill_arguments,
+    format_progress,
+    run_backfill,
+)
+from bidii_builders.models import Invoice, Payment, round_money
+from bidii_builders.summaries import refresh_customer_summaries
+
+
+class Command(BaseCommand):
+    help = "Repair Invoice.amount_paid and balance from the Payment rows"
+
+    def add_arguments(self, parser):
+        add_backfill_arguments(parser)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted invoices without changing them",
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options["dry_run"]
+        self.paid = round_money(
+            Coalesce(
+                Subquery(
+                    Payment.objects.filter(invoice=OuterRef("pk"))
+                    .order_by()
+                    .values("invoice")
+                    .annotate(total=Sum("amount"))
+                    .values("total")
+                ),
+                Value(Decimal("0.00")),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+        run = run_backfill(
+            Invoice.objects.all(),
+            self.repair,
+            # Dry runs change nothing, so they always look at every invoice
+            name=None if self.dry_run else "reconcile_invoices",
+            chunk_size=options["chunk_size"],
+            pause=options["pause"],
+            restart=options["restart"],
+            progress=self.report,
+        )
+
+        verb = "Found" if self.dry_run else "Repaired"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {run.rows} invoices. {verb} {run.changed} with drift."
+            )
+        )
+
+    def repair(self, chunk):
+        drifted = list(
+            chunk.annotate(actual_paid=self.paid)
+            .exclude(
+                amount_paid=F("actual_paid"),
+                balance=round_money(F("amount") - F("actual_paid")),
+            )
+            .values_list("pk", flat=True)
+        )
+        if drifted and not self.dry_run:
+            invoices = Invoice.objects.filter(pk__in=drifted)
+            invoices.update(amount_paid=self.paid)
+            invoices.update(balance=round_money(F("amount") - F("amount_paid")))
+            record_many("invoice", invoices.settle())
+            refresh_customer_summaries(
+                invoices.values_list("job__estimate__customer_id", flat=True)
+            )
+        for pk in drifted:
+            self.stdout.write(f"Invoice #{pk} had drifted")
+        return len(drifted)
+
+    def report(self, run):
+        self.stdout.write(format_progress(run))
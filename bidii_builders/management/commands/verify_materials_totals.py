@@ -0,0 +1,70 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from bidii_builders.backfill import (
+    add_backfill_arguments,
+    format_progress,
+    run_backfill,
+)
+from bidii_builders.models import Job, JobMaterial, round_money
+
+
+class Command(BaseCommand):
+    help = "Recompute Job.materials_total from the JobMaterial rows and fix drift"
+
+    def add_arguments(self, parser):
+        add_backfill_arguments(parser)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted jobs without changing them",
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options["dry_run"]
+        self.actual = round_money(
+            Coalesce(
+                Subquery(
+                    JobMaterial.objects.filter(job=OuterRef("pk"))
+                    .order_by()
+                    .values("job")
+                    .annotate(total=Sum("total_price"))
+                    .values("total")
+                ),
+                Value(Decimal("0.00")),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+        run = run_backfill(
+            Job.objects.all(),
+            self.repair,
+            # Dry runs change nothing, so they always look at every job
+            name=None if self.dry_run else "verify_materials_totals",
+            chunk_size=options["chunk_size"],
+            pause=options["pause"],
+            restart=options["restart"],
+            progress=self.report,
+        )
+
+        verb = "Found" if self.dry_run else "Repaired"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {run.rows} jobs. {verb} {run.changed} with drift."
+            )
+        )
+
+    def repair(self, chunk):
+        drifted = list(
+            chunk.annotate(actual_total=self.actual)
+            .exclude(materials_total=F("actual_total"))
+            .values_list("pk", flat=True)
+        )
+        if drifted and not self.dry_run:
+            Job.objects.filter(pk__in=drifted).update(materials_total=self.actual)
+        for pk in drifted:
+            self.stdout.write(f"Job #{pk} had drifted")
+        return len(drifted)
+
+    def report(self, run):
+        self.stdout.write(format_progress(run))
@@ -0,0 +1,272 @@
+# bidii_builders/materials.py
+from dataclasses import dataclass
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    F,
+    Max,
+    Min,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Round
+from .models import Job, JobMaterial, Material, round_money
+from .summaries import OPEN_JOB_STATUSES
+
+CENTS = Decimal("0.01")
+
+
+def cheapest_offer(field, item="item", unit="unit"):
+    """Subquery: ``field`` of the cheapest material sold as the outer row's item.
+
+    ``item`` and ``unit`` name the outer row's item and unit columns. Each
+    lookup is one seek on the (item, unit, unit_price) index.
+    """
+    return Subquery(
+        Material.objects.filter(item=OuterRef(item), unit=OuterRef(unit))
+        .order_by("unit_price", "pk")
+        .values(field)[:1]
+    )
+
+
+def with_cheapest_supplier(materials):
+    """``materials`` annotated with the cheapest price and supplier of their item"""
+    return materials.annotate(
+        cheapest_id=cheapest_offer("pk"),
+        cheapest_price=cheapest_offer("unit_price"),
+        cheapest_supplier=cheapest_offer("supplier"),
+    )
+
+
+def price_comparison():
+    """One row per item and unit: supplier count, price range and cheapest.
+
+    A single grouped query; the cheapest supplier comes from the index.
+    """
+    return (
+        Material.objects.filter(item__isnull=False)
+        .values("item", "item__name", "unit")
+        .annotate(
+            suppliers=Count("pk"),
+            lowest_price=Min("unit_price"),
+            highest_price=Max("unit_price"),
+            cheapest_supplier=cheapest_offer("supplier"),
+        )
+        .order_by("item__name", "unit")
+    )
+
+
+@dataclass
+class JobCosting:
+    lines: list
+    total: Decimal = Decimal("0.00")
+    cheapest_total: Decimal = Decimal("0.00")
+
+    @property
+    def savings(self):
+        return self.total - self.cheapest_total
+
+
+def job_costing(job):
+    """A job's material lines next to what the cheapest suppliers would charge.
+
+    Every line is priced in the same query rather than looked up one by
+    one; lines whose material has no item are costed as they are.
+    """
+    lines = list(
+        JobMaterial.objects.filter(job=job)
+        .select_related("material")
+        .annotate(
+            cheapest_price=cheapest_offer(
+                "unit_price", item="material__item", unit="material__unit"
+            ),
+            cheapest_supplier=cheapest_offer(
+                "supplier", item="material__item", unit="material__unit"
+            ),
+        )
+        .order_by("pk")
+    )
+    costing = JobCosting(lines=lines)
+    for line in lines:
+        # Lines priced below today's cheapest offer keep their own price
+        if line.cheapest_price is None or line.cheapest_price >= line.unit_price:
+            line.cheapest_price = line.unit_price
+            line.cheapest_supplier = line.material.supplier
+        costing.total += line.total_price
+        costing.cheapest_total += (line.quantity * line.cheapest_price).quantize(CENTS)
+    return costing
+
+
+def add_job_materials(job, lines):
+    """Add many ``(material_id, quantity)`` lines to ``job`` at once.
+
+    Prices come from one ``Material`` lookup for every line, totals are
+    computed in one pass, and the rows are inserted with a single
+    ``bulk_create`` in one transaction. Raises ValidationError listing every
+    bad line, in which case nothing is saved. Returns the created rows.
+    """
+    quantity_field = JobMaterial._meta.get_field("quantity")
+    parsed = []
+    errors = []
+    for number, (material_id, quantity) in enumerate(lines, start=1):
+        try:
+            material_id = int(material_id)
+            quantity = quantity_field.clean(str(quantity).strip(), None)
+        except (TypeError, ValueError, ValidationError):
+            errors.append(f"Line {number}: choose a material and a valid quantity.")
+            continue
+        if quantity <= 0:
+            errors.append(f"Line {number}: quantity must be greater than zero.")
+            continue
+        parsed.append((number, material_id, quantity))
+
+    materials = Material.objects.in_bulk({material_id for _, material_id, _ in parsed})
+    for number, material_id, _ in parsed:
+        if material_id not in materials:
+            errors.append(f"Line {number}: material {material_id} does not exist.")
+    if errors:
+        raise ValidationError(errors)
+    if not parsed:
+        raise ValidationError("Add at least one material line.")
+
+    job_materials = [
+        JobMaterial(
+            job=job,
+            material=materials[material_id],
+            quantity=quantity,
+            unit_price=materials[material_id].unit_price,
+            total_price=(quantity * materials[material_id].unit_price).quantize(CENTS),
+        )
+        for _, material_id, quantity in parsed
+    ]
+    with transaction.atomic():
+        return JobMaterial.objects.bulk_create(job_materials)
+
+
+@dataclass
+class PriceUpdate:
+    materials: int = 0
+    job_lines: int = 0
+    jobs: int = 0
+
+
+def resolve_price_rows(rows):
+    """{material_id: unit_price} from price-list rows; raises ValidationError.
+
+    Each row is a dict naming the material by ``material_id``, or by ``name``
+    and ``supplier``. Names are resolved with one query for all rows.
+    """
+    price_field = Material._meta.get_field("unit_price")
+    errors = []
+    by_id = {}
+    by_name = {}
+    for number, row in enumerate(rows, start=1):
+        try:
+            price = price_field.clean(str(row.get("unit_price", "")).strip(), None)
+        except ValidationError:
+            errors.append((number, f"Line {number}: enter a valid unit price."))
+            continue
+        if price < 0:
+            errors.append((number, f"Line {number}: unit price can't be negative."))
+            continue
+        material_id = str(row.get("material_id") or "").strip()
+        if material_id.isdigit():
+            by_id[number] = (int(material_id), price)
+        elif row.get("name") and row.get("supplier"):
+            by_name[number] = ((row["name"].strip(), row["supplier"].strip()), price)
+        else:
+            errors.append(
+                (number, f"Line {number}: give a material_id, or a name and supplier.")
+            )
+
+    known_ids = set(
+        Material.objects.filter(pk__in={pk for pk, _ in by_id.values()}).values_list(
+            "pk", flat=True
+        )
+    )
+    named = {}
+    if by_name:
+        for pk, name, supplier in Material.objects.filter(
+            name__in={key[0] for key, _ in by_name.values()},
+            supplier__in={key[1] for key, _ in by_name.values()},
+        ).values_list("pk", "name", "supplier"):
+            named.setdefault((name, supplier), pk)
+
+    prices = {}
+    for number, (pk, price) in by_id.items():
+        if pk in known_ids:
+            prices[pk] = price
+        else:
+            errors.append((number, f"Line {number}: material {pk} does not exist."))
+    for number, (key, price) in by_name.items():
+        if key in named:
+            prices[named[key]] = price
+        else:
+            errors.append(
+                (number, f"Line {number}: no material {key[0]!r} from {key[1]!r}.")
+            )
+    if errors:
+        raise ValidationError([message for _, message in sorted(errors)])
+    if not prices:
+        raise ValidationError("The price list is empty.")
+    return prices
+
+
+def update_material_prices(prices, reprice_open_jobs=False):
+    """Apply ``{material_id: unit_price}`` with set-based UPDATEs.
+
+    The catalogue is updated with a single CASE statement. With
+    ``reprice_open_jobs``, material lines on scheduled and in-progress jobs
+    take the new prices and their totals are recomputed in one UPDATE, then
+    the affected jobs' materials_total is rebuilt in another.
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    result = PriceUpdate()
+    with transaction.atomic():
+        result.materials = Material.objects.filter(pk__in=prices).update(
+            unit_price=Case(
+                *[When(pk=pk, then=Value(price)) for pk, price in prices.items()],
+                output_field=money,
+            )
+        )
+        if not reprice_open_jobs:
+            return result
+
+        lines = JobMaterial.objects.filter(
+            material_id__in=prices, job__status__in=OPEN_JOB_STATUSES
+        )
+        # Repricing leaves material_id and job status alone, so this subquery
+        # selects the same jobs after the line UPDATE as before it
+        jobs = Job.objects.filter(pk__in=lines.values("job_id"))
+        new_price = Subquery(
+            Material.objects.filter(pk=OuterRef("material_id")).values("unit_price")
+        )
+        result.job_lines = lines.update(
+            unit_price=new_price,
+            total_price=Round(F("quantity") * new_price, 2),
+        )
+        # queryset.update() bypasses the per-row delta signals, so the totals
+        # of the jobs touched are rebuilt from their lines instead
+        result.jobs = jobs.update(
+            materials_total=round_money(
+                Coalesce(
+                    Subquery(
+                        JobMaterial.objects.filter(job=OuterRef("pk"))
+                        .order_by()
+                        .values("job")
+                        .annotate(total=Sum("total_price"))
+                        .values("total")
+                    ),
+                    Value(Decimal("0.00")),
+                    output_field=money,
+                )
+            )
+        )
+    return result
@@ -0,0 +1,63 @@
+# bidii_builders/middleware.py
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from .audit import audit_user, flush as flush_audit_log
+from .models import Customer
+
+# Seconds a user's resolved customer profile is cached; signals invalidate it
+# as soon as the Customer/User link changes
+CUSTOMER_CACHE_TIMEOUT = 60
+
+# Cached in place of a customer for users without a profile
+NO_CUSTOMER = 0
+
+
+def customer_cache_key(user_id):
+    return f"bidii:customer-for-user:{user_id}"
+
+
+def invalidate_customer_cache(user_id):
+    if user_id is not None:
+        cache.delete(customer_cache_key(user_id))
+
+
+def get_customer(request):
+    """Customer linked to ``request.user`` or None, resolved once per request"""
+    if not hasattr(request, "_cached_customer"):
+        request._cached_customer = None
+        user = request.user
+        if user.is_authenticated:
+            key = customer_cache_key(user.pk)
+            customer = cache.get(key)
+            if customer is None:
+                customer = (
+                    Customer.objects.active().filter(user=user).first() or NO_CUSTOMER
+                )
+                cache.set(key, customer, CUSTOMER_CACHE_TIMEOUT)
+            request._cached_customer = customer or None
+    return request._cached_customer
+
+
+class CustomerMiddleware:
+    """Attach a lazily resolved ``request.customer`` (None if not linked)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.customer = SimpleLazyObject(lambda: get_customer(request))
+        return self.get_response(request)
+
+
+class AuditMiddleware:
+    """Attribute audited writes to the request's user; flush after each request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_user(request.user):
+            try:
+                return self.get_response(request)
+            finally:
+                flush_audit_log()
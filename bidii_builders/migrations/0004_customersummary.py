@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:02
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bidii_builders", "0003_alter_estimate_property_obj"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerSummary",
+            fields=[
+                (
+                    "customer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="bidii_builders.customer",
+                    ),
+                ),
+                (
+                    "lifetime_revenue",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                (
+                    "outstanding_balance",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                ("open_jobs", models.PositiveIntegerField(default=0)),
+                ("last_activity", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["lifetime_revenue"],
+                        name="bidii_build_lifetim_e48d10_idx",
+                    ),
+                    models.Index(
+                        fields=["outstanding_balance"],
+                        name="bidii_build_outstan_1d1427_idx",
+                    ),
+                    models.Index(
+                        fields=["open_jobs"], name="bidii_build_open_jo_a0698d_idx"
+                    ),
+                    models.Index(
+                        fields=["last_activity"], name="bidii_build_last_ac_3337e2_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bidii_builders", "0004_customersummary"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="estimate",
+            name="estimate_date",
+            field=models.DateField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="invoice",
+            name="issue_date",
+            field=models.DateField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="job",
+            name="start_date",
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="payment_date",
+            field=models.DateField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:14
+
+from datetime import date
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_balances(apps, schema_editor):
+    """Set amount_paid and balance from existing payments, set-based"""
+    Invoice = apps.get_model("bidii_builders", "Invoice")
+    Payment = apps.get_model("bidii_builders", "Payment")
+    paid = (
+        Payment.objects.filter(invoice=OuterRef("pk"))
+        .order_by()
+        .values("invoice")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    Invoice.objects.update(
+        amount_paid=Coalesce(
+            Subquery(paid), Value(Decimal("0.00")), output_field=models.DecimalField()
+        )
+    )
+    Invoice.objects.update(balance=F("amount") - F("amount_paid"))
+    # Invoices settled by several partial payments were never marked paid
+    Invoice.objects.filter(balance__lte=0, is_paid=False).update(
+        is_paid=True, paid_date=date.today()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bidii_builders", "0005_admin_date_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="invoice",
+            name="amount_paid",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), editable=False, max_digits=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="invoice",
+            name="balance",
+            field=models.DecimalField(
+                db_index=True,
+                decimal_places=2,
+                default=Decimal("0.00"),
+                editable=False,
+                max_digits=12,
+            ),
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
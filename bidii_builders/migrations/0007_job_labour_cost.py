@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:16
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bidii_builders", "0006_invoice_balance"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="labour_cost",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), max_digits=12
+            ),
+        ),
+    ]
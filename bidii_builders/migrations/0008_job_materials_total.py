@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:18
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_materials_totals(apps, schema_editor):
+    """Set materials_total from the existing JobMaterial rows, set-based"""
+    Job = apps.get_model("bidii_builders", "Job")
+    JobMaterial = apps.get_model("bidii_builders", "JobMaterial")
+    totals = (
+        JobMaterial.objects.filter(job=OuterRef("pk"))
+        .order_by()
+        .values("job")
+        .annotate(total=Sum("total_price"))
+        .values("total")
+    )
+    Job.objects.update(
+        materials_total=Coalesce(
+            Subquery(totals), Value(Decimal("0.00")), output_field=models.DecimalField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bidii_builders", "0007_job_labour_cost"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="materials_total",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), editable=False, max_digits=12
+            ),
+        ),
+        migrations.RunPython(backfill_materials_totals, migrations.RunPython.noop),
+    ]
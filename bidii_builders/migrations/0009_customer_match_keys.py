@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:29
+
+from django.db import migrations, models
+from bidii_builders.contacts import normalize_email, normalize_phone
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_match_keys(apps, schema_editor):
+    """Normalize existing contact details, a primary-key range at a time"""
+    Customer = apps.get_model("bidii_builders", "Customer")
+    last_pk = 0
+    while True:
+        chunk = list(
+            Customer.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("pk", "email", "phone")[:BACKFILL_CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        for customer in chunk:
+            customer.email_key = normalize_email(customer.email)
+            customer.phone_key = normalize_phone(customer.phone)
+        Customer.objects.bulk_update(chunk, ["email_key", "phone_key"])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bidii_builders", "0008_job_materials_total"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customer",
+            name="email_key",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=254
+            ),
+        ),
+        migrations.AddField(
+            model_name="customer",
+            name="phone_key",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=20
+            ),
+        ),
+        migrations.RunPython(backfill_match_keys, migrations.RunPython.noop),
+    ]
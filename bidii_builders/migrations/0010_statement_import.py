@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bidii_builders", "0009_customer_match_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnmatchedStatementLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("transaction_id", models.CharField(db_index=True, max_length=100)),
+                ("transaction_date", models.CharField(blank=True, max_length=50)),
+                (
+                    "amount",
+                    models.DecimalField(decimal_places=2, max_digits=12, null=True),
+                ),
+                ("phone", models.CharField(blank=True, max_length=20)),
+                ("reference", models.CharField(blank=True, max_length=100)),
+                ("reason", models.CharField(max_length=200)),
+                ("resolved", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="reference_number",
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+    ]
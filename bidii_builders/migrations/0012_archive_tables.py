@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bidii_builders", "0011_deletion_requests"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedInvoice",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("customer_id", models.BigIntegerField(db_index=True)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                ("job_id", models.BigIntegerField(db_index=True)),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("issue_date", models.DateField(db_index=True)),
+                ("due_date", models.DateField()),
+                ("paid_date", models.DateField(blank=True, null=True)),
+                ("is_paid", models.BooleanField(default=True)),
+                ("notes", models.TextField(blank=True)),
+                ("amount_paid", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("balance", models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedJob",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("customer_id", models.BigIntegerField(db_index=True)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                ("estimate_id", models.BigIntegerField()),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField(blank=True, null=True)),
+                ("scheduled_date", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("scheduled", "Scheduled"),
+                            ("in_progress", "In Progress"),
+                            ("completed", "Completed"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "actual_cost",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=12, null=True
+                    ),
+                ),
+                ("labour_cost", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "materials_total",
+                    models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                ("notes", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedJobMaterial",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("customer_id", models.BigIntegerField(db_index=True)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                ("job_id", models.BigIntegerField(db_index=True)),
+                ("material_id", models.BigIntegerField()),
+                ("quantity", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("unit_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("total_price", models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedPayment",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("customer_id", models.BigIntegerField(db_index=True)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                ("invoice_id", models.BigIntegerField(db_index=True)),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("payment_date", models.DateField()),
+                ("payment_method", models.CharField(max_length=50)),
+                (
+                    "reference_number",
+                    models.CharField(blank=True, db_index=True, max_length=100),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
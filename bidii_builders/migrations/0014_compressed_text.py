@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:48
+
+import bidii_builders.fields
+from django.db import migrations, transaction
+from bidii_builders.fields import (
+    ZLIB_MARKER,
+    ZSTD_MARKER,
+    compress_text,
+    decompress_text,
+)
+
+CONVERT_CHUNK_SIZE = 2000
+
+COMPRESSED_COLUMNS = [
+    ("customer", "address"),
+    ("estimate", "initial_outline"),
+    ("estimate", "detailed_estimate"),
+    ("job", "notes"),
+    ("property", "description"),
+]
+
+
+def _convert(apps, schema_editor, convert):
+    """Rewrite every compressed column through ``convert``, a pk range at a time.
+
+    Stored values are read and written with plain SQL so neither direction
+    depends on what the field class does to them. Each chunk commits on its
+    own, so the tables aren't write-locked for the whole rewrite.
+    """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    for model_name, column in COMPRESSED_COLUMNS:
+        table = quote(apps.get_model("bidii_builders", model_name)._meta.db_table)
+        select = (
+            f"SELECT id, {quote(column)} FROM {table} "
+            f"WHERE id > %s ORDER BY id LIMIT {CONVERT_CHUNK_SIZE}"
+        )
+        update = f"UPDATE {table} SET {quote(column)} = %s WHERE id = %s"
+        last_pk = 0
+        while True:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(select, [last_pk])
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    changed = []
+                    for pk, value in rows:
+                        stored = convert(value)
+                        if stored != value:
+                            changed.append((stored, pk))
+                    if changed:
+                        cursor.executemany(update, changed)
+            last_pk = rows[-1][0]
+
+
+def _compress_once(value):
+    # Chunks committed by an interrupted run are already compressed; leaving
+    # them alone lets the migration simply be run again
+    if isinstance(value, str) and value.startswith((ZLIB_MARKER, ZSTD_MARKER)):
+        return value
+    return compress_text(value)
+
+
+def compress_existing(apps, schema_editor):
+    _convert(apps, schema_editor, _compress_once)
+
+
+def decompress_existing(apps, schema_editor):
+    _convert(apps, schema_editor, decompress_text)
+
+
+class Migration(migrations.Migration):
+
+    # The existing text is converted a chunk per transaction
+    atomic = False
+
+    dependencies = [
+        ("bidii_builders", "0013_auditlog"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="customer",
+            name="address",
+            field=bidii_builders.fields.CompressedTextField(),
+        ),
+        migrations.AlterField(
+            model_name="estimate",
+            name="detailed_estimate",
+            field=bidii_builders.fields.CompressedTextField(),
+        ),
+        migrations.AlterField(
+            model_name="estimate",
+            name="initial_outline",
+            field=bidii_builders.fields.CompressedTextField(),
+        ),
+        migrations.AlterField(
+            model_name="job",
+            name="notes",
+            field=bidii_builders.fields.CompressedTextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name="property",
+            name="description",
+            field=bidii_builders.fields.CompressedTextField(),
+        ),
+        migrations.RunPython(compress_existing, decompress_existing),
+    ]
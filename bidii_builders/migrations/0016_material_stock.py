@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:57
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from bidii_builders.backfill import run_backfill
+
+
+def reserve_open_job_lines(apps, schema_editor):
+    """Reserve what open jobs' material lines already need.
+
+    Stock on hand is unknown until it is counted, so it starts at zero.
+    """
+    Material = apps.get_model("bidii_builders", "Material")
+    JobMaterial = apps.get_model("bidii_builders", "JobMaterial")
+    reserved = Coalesce(
+        Subquery(
+            JobMaterial.objects.filter(
+                material=OuterRef("pk"), job__status__in=["scheduled", "in_progress"]
+            )
+            .order_by()
+            .values("material")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        ),
+        Value(Decimal("0.00")),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    run_backfill(
+        Material.objects.all(),
+        lambda chunk: chunk.update(quantity_reserved=reserved),
+        name="0016_material_stock",
+        checkpoint_model=apps.get_model("bidii_builders", "BackfillCheckpoint"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    # The reservations are backfilled a chunk per transaction
+    atomic = False
+
+    dependencies = [
+        ("bidii_builders", "0015_backfill_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="material",
+            name="quantity_on_hand",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), editable=False, max_digits=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="material",
+            name="quantity_reserved",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), editable=False, max_digits=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="material",
+            name="reorder_level",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), max_digits=12
+            ),
+        ),
+        migrations.RunPython(reserve_open_job_lines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:01
+
+import re
+import django.db.models.deletion
+from django.db import migrations, models
+from bidii_builders.backfill import run_backfill
+
+
+def _item_key(name):
+    # Frozen copy of models.material_item_key
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", (name or "").lower()).split())
+
+
+def group_materials(apps, schema_editor):
+    """Create a MaterialItem per distinct name and point the materials at it"""
+    Material = apps.get_model("bidii_builders", "Material")
+    MaterialItem = apps.get_model("bidii_builders", "MaterialItem")
+
+    def assign(chunk):
+        materials = list(chunk.only("pk", "name"))
+        names = {}
+        for material in materials:
+            names.setdefault(_item_key(material.name), material.name.strip())
+        MaterialItem.objects.bulk_create(
+            [MaterialItem(key=key, name=name) for key, name in names.items()],
+            ignore_conflicts=True,
+        )
+        ids = dict(MaterialItem.objects.filter(key__in=names).values_list("key", "pk"))
+        for material in materials:
+            material.item_id = ids[_item_key(material.name)]
+        Material.objects.bulk_update(materials, ["item"])
+        return len(materials)
+
+    run_backfill(
+        Material.objects.all(),
+        assign,
+        name="0017_material_items",
+        checkpoint_model=apps.get_model("bidii_builders", "BackfillCheckpoint"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    # The materials are grouped a chunk per transaction
+    atomic = False
+
+    dependencies = [
+        ("bidii_builders", "0016_material_stock"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaterialItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("key", models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="material",
+            name="item",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="bidii_builders.materialitem",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="material",
+            index=models.Index(
+                fields=["item", "unit", "unit_price"], name="material_item_price_idx"
+            ),
+        ),
+        migrations.RunPython(group_materials, migrations.RunPython.noop),
+    ]
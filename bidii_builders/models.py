@@ -1,8 +1,261 @@
 # bidii_builders/models.py
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Round
+from django.utils import timezone
 from django.core.validators import MinValueValidator
+from collections import defaultdict
+from datetime import date
 from decimal import Decimal
+import re
 from django.contrib.auth.models import User
+from .contacts import normalize_email, normalize_phone
+from .fields import CompressedTextField
+
+
+def round_money(expression):
+    """``expression`` rounded to whole cents.
+
+    SQLite stores decimals as REAL, so amounts added up or subtracted in
+    the database (F() deltas, Sum()) pick up float leftovers such as
+    4.44e-16 that would keep an invoice from ever settling.
+    """
+    return Round(
+        expression, 2, output_field=models.DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+class CustomerOwnedQuerySet(models.QuerySet):
+    """QuerySet for models that belong to a customer.
+
+    ``owner_lookup`` is the path from the model to ``Customer.user``, so the
+    ownership check becomes a join in the same query as the object lookup.
+    """
+
+    owner_lookup = None
+    # Paths to the pending_deletion flags that hide a row while its customer
+    # or job waits for ``process_deletions``
+    deletion_lookups = ()
+
+    def active(self):
+        """Rows not queued for deletion along with their customer or job"""
+        return self.filter(**{lookup: False for lookup in self.deletion_lookups})
+
+    def owned_by(self, user):
+        """Rows belonging to the customer linked to ``user``"""
+        if not user.is_authenticated:
+            return self.none()
+        return self.filter(**{self.owner_lookup: user})
+
+    def for_user(self, user):
+        """Rows ``user`` may view: everything for staff, otherwise their own"""
+        if user.is_authenticated and user.is_staff:
+            return self
+        return self.owned_by(user)
+
+
+class DeltaFieldsModel(models.Model):
+    """Model with columns kept up to date only by F() delta updates.
+
+    Saving an existing row never writes ``delta_fields``, so an instance
+    loaded before a concurrent update can't put back the old totals.
+    """
+
+    delta_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.delta_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomerQuerySet(models.QuerySet):
+    def active(self):
+        """Customers not waiting for ``process_deletions`` to remove them"""
+        return self.filter(pending_deletion=False)
+
+    def delete(self):
+        from .summaries import customers_deleting
+
+        with customers_deleting(self.values_list("pk", flat=True)):
+            return super().delete()
+
+
+class PropertyQuerySet(CustomerOwnedQuerySet):
+    owner_lookup = "customer__user"
+    deletion_lookups = ("customer__pending_deletion",)
+
+
+class EstimateQuerySet(CustomerOwnedQuerySet):
+    owner_lookup = "customer__user"
+    deletion_lookups = ("customer__pending_deletion",)
+
+
+class JobQuerySet(CustomerOwnedQuerySet):
+    owner_lookup = "estimate__customer__user"
+    deletion_lookups = ("pending_deletion", "estimate__customer__pending_deletion")
+
+    def add_materials_cost(self, delta):
+        """Add ``delta`` to these jobs' materials_total in one UPDATE"""
+        return self.update(
+            materials_total=round_money(models.F("materials_total") + delta)
+        )
+
+
+# What each unit on a job's material line does to its material's
+# (on hand, reserved) while the job is in a status: open jobs hold a
+# reservation, completed jobs have used the stock up
+STOCK_EFFECTS = {
+    "scheduled": (0, 1),
+    "in_progress": (0, 1),
+    "completed": (-1, 0),
+    "cancelled": (0, 0),
+}
+
+
+def stock_deltas(lines):
+    """{material_id: (on_hand, reserved)} for ``(material_id, quantity, status)``.
+
+    ``status`` is the status of the line's job; a negative quantity takes
+    a line's effect back off.
+    """
+    deltas = defaultdict(lambda: (Decimal("0.00"), Decimal("0.00")))
+    for material_id, quantity, status in lines:
+        on_hand, reserved = STOCK_EFFECTS.get(status, (0, 0))
+        quantity = Decimal(quantity)
+        total = deltas[material_id]
+        deltas[material_id] = (
+            total[0] + on_hand * quantity,
+            total[1] + reserved * quantity,
+        )
+    return dict(deltas)
+
+
+class MaterialQuerySet(models.QuerySet):
+    def adjust_stock(self, deltas):
+        """Apply ``{material_id: (on_hand, reserved)}`` deltas in one UPDATE.
+
+        F() expressions, so concurrent adjustments to the same material add
+        up instead of overwriting each other.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return 0
+        quantity = models.DecimalField(max_digits=12, decimal_places=2)
+        on_hand, reserved = (
+            models.Case(
+                *[
+                    models.When(pk=pk, then=models.Value(delta[i]))
+                    for pk, delta in deltas.items()
+                ],
+                default=models.Value(Decimal("0.00")),
+                output_field=quantity,
+            )
+            for i in (0, 1)
+        )
+        return self.filter(pk__in=deltas).update(
+            quantity_on_hand=models.F("quantity_on_hand") + on_hand,
+            quantity_reserved=models.F("quantity_reserved") + reserved,
+        )
+
+
+class JobMaterialQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """bulk_create that also adds the new lines to their jobs' totals
+        and to their materials' stock figures"""
+        objs = super().bulk_create(objs, *args, **kwargs)
+        totals = defaultdict(Decimal)
+        for obj in objs:
+            totals[obj.job_id] += Decimal(obj.total_price)
+        for job_id, total in totals.items():
+            Job.objects.filter(pk=job_id).add_materials_cost(total)
+        statuses = dict(Job.objects.filter(pk__in=totals).values_list("pk", "status"))
+        Material.objects.adjust_stock(
+            stock_deltas(
+                (obj.material_id, obj.quantity, statuses.get(obj.job_id))
+                for obj in objs
+            )
+        )
+        return objs
+
+
+class InvoiceQuerySet(CustomerOwnedQuerySet):
+    owner_lookup = "job__estimate__customer__user"
+    deletion_lookups = (
+        "job__pending_deletion",
+        "job__estimate__customer__pending_deletion",
+    )
+
+    def apply_payment(self, delta):
+        """Post ``delta`` against these invoices' amount_paid and balance.
+
+        A single UPDATE with F() expressions, so concurrent postings to the
+        same invoice add up instead of overwriting each other.
+        """
+        self.update(
+            amount_paid=round_money(models.F("amount_paid") + delta),
+            balance=round_money(models.F("balance") - delta),
+        )
+        return self.settle()
+
+    def apply_payments(self, deltas):
+        """Post ``{invoice_id: delta}`` in one UPDATE, then settle them"""
+        if not deltas:
+            return []
+        posted = models.Case(
+            *[models.When(pk=pk, then=models.Value(d)) for pk, d in deltas.items()],
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+        invoices = self.filter(pk__in=deltas)
+        invoices.update(
+            amount_paid=round_money(models.F("amount_paid") + posted),
+            balance=round_money(models.F("balance") - posted),
+        )
+        return invoices.settle()
+
+    def settle(self):
+        """Mark paid the invoices whose balance reached zero; reopen the rest.
+
+        Returns ``(object_id, "update", changes)`` entries for
+        ``audit.record_many``, since these UPDATEs send no signals.
+        """
+        paid = self.filter(balance__lte=0, is_paid=False)
+        reopened = self.filter(balance__gt=0, is_paid=True)
+        flipped = list(
+            (paid | reopened).values_list("pk", "is_paid", "paid_date").order_by()
+        )
+        if not flipped:
+            return []
+        today = date.today()
+        ids = [pk for pk, _, _ in flipped]
+        paid.filter(pk__in=ids).update(is_paid=True, paid_date=today)
+        reopened.filter(pk__in=ids).update(is_paid=False, paid_date=None)
+        return [
+            (
+                pk,
+                "update",
+                {
+                    "is_paid": [was_paid, not was_paid],
+                    "paid_date": [paid_date, None if was_paid else today],
+                },
+            )
+            for pk, was_paid, paid_date in flipped
+        ]
+
+
+class PaymentQuerySet(CustomerOwnedQuerySet):
+    owner_lookup = "invoice__job__estimate__customer__user"
+    deletion_lookups = (
+        "invoice__job__pending_deletion",
+        "invoice__job__estimate__customer__pending_deletion",
+    )
 
 
 class Customer(models.Model):
@@ -11,13 +264,42 @@ class Customer(models.Model):
     last_name = models.CharField(max_length=100)
     email = models.EmailField()
     phone = models.CharField(max_length=20)
-    address = models.TextField()
+    address = CompressedTextField()
+    # Normalized contact details, indexed so duplicate checks are key lookups
+    email_key = models.CharField(
+        max_length=254, blank=True, db_index=True, editable=False
+    )
+    phone_key = models.CharField(
+        max_length=20, blank=True, db_index=True, editable=False
+    )
+    # Set when a deletion is queued; such customers are hidden from the app
+    pending_deletion = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CustomerQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    def set_match_keys(self):
+        """Fill email_key and phone_key; bulk_create callers must call this"""
+        self.email_key = normalize_email(self.email)
+        self.phone_key = normalize_phone(self.phone)
+
+    def save(self, *args, **kwargs):
+        self.set_match_keys()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"email", "phone"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "email_key", "phone_key"}
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        from .summaries import customers_deleting
+
+        with customers_deleting([self.pk]):
+            return super().delete(*args, **kwargs)
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -27,9 +309,11 @@ class Property(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     address = models.TextField()
     property_type = models.CharField(max_length=100)
-    description = models.TextField()
+    description = CompressedTextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = PropertyQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.customer.full_name} - {self.address[:50]}"
 
@@ -49,25 +333,27 @@ class Estimate(models.Model):
         Property, on_delete=models.CASCADE, null=True, blank=True
     )  # Make nullable
     visit_date = models.DateField()
-    initial_outline = models.TextField()
-    detailed_estimate = models.TextField()
+    initial_outline = CompressedTextField()
+    detailed_estimate = CompressedTextField()
     total_cost = models.DecimalField(
         max_digits=12, decimal_places=2, default=Decimal("0.00")
     )
     status = models.CharField(
         max_length=20, choices=ESTIMATE_STATUS_CHOICES, default="pending"
     )
-    estimate_date = models.DateField(auto_now_add=True)
+    estimate_date = models.DateField(auto_now_add=True, db_index=True)
     sent_date = models.DateField(null=True, blank=True)
     accepted_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = EstimateQuerySet.as_manager()
+
     def __str__(self):
         return f"Estimate #{self.id} - {self.customer.full_name}"
 
 
-class Job(models.Model):
+class Job(DeltaFieldsModel):
     JOB_STATUS_CHOICES = [
         ("scheduled", "Scheduled"),
         ("in_progress", "In Progress"),
@@ -76,7 +362,7 @@ class Job(models.Model):
     ]
 
     estimate = models.ForeignKey(Estimate, on_delete=models.CASCADE)
-    start_date = models.DateField()
+    start_date = models.DateField(db_index=True)
     end_date = models.DateField(null=True, blank=True)
     scheduled_date = models.DateField()
     status = models.CharField(
@@ -85,24 +371,132 @@ class Job(models.Model):
     actual_cost = models.DecimalField(
         max_digits=12, decimal_places=2, null=True, blank=True
     )
-    notes = models.TextField(blank=True)
+    labour_cost = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    # Sum of the job's JobMaterial.total_price, maintained by the JobMaterial
+    # signals; repair with ``verify_materials_totals``
+    materials_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"), editable=False
+    )
+    notes = CompressedTextField(blank=True)
+    pending_deletion = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = JobQuerySet.as_manager()
+
+    delta_fields = ("materials_total",)
+
     def __str__(self):
         return f"Job #{self.id} - {self.estimate.customer.full_name}"
 
 
-class Material(models.Model):
+def material_item_key(name):
+    """Grouping key for a material name: lower-case words, punctuation dropped.
+
+    "Cement (50kg)" and "CEMENT 50kg" share the key "cement 50kg"; spellings
+    that differ in more than that, like "50 kg", are separate items.
+    """
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", (name or "").lower()).split())
+
+
+class MaterialItemQuerySet(models.QuerySet):
+    def ids_for(self, names):
+        """{key: item id} for material ``names``, creating the missing items.
+
+        At most three queries however many names: one lookup, then one
+        insert of the new keys and a second lookup for their ids.
+        """
+        wanted = {}
+        for name in names:
+            wanted.setdefault(material_item_key(name), name.strip())
+        ids = dict(self.filter(key__in=wanted).values_list("key", "pk"))
+        missing = [key for key in wanted if key not in ids]
+        if missing:
+            self.bulk_create(
+                [MaterialItem(key=key, name=wanted[key]) for key in missing],
+                ignore_conflicts=True,
+            )
+            ids.update(self.filter(key__in=missing).values_list("key", "pk"))
+        return ids
+
+
+class MaterialItem(models.Model):
+    """One product, whichever supplier sells it; groups Material rows"""
+
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)
+
+    objects = MaterialItemQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+
+class Material(DeltaFieldsModel):
     name = models.CharField(max_length=100)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     unit = models.CharField(max_length=20)
     supplier = models.CharField(max_length=100)
+    # Set from the name on save; the (item, unit, unit_price) index below
+    # covers lookups by item, so the foreign key gets no index of its own
+    item = models.ForeignKey(
+        MaterialItem,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+    )
+    # Maintained by F() updates from the stock signals and bulk paths
+    quantity_on_hand = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"), editable=False
+    )
+    quantity_reserved = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"), editable=False
+    )
+    reorder_level = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = MaterialQuerySet.as_manager()
+
+    delta_fields = ("quantity_on_hand", "quantity_reserved")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["item", "unit", "unit_price"], name="material_item_price_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.unit})"
 
+    def set_item(self):
+        """Point ``item`` at this name's MaterialItem, creating it if new.
+
+        bulk_create callers should set ``item_id`` from
+        ``MaterialItem.objects.ids_for()`` for the whole batch instead.
+        """
+        key = material_item_key(self.name)
+        self.item_id = MaterialItem.objects.ids_for([self.name])[key]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "name" in update_fields:
+            self.set_item()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "item"}
+        super().save(*args, **kwargs)
+
+    @property
+    def quantity_available(self):
+        """Stock on hand that no open job has reserved; negative when short"""
+        return self.quantity_on_hand - self.quantity_reserved
+
 
 class JobMaterial(models.Model):
     job = models.ForeignKey(Job, on_delete=models.CASCADE)
@@ -111,19 +505,42 @@ class JobMaterial(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=12, decimal_places=2)
 
+    objects = JobMaterialQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         self.total_price = self.quantity * self.unit_price
         super().save(*args, **kwargs)
 
 
-class Invoice(models.Model):
+class Invoice(DeltaFieldsModel):
     job = models.ForeignKey(Job, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
-    issue_date = models.DateField(auto_now_add=True)
+    issue_date = models.DateField(auto_now_add=True, db_index=True)
     due_date = models.DateField()
     paid_date = models.DateField(null=True, blank=True)
     is_paid = models.BooleanField(default=False)
     notes = models.TextField(blank=True)
+    # Maintained by the Payment signals; repair with ``reconcile_invoices``
+    amount_paid = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"), editable=False
+    )
+    balance = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        editable=False,
+        db_index=True,
+    )
+
+    objects = InvoiceQuerySet.as_manager()
+
+    delta_fields = ("amount_paid", "balance")
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            amount = self._meta.get_field("amount").to_python(self.amount)
+            self.balance = amount - self.amount_paid
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Invoice #{self.id} - {self.job.estimate.customer.full_name}"
@@ -132,9 +549,206 @@ class Invoice(models.Model):
 class Payment(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
-    payment_date = models.DateField(auto_now_add=True)
+    payment_date = models.DateField(auto_now_add=True, db_index=True)
     payment_method = models.CharField(max_length=50)
-    reference_number = models.CharField(max_length=100, blank=True)
+    reference_number = models.CharField(max_length=100, blank=True, db_index=True)
+
+    objects = PaymentQuerySet.as_manager()
 
     def __str__(self):
         return f"Payment for Invoice #{self.invoice.id}"
+
+
+class CustomerSummary(models.Model):
+    """Per-customer totals used to sort and filter customer lists.
+
+    Kept up to date by signals on Estimate, Job, Invoice and Payment; rebuild
+    from scratch with ``manage.py rebuild_customer_summaries``.
+    """
+
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name="summary"
+    )
+    lifetime_revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+    outstanding_balance = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+    open_jobs = models.PositiveIntegerField(default=0)
+    last_activity = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["lifetime_revenue"]),
+            models.Index(fields=["outstanding_balance"]),
+            models.Index(fields=["open_jobs"]),
+            models.Index(fields=["last_activity"]),
+        ]
+
+    def __str__(self):
+        return f"Summary for customer #{self.customer_id}"
+
+
+class UnmatchedStatementLine(models.Model):
+    """Statement line that ``import_statement`` couldn't tie to an invoice.
+
+    Kept for staff to review and record by hand as a payment.
+    """
+
+    transaction_id = models.CharField(max_length=100, db_index=True)
+    transaction_date = models.CharField(max_length=50, blank=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    phone = models.CharField(max_length=20, blank=True)
+    reference = models.CharField(max_length=100, blank=True)
+    reason = models.CharField(max_length=200)
+    resolved = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Statement line {self.transaction_id}"
+
+
+class DeletionRequest(models.Model):
+    """A customer or job queued for chunked deletion by ``process_deletions``"""
+
+    TARGET_CHOICES = [
+        ("customer", "Customer"),
+        ("job", "Job"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    object_id = models.PositiveIntegerField()
+    description = models.CharField(max_length=200)
+    requested_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending", db_index=True
+    )
+    rows_deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Delete {self.description}"
+
+
+class BackfillCheckpoint(models.Model):
+    """How far a named backfill has got, so an interrupted run can resume"""
+
+    name = models.CharField(max_length=100, unique=True)
+    last_pk = models.BigIntegerField(default=0)
+    rows_done = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ArchiveModel(models.Model):
+    """Closed rows moved out of the hot tables by ``archive_closed_jobs``.
+
+    Archive tables keep the original primary keys and plain ids instead of
+    foreign keys, so they can live in a separate database (see
+    ``bidii_builders.routers``). ``customer_id`` is copied onto every row so
+    reports can group by customer without joining back to the hot tables.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    customer_id = models.BigIntegerField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+
+class ArchivedJob(ArchiveModel):
+    estimate_id = models.BigIntegerField()
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    scheduled_date = models.DateField()
+    status = models.CharField(max_length=20, choices=Job.JOB_STATUS_CHOICES)
+    actual_cost = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True
+    )
+    labour_cost = models.DecimalField(max_digits=12, decimal_places=2)
+    materials_total = models.DecimalField(max_digits=12, decimal_places=2)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived job #{self.id}"
+
+
+class ArchivedJobMaterial(ArchiveModel):
+    job_id = models.BigIntegerField(db_index=True)
+    material_id = models.BigIntegerField()
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+class ArchivedInvoice(ArchiveModel):
+    job_id = models.BigIntegerField(db_index=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    issue_date = models.DateField(db_index=True)
+    due_date = models.DateField()
+    paid_date = models.DateField(null=True, blank=True)
+    is_paid = models.BooleanField(default=True)
+    notes = models.TextField(blank=True)
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2)
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def __str__(self):
+        return f"Archived invoice #{self.id}"
+
+
+class ArchivedPayment(ArchiveModel):
+    invoice_id = models.BigIntegerField(db_index=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    payment_date = models.DateField()
+    payment_method = models.CharField(max_length=50)
+    reference_number = models.CharField(max_length=100, blank=True, db_index=True)
+
+
+class AuditLog(models.Model):
+    """One create, update or delete of an audited model; append-only.
+
+    ``changes`` holds ``{field: [old, new]}`` for updates and ``{field: value}``
+    for creates and deletes. Rows are written in batches by
+    ``bidii_builders.audit``.
+    """
+
+    ACTION_CHOICES = [
+        ("create", "Create"),
+        ("update", "Update"),
+        ("delete", "Delete"),
+    ]
+
+    model_name = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    changes = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["model_name", "object_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model_name} #{self.object_id}"
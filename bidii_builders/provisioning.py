@@ -0,0 +1,138 @@
+# bidii_builders/provisioning.py
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from .middleware import customer_cache_key
+from .models import Customer
+
+# Below this many accounts the pool's start-up cost outweighs the hashing
+PARALLEL_HASH_THRESHOLD = 8
+
+
+@dataclass
+class ProvisionedAccount:
+    customer_id: int
+    username: str
+    login_path: str
+
+
+@dataclass
+class ProvisioningRun:
+    accounts: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+
+
+def _init_hash_worker():
+    """Make Django usable in pool workers started with spawn rather than fork"""
+    import django
+
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """``make_password`` for each password, spread over a process pool.
+
+    Hashing is CPU bound, so threads wouldn't help; each worker process
+    hashes its share with the project's configured PASSWORD_HASHERS.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < PARALLEL_HASH_THRESHOLD:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(workers, initializer=_init_hash_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def login_path(user):
+    """One-time link where ``user`` sets their password and signs in.
+
+    The token is tied to the current password hash, so it stops working
+    as soon as it has been used to set a password.
+    """
+    return reverse(
+        "password_reset_confirm",
+        kwargs={
+            "uidb64": urlsafe_base64_encode(force_bytes(user.pk)),
+            "token": default_token_generator.make_token(user),
+        },
+    )
+
+
+def provision_accounts(customers, workers=None):
+    """Create portal users for ``customers`` that don't have one yet.
+
+    The username is the customer's email address. Customers without an
+    email, already linked, or whose email is taken (or repeated in the
+    batch) are returned in ``skipped`` as ``(customer_id, reason)``.
+    Nobody is told the random initial passwords; each account gets a
+    one-time login link instead.
+    """
+    run = ProvisioningRun()
+    candidates = []
+    seen = set()
+    for customer in customers.filter(user__isnull=True).order_by("pk"):
+        email = customer.email.strip()
+        if not email:
+            run.skipped.append((customer.pk, "no email address"))
+        elif email.lower() in seen:
+            run.skipped.append((customer.pk, "email repeated in this batch"))
+        else:
+            seen.add(email.lower())
+            candidates.append((customer, email))
+
+    taken = {
+        username.lower()
+        for username in User.objects.filter(
+            username__in=[email for _, email in candidates]
+        ).values_list("username", flat=True)
+    }
+    available = []
+    for customer, email in candidates:
+        if email.lower() in taken:
+            run.skipped.append((customer.pk, "a user with this email exists"))
+        else:
+            available.append((customer, email))
+    candidates = available
+    if not candidates:
+        return run
+
+    hashes = hash_passwords(
+        [secrets.token_urlsafe(32) for _ in candidates], workers=workers
+    )
+    users = [
+        User(
+            username=email,
+            email=email,
+            first_name=customer.first_name,
+            last_name=customer.last_name,
+            password=password_hash,
+        )
+        for (customer, email), password_hash in zip(candidates, hashes)
+    ]
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        links = {customer.pk: user.pk for (customer, _), user in zip(candidates, users)}
+        Customer.objects.filter(pk__in=links).update(
+            user_id=Case(
+                *[When(pk=pk, then=Value(user_id)) for pk, user_id in links.items()],
+                output_field=IntegerField(),
+            )
+        )
+    # A reused user id could still have "no customer" cached from before
+    cache.delete_many([customer_cache_key(user.pk) for user in users])
+
+    run.accounts = [
+        ProvisionedAccount(customer.pk, user.username, login_path(user))
+        for (customer, _), user in zip(candidates, users)
+    ]
+    return run
@@ -0,0 +1,83 @@
+# bidii_builders/reporting.py
+import calendar
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from .models import ArchivedInvoice, ArchivedJob, Invoice, Job
+
+# Reports read the hot and archive tables together; the operational views
+# (job and invoice lists, detail pages) only ever touch the hot ones.
+
+
+def _grouped_sum(queryset, fields, value):
+    totals = Counter()
+    for *key, total in (
+        queryset.order_by()
+        .values_list(*fields)
+        .annotate(total=value)
+        .values_list(*fields, "total")
+    ):
+        totals[tuple(key) if len(key) > 1 else key[0]] += total or 0
+    return totals
+
+
+def jobs_by_status():
+    """{status: jobs} across live and archived jobs"""
+    return _grouped_sum(Job.objects.active(), ["status"], Count("pk")) + _grouped_sum(
+        ArchivedJob.objects.all(), ["status"], Count("pk")
+    )
+
+
+def total_jobs():
+    return Job.objects.active().count() + ArchivedJob.objects.count()
+
+
+def total_revenue():
+    """Amount of every paid invoice, live or archived"""
+    live = Invoice.objects.active().filter(is_paid=True).aggregate(total=Sum("amount"))
+    archived = ArchivedInvoice.objects.filter(is_paid=True).aggregate(
+        total=Sum("amount")
+    )
+    return (live["total"] or Decimal("0.00")) + (archived["total"] or Decimal("0.00"))
+
+
+def monthly_revenue(since):
+    """{(year, month): paid invoice amount} by issue month, from ``since`` on"""
+    fields = ["issue_year", "issue_month"]
+    totals = Counter()
+    for model in (Invoice, ArchivedInvoice):
+        totals += _grouped_sum(
+            model.objects.filter(is_paid=True, issue_date__gte=since).annotate(
+                issue_year=ExtractYear("issue_date"),
+                issue_month=ExtractMonth("issue_date"),
+            ),
+            fields,
+            Sum("amount"),
+        )
+    return totals
+
+
+def revenue_by_calendar_month(today=None):
+    """Paid revenue for January to December of the last twelve months.
+
+    Months up to the current one are this year's, later ones last year's,
+    as ``[{"month": "January", "revenue": 1234.0}, ...]``.
+    """
+    today = today or date.today()
+    since = (
+        date(today.year - 1, today.month + 1, 1)
+        if today.month < 12
+        else (date(today.year, 1, 1))
+    )
+    totals = monthly_revenue(since)
+    return [
+        {
+            "month": calendar.month_name[month],
+            "revenue": float(
+                totals[(today.year if month <= today.month else today.year - 1, month)]
+            ),
+        }
+        for month in range(1, 13)
+    ]
@@ -0,0 +1,46 @@
+# bidii_builders/routers.py
+from django.db import connections
+
+ARCHIVE_DATABASE = "archive"
+
+ARCHIVE_MODELS = {
+    "archivedjob",
+    "archivedjobmaterial",
+    "archivedinvoice",
+    "archivedpayment",
+}
+
+
+def archive_database_configured():
+    return ARCHIVE_DATABASE in connections.databases
+
+
+class ArchiveRouter:
+    """Keep the archive tables in the ``archive`` database when there is one.
+
+    Without an ``archive`` entry in DATABASES every model stays in
+    ``default`` and this router has no opinion.
+    """
+
+    def _is_archive(self, model):
+        return (
+            model._meta.app_label == "bidii_builders"
+            and model._meta.model_name in ARCHIVE_MODELS
+        )
+
+    def db_for_read(self, model, **hints):
+        if self._is_archive(model) and archive_database_configured():
+            return ARCHIVE_DATABASE
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not archive_database_configured():
+            return None
+        is_archive = app_label == "bidii_builders" and model_name in ARCHIVE_MODELS
+        if db == ARCHIVE_DATABASE:
+            return is_archive
+        if is_archive:
+            return False
+        return None
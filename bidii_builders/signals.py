@@ -0,0 +1,267 @@
+# bidii_builders/signals.py
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from . import audit
+from .dashboard import invalidate_dashboard_stats
+from .middleware import invalidate_customer_cache
+from .models import (
+    Customer,
+    Estimate,
+    Job,
+    JobMaterial,
+    Invoice,
+    Material,
+    Payment,
+    round_money,
+    stock_deltas,
+)
+from .stock import move_job_stock
+from .summaries import (
+    OPEN_JOB_STATUSES,
+    mark_customer_deleting,
+    schedule_summary_refresh,
+)
+
+
+@receiver(pre_save, sender=Customer)
+def invalidate_previous_customer_user(sender, instance, update_fields=None, **kwargs):
+    """Drop the cached customer of the user being unlinked, if any"""
+    if update_fields is not None and "user" not in update_fields:
+        return
+    if instance.pk and not instance._state.adding:
+        previous_user_id = (
+            Customer.objects.filter(pk=instance.pk)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+        if previous_user_id != instance.user_id:
+            invalidate_customer_cache(previous_user_id)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer_user(sender, instance, **kwargs):
+    invalidate_customer_cache(instance.user_id)
+
+
+def _customer_ids_for(instance):
+    """Customer id(s) an Estimate/Job/Invoice/Payment row belongs to"""
+    if isinstance(instance, Estimate):
+        return [instance.customer_id]
+    if isinstance(instance, Job):
+        lookup = Estimate.objects.filter(pk=instance.estimate_id)
+        field = "customer_id"
+    elif isinstance(instance, Invoice):
+        lookup = Job.objects.filter(pk=instance.job_id)
+        field = "estimate__customer_id"
+    else:
+        lookup = Invoice.objects.filter(pk=instance.invoice_id)
+        field = "job__estimate__customer_id"
+    return list(lookup.values_list(field, flat=True))
+
+
+# How each summarised model reaches its customer
+CUSTOMER_LOOKUPS = {
+    Estimate: "customer_id",
+    Job: "estimate__customer_id",
+    Invoice: "job__estimate__customer_id",
+    Payment: "invoice__job__estimate__customer_id",
+}
+
+
+@receiver(pre_save, sender=Estimate)
+@receiver(pre_save, sender=Job)
+@receiver(pre_save, sender=Invoice)
+@receiver(pre_save, sender=Payment)
+def remember_previous_customer(sender, instance, raw=False, **kwargs):
+    """Note whose row this was, so a reassigned row refreshes both customers"""
+    instance._previous_customer_ids = []
+    if instance.pk and not raw:
+        instance._previous_customer_ids = list(
+            sender.objects.filter(pk=instance.pk).values_list(
+                CUSTOMER_LOOKUPS[sender], flat=True
+            )
+        )
+
+
+# The ledger receivers are connected before refresh_customer_summary so the
+# summary is computed from balances that already include the change.
+
+
+@receiver(pre_save, sender=Payment)
+def remember_previous_posting(sender, instance, raw=False, **kwargs):
+    """Note what an edited payment was posted as, so it can be reversed"""
+    instance._previous_posting = None
+    if instance.pk and not raw:
+        instance._previous_posting = (
+            Payment.objects.filter(pk=instance.pk)
+            .values_list("invoice_id", "amount")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Payment)
+def post_payment(sender, instance, raw=False, **kwargs):
+    """Apply a created or edited payment to its invoice's balance"""
+    if raw:
+        return
+    amount = Payment._meta.get_field("amount").to_python(instance.amount)
+    previous = getattr(instance, "_previous_posting", None)
+    if previous and previous[0] == instance.invoice_id:
+        amount -= previous[1]
+    elif previous:
+        audit.record_many(
+            "invoice",
+            Invoice.objects.filter(pk=previous[0]).apply_payment(-previous[1]),
+        )
+    if amount:
+        audit.record_many(
+            "invoice",
+            Invoice.objects.filter(pk=instance.invoice_id).apply_payment(amount),
+        )
+
+
+@receiver(post_delete, sender=Payment)
+def reverse_payment(sender, instance, **kwargs):
+    audit.record_many(
+        "invoice",
+        Invoice.objects.filter(pk=instance.invoice_id).apply_payment(-instance.amount),
+    )
+
+
+@receiver(post_save, sender=Invoice)
+def rebalance_invoice(sender, instance, created, raw=False, **kwargs):
+    """Recompute the balance after the invoice amount was edited"""
+    if created or raw:
+        return
+    balance = round_money(F("amount") - F("amount_paid"))
+    changed = Invoice.objects.filter(pk=instance.pk).exclude(balance=balance)
+    if changed.update(balance=balance):
+        audit.record_many("invoice", Invoice.objects.filter(pk=instance.pk).settle())
+
+
+@receiver(pre_save, sender=JobMaterial)
+def remember_previous_line(sender, instance, raw=False, **kwargs):
+    """Note what an edited material line cost, so it can be taken back off"""
+    instance._previous_line = None
+    if instance.pk and not raw:
+        instance._previous_line = (
+            JobMaterial.objects.filter(pk=instance.pk)
+            .values_list(
+                "job_id", "total_price", "material_id", "quantity", "job__status"
+            )
+            .first()
+        )
+
+
+@receiver(post_save, sender=JobMaterial)
+def add_line_to_job_total(sender, instance, raw=False, **kwargs):
+    """Apply a created or edited material line to its job's materials_total"""
+    if raw:
+        return
+    total = JobMaterial._meta.get_field("total_price").to_python(instance.total_price)
+    previous = getattr(instance, "_previous_line", None)
+    if previous and previous[0] == instance.job_id:
+        total -= previous[1]
+    elif previous:
+        Job.objects.filter(pk=previous[0]).add_materials_cost(-previous[1])
+    if total:
+        Job.objects.filter(pk=instance.job_id).add_materials_cost(total)
+
+
+@receiver(post_delete, sender=JobMaterial)
+def remove_line_from_job_total(sender, instance, **kwargs):
+    Job.objects.filter(pk=instance.job_id).add_materials_cost(-instance.total_price)
+
+
+def _job_status(job_id):
+    return Job.objects.filter(pk=job_id).values_list("status", flat=True).first()
+
+
+@receiver(post_save, sender=JobMaterial)
+def reserve_line_stock(sender, instance, raw=False, **kwargs):
+    """Apply a created or edited material line to its material's stock"""
+    if raw:
+        return
+    quantity = JobMaterial._meta.get_field("quantity").to_python(instance.quantity)
+    lines = [(instance.material_id, quantity, _job_status(instance.job_id))]
+    previous = getattr(instance, "_previous_line", None)
+    if previous:
+        lines.append((previous[2], -previous[3], previous[4]))
+    Material.objects.adjust_stock(stock_deltas(lines))
+
+
+@receiver(post_delete, sender=JobMaterial)
+def release_line_stock(sender, instance, **kwargs):
+    # Only the reservation comes back; stock a completed job used stays used
+    if _job_status(instance.job_id) in OPEN_JOB_STATUSES:
+        Material.objects.filter(pk=instance.material_id).update(
+            quantity_reserved=F("quantity_reserved") - instance.quantity
+        )
+
+
+@receiver(pre_save, sender=Job)
+def remember_previous_status(sender, instance, raw=False, **kwargs):
+    instance._previous_status = None
+    if instance.pk and not raw:
+        instance._previous_status = _job_status(instance.pk)
+
+
+@receiver(post_save, sender=Job)
+def move_material_stock(sender, instance, raw=False, **kwargs):
+    """Release or use up a job's reservations when its status changes"""
+    previous = getattr(instance, "_previous_status", None)
+    if not raw and previous and previous != instance.status:
+        move_job_stock([instance.pk], previous, instance.status)
+
+
+@receiver(post_save, sender=Estimate)
+@receiver(post_save, sender=Job)
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Estimate)
+@receiver(post_delete, sender=Job)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Payment)
+def refresh_customer_summary(sender, instance, **kwargs):
+    """Keep CustomerSummary in step with the rows it is computed from"""
+    previous = getattr(instance, "_previous_customer_ids", [])
+    schedule_summary_refresh([*previous, *_customer_ids_for(instance)])
+
+
+@receiver(pre_delete, sender=Customer)
+def customer_deleting(sender, instance, **kwargs):
+    # Cascade deletes of the customer's rows must not recreate its summary
+    mark_customer_deleting(instance.pk)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    mark_customer_deleting(instance.pk, deleting=False)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Estimate)
+@receiver(post_save, sender=Job)
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Estimate)
+@receiver(post_delete, sender=Job)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Payment)
+def expire_dashboard_stats(sender, **kwargs):
+    invalidate_dashboard_stats()
+
+
+for model in audit.AUDITED_MODELS:
+    post_init.connect(audit.snapshot_on_load, sender=model)
+    post_save.connect(audit.record_save, sender=model)
+    post_delete.connect(audit.record_delete, sender=model)
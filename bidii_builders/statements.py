@@ -0,0 +1,246 @@
+# bidii_builders/statements.py
+import csv
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from .audit import record_created, record_many
+from .contacts import normalize_phone
+from .dashboard import invalidate_dashboard_stats
+from .models import ArchivedPayment, Invoice, Payment, UnmatchedStatementLine
+from .summaries import refresh_customer_summaries
+
+# Lines matched and inserted per transaction
+STATEMENT_BATCH_SIZE = 1000
+
+DEFAULT_PAYMENT_METHOD = "M-Pesa"
+
+# Header names accepted for each column, lower-cased; the first ones are ours,
+# the rest are what M-Pesa and the banks put in their exports
+STATEMENT_COLUMNS = {
+    "transaction_id": ["transaction_id", "receipt no.", "receipt no", "receipt"],
+    "date": ["date", "completion time", "transaction date", "value date"],
+    "amount": ["amount", "paid in", "credit"],
+    "phone": ["phone", "msisdn", "sender phone"],
+    "reference": ["reference", "account reference", "account no.", "bill ref"],
+}
+
+
+@dataclass
+class StatementImport:
+    rows: int = 0
+    matched: int = 0
+    duplicates: int = 0
+    unmatched: int = 0
+    total: Decimal = Decimal("0.00")
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class OpenInvoiceIndex:
+    """Hash indexes over the open invoices, built with one query.
+
+    ``by_id`` maps an invoice to its remaining balance and ``by_phone`` maps
+    a customer's normalized phone to their open invoices, oldest first.
+    Invoices queued for deletion with their job or customer are left out.
+    Balances are reduced as lines are matched, so later lines in the same
+    statement see what is still owed.
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self.customers = {}
+        self.phones = {}
+        self.by_phone = defaultdict(list)
+        for pk, balance, customer_id, phone_key in (
+            Invoice.objects.active()
+            .filter(is_paid=False)
+            .order_by("due_date", "pk")
+            .values_list(
+                "pk",
+                "balance",
+                "job__estimate__customer_id",
+                "job__estimate__customer__phone_key",
+            )
+        ):
+            self.by_id[pk] = balance
+            self.customers[pk] = customer_id
+            self.phones[pk] = phone_key
+            if phone_key:
+                self.by_phone[phone_key].append(pk)
+
+    def match(self, amount, reference, phone):
+        """(invoice_id, None) for a statement line, or (None, reason)"""
+        phone_key = normalize_phone(phone)
+        # "INV-0042", "42" and "Invoice 42" all name invoice 42. References
+        # are free text ("Plot 42"), so the number is only trusted when the
+        # payer's phone or the amount owed agrees with that invoice.
+        numbers = re.findall(r"\d+", reference or "")
+        digits = numbers[-1] if numbers else ""
+        if digits and int(digits) in self.by_id:
+            pk = int(digits)
+            if (phone_key and self.phones[pk] == phone_key) or self.by_id[pk] == amount:
+                return pk, None
+
+        invoices = [pk for pk in self.by_phone.get(phone_key, []) if pk in self.by_id]
+        if not invoices:
+            if digits:
+                return None, f"no open invoice #{int(digits)} for this phone or amount"
+            return None, "no open invoice for this phone"
+        # An amount equal to what is owed settles that invoice; otherwise the
+        # money can only be placed when the customer has one open invoice
+        exact = [pk for pk in invoices if self.by_id[pk] == amount]
+        if exact:
+            return exact[0], None
+        if len(invoices) == 1:
+            return invoices[0], None
+        return None, f"{len(invoices)} open invoices for this phone, none for {amount}"
+
+    def post(self, invoice_id, amount):
+        self.by_id[invoice_id] -= amount
+        if self.by_id[invoice_id] <= 0:
+            del self.by_id[invoice_id]
+
+
+def _column_map(fieldnames):
+    """{our column: header in this file} for the headers we recognise"""
+    headers = {(name or "").strip().lower(): name for name in fieldnames or []}
+    columns = {}
+    for column, aliases in STATEMENT_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[column] = headers[alias]
+                break
+    return columns
+
+
+def _parse_amount(value):
+    try:
+        amount = Decimal((value or "").replace(",", "").strip())
+    except InvalidOperation:
+        return None
+    return amount.quantize(Decimal("0.01")) if amount > 0 else None
+
+
+def _import_batch(lines, index, result, payment_method, dry_run):
+    # Lines seen in an earlier import, matched or not, are not posted twice
+    transaction_ids = [line["transaction_id"] for line in lines]
+    known = set(
+        Payment.objects.filter(reference_number__in=transaction_ids).values_list(
+            "reference_number", flat=True
+        )
+    )
+    # Payments on archived jobs have left the hot table but were still posted
+    known.update(
+        ArchivedPayment.objects.filter(
+            reference_number__in=transaction_ids
+        ).values_list("reference_number", flat=True)
+    )
+    known.update(
+        UnmatchedStatementLine.objects.filter(
+            transaction_id__in=transaction_ids
+        ).values_list("transaction_id", flat=True)
+    )
+    payments = []
+    unmatched = []
+    for line in lines:
+        if line["transaction_id"] in known:
+            result.duplicates += 1
+            continue
+        known.add(line["transaction_id"])
+
+        amount = _parse_amount(line["amount"])
+        if amount is None:
+            invoice_id, reason = None, "not a payment in"
+        else:
+            invoice_id, reason = index.match(amount, line["reference"], line["phone"])
+        if invoice_id is None:
+            unmatched.append(
+                UnmatchedStatementLine(
+                    transaction_id=line["transaction_id"],
+                    transaction_date=line["date"][:50],
+                    amount=amount,
+                    phone=line["phone"][:20],
+                    reference=line["reference"][:100],
+                    reason=reason,
+                )
+            )
+            continue
+        index.post(invoice_id, amount)
+        payments.append(
+            Payment(
+                invoice_id=invoice_id,
+                amount=amount,
+                payment_method=payment_method,
+                reference_number=line["transaction_id"],
+            )
+        )
+
+    result.matched += len(payments)
+    result.unmatched += len(unmatched)
+    result.total += sum((payment.amount for payment in payments), Decimal("0.00"))
+    if dry_run:
+        return set()
+
+    deltas = defaultdict(Decimal)
+    for payment in payments:
+        deltas[payment.invoice_id] += payment.amount
+    with transaction.atomic():
+        record_created(Payment.objects.bulk_create(payments))
+        # bulk_create skips the per-payment ledger signals, so the batch is
+        # posted to its invoices with one UPDATE instead
+        record_many("invoice", Invoice.objects.apply_payments(deltas))
+        UnmatchedStatementLine.objects.bulk_create(unmatched)
+    return {index.customers[invoice_id] for invoice_id in deltas}
+
+
+def import_statement(
+    stream,
+    payment_method=DEFAULT_PAYMENT_METHOD,
+    batch_size=STATEMENT_BATCH_SIZE,
+    dry_run=False,
+):
+    """Turn the lines of a CSV payment statement into Payments.
+
+    The open invoices are indexed once, then the statement is read lazily
+    ``batch_size`` lines at a time. Each line is matched in constant time:
+    by the invoice number in its reference when the payer's phone or the
+    amount agrees with it, else by the payer's phone and the amount. Lines already imported (same transaction id) are skipped;
+    lines that can't be matched are queued as ``UnmatchedStatementLine``.
+    Raises ValueError if the file has no transaction id or amount column.
+    """
+    started = time.perf_counter()
+    result = StatementImport()
+    reader = csv.DictReader(stream)
+    columns = _column_map(reader.fieldnames)
+    if "transaction_id" not in columns or "amount" not in columns:
+        raise ValueError("The statement needs transaction_id and amount columns.")
+
+    index = OpenInvoiceIndex()
+    customer_ids = set()
+    lines = (
+        {
+            name: (row.get(columns[name]) or "").strip() if name in columns else ""
+            for name in STATEMENT_COLUMNS
+        }
+        for row in reader
+    )
+    lines = (line for line in lines if line["transaction_id"])
+    while True:
+        batch = list(islice(lines, batch_size))
+        if not batch:
+            break
+        result.rows += len(batch)
+        customer_ids |= _import_batch(batch, index, result, payment_method, dry_run)
+
+    if customer_ids:
+        refresh_customer_summaries(customer_ids)
+        invalidate_dashboard_stats()
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,85 @@
+# bidii_builders/stock.py
+from decimal import Decimal
+from django.db.models import Count, F, Q, Sum
+from .models import STOCK_EFFECTS, JobMaterial, Material
+from .summaries import OPEN_JOB_STATUSES
+
+
+def _line_totals(lines):
+    """{material_id: total quantity} of ``lines``, with one grouped query"""
+    return dict(
+        lines.order_by()
+        .values("material_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("material_id", "total")
+    )
+
+
+def move_job_stock(job_ids, old_status, new_status):
+    """Apply a status change of ``job_ids`` to their materials' stock.
+
+    Cancelling an open job releases its reservations; completing one turns
+    them into stock used. The lines are summed per material in one query
+    and applied in one UPDATE.
+    """
+    old = STOCK_EFFECTS.get(old_status, (0, 0))
+    new = STOCK_EFFECTS.get(new_status, (0, 0))
+    per_unit = (new[0] - old[0], new[1] - old[1])
+    if not any(per_unit):
+        return 0
+    totals = _line_totals(JobMaterial.objects.filter(job_id__in=job_ids))
+    return Material.objects.adjust_stock(
+        {
+            material_id: (per_unit[0] * total, per_unit[1] * total)
+            for material_id, total in totals.items()
+        }
+    )
+
+
+def release_lines(line_ids):
+    """Release the reservations of material lines about to be deleted.
+
+    Only reservations are given back: stock used by a completed job stays
+    used when its history is deleted.
+    """
+    totals = _line_totals(
+        JobMaterial.objects.filter(pk__in=line_ids, job__status__in=OPEN_JOB_STATUSES)
+    )
+    return Material.objects.adjust_stock(
+        {
+            material_id: (Decimal("0.00"), -total)
+            for material_id, total in totals.items()
+        }
+    )
+
+
+def receive_stock(material_id, quantity):
+    """Add a delivery of ``quantity`` to a material's stock on hand"""
+    return Material.objects.adjust_stock({material_id: (quantity, Decimal("0.00"))})
+
+
+def low_stock():
+    """Materials at or below their reorder level, or reserved beyond stock.
+
+    One grouped query: availability comes from the maintained columns and
+    the open jobs waiting on each material are counted in the same pass.
+    Most short first.
+    """
+    available = F("quantity_on_hand") - F("quantity_reserved")
+    return (
+        Material.objects.alias(available_stock=available)
+        .filter(
+            Q(available_stock__lte=F("reorder_level"), reorder_level__gt=0)
+            | Q(available_stock__lt=0)
+        )
+        .annotate(
+            available=available,
+            shortfall=F("reorder_level") - available,
+            open_jobs=Count(
+                "jobmaterial__job",
+                filter=Q(jobmaterial__job__status__in=OPEN_JOB_STATUSES),
+                distinct=True,
+            ),
+        )
+        .order_by("-shortfall", "name")
+    )
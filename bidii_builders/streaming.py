@@ -0,0 +1,48 @@
+# bidii_builders/streaming.py
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+
+# Rows fetched per database round trip and rendered per chunk sent to the client
+STREAM_CHUNK_SIZE = 500
+
+# Marker the list templates emit in place of their rows when streaming
+ROWS_PLACEHOLDER = "<!-- stream-rows -->"
+
+
+def stream_table(
+    request,
+    template_name,
+    row_template_name,
+    queryset,
+    row_name,
+    context=None,
+    chunk_size=STREAM_CHUNK_SIZE,
+):
+    """Stream a list page: the page shell first, then table rows in chunks.
+
+    ``template_name`` is rendered once with ``streaming`` set and must output
+    ``rows_placeholder`` where its rows go. Rows come from a server-side
+    ``queryset.iterator()`` and are rendered with ``row_template_name`` (the
+    object is available as ``row_name``), so memory use does not grow with
+    the number of rows.
+    """
+    context = dict(context or {})
+    context.update({"streaming": True, "rows_placeholder": ROWS_PLACEHOLDER})
+    head, tail = render_to_string(template_name, context, request=request).split(
+        ROWS_PLACEHOLDER, 1
+    )
+    row_template = get_template(row_template_name)
+
+    def rows():
+        yield head
+        chunk = []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(row_template.render({row_name: obj}))
+            if len(chunk) >= chunk_size:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+        yield tail
+
+    return StreamingHttpResponse(rows(), content_type="text/html; charset=utf-8")
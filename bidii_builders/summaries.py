@@ -0,0 +1,179 @@
+# bidii_builders/summaries.py
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from django.db.models import Count, Max, Sum
+from .models import (
+    ArchivedJob,
+    ArchivedPayment,
+    Customer,
+    CustomerSummary,
+    Estimate,
+    Invoice,
+    Job,
+    Payment,
+)
+
+OPEN_JOB_STATUSES = ["scheduled", "in_progress"]
+
+_deferred = threading.local()
+
+
+def _grouped(queryset, customer_field, **aggregate):
+    """{customer_id: value} for one aggregate grouped by customer"""
+    (name,) = aggregate
+    return dict(
+        queryset.order_by()
+        .values_list(customer_field)
+        .annotate(**aggregate)
+        .values_list(customer_field, name)
+    )
+
+
+def refresh_customer_summaries(customer_ids):
+    """Recompute the summary rows of ``customer_ids`` with grouped aggregates"""
+    customer_ids = set(
+        Customer.objects.filter(pk__in=set(customer_ids)).values_list("pk", flat=True)
+    )
+    if not customer_ids:
+        return
+
+    revenue = _grouped(
+        Payment.objects.filter(invoice__job__estimate__customer_id__in=customer_ids),
+        "invoice__job__estimate__customer_id",
+        total=Sum("amount"),
+    )
+    # Archived payments and jobs still count towards revenue and activity
+    archived_revenue = _grouped(
+        ArchivedPayment.objects.filter(customer_id__in=customer_ids),
+        "customer_id",
+        total=Sum("amount"),
+    )
+    outstanding = _grouped(
+        Invoice.objects.filter(
+            job__estimate__customer_id__in=customer_ids, is_paid=False
+        ),
+        "job__estimate__customer_id",
+        total=Sum("balance"),
+    )
+    open_jobs = _grouped(
+        Job.objects.filter(
+            estimate__customer_id__in=customer_ids, status__in=OPEN_JOB_STATUSES
+        ),
+        "estimate__customer_id",
+        total=Count("pk"),
+    )
+    estimate_activity = _grouped(
+        Estimate.objects.filter(customer_id__in=customer_ids),
+        "customer_id",
+        latest=Max("updated_at"),
+    )
+    job_activity = _grouped(
+        Job.objects.filter(estimate__customer_id__in=customer_ids),
+        "estimate__customer_id",
+        latest=Max("updated_at"),
+    )
+
+    archived_activity = _grouped(
+        ArchivedJob.objects.filter(customer_id__in=customer_ids),
+        "customer_id",
+        latest=Max("updated_at"),
+    )
+
+    zero = Decimal("0.00")
+    summaries = []
+    for customer_id in customer_ids:
+        activity = [
+            value
+            for value in (
+                estimate_activity.get(customer_id),
+                job_activity.get(customer_id),
+                archived_activity.get(customer_id),
+            )
+            if value is not None
+        ]
+        summaries.append(
+            CustomerSummary(
+                customer_id=customer_id,
+                lifetime_revenue=(revenue.get(customer_id) or zero)
+                + (archived_revenue.get(customer_id) or zero),
+                outstanding_balance=outstanding.get(customer_id) or zero,
+                open_jobs=open_jobs.get(customer_id, 0),
+                last_activity=max(activity) if activity else None,
+            )
+        )
+
+    CustomerSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=["customer"],
+        update_fields=[
+            "lifetime_revenue",
+            "outstanding_balance",
+            "open_jobs",
+            "last_activity",
+            "updated_at",
+        ],
+    )
+
+
+def _deleting_customers():
+    if not hasattr(_deferred, "deleting"):
+        _deferred.deleting = set()
+    return _deferred.deleting
+
+
+def mark_customer_deleting(customer_id, deleting=True):
+    """Skip summary refreshes for a customer whose rows are being cascaded away"""
+    if deleting:
+        _deleting_customers().add(customer_id)
+    else:
+        _deleting_customers().discard(customer_id)
+
+
+@contextmanager
+def customers_deleting(customer_ids):
+    """Skip these customers' summary refreshes for the block.
+
+    The marks are cleared even when the delete inside raises, which the
+    post_delete signal alone can't do; Customer.delete() and the queryset
+    delete() wrap themselves in this.
+    """
+    customer_ids = set(customer_ids)
+    _deleting_customers().update(customer_ids)
+    try:
+        yield
+    finally:
+        _deleting_customers().difference_update(customer_ids)
+
+
+def schedule_summary_refresh(customer_ids):
+    """Refresh now, or at the end of the enclosing ``deferred_summary_refresh``"""
+    customer_ids = set(customer_ids) - _deleting_customers()
+    if not customer_ids:
+        return
+    pending = getattr(_deferred, "pending", None)
+    if pending is not None:
+        pending.update(customer_ids)
+    else:
+        refresh_customer_summaries(customer_ids)
+
+
+@contextmanager
+def deferred_summary_refresh():
+    """Collect summary refreshes and run them once when the block exits.
+
+    Used by bulk paths so a batch touching many rows of the same customers
+    costs one grouped refresh instead of one per row.
+    """
+    if getattr(_deferred, "pending", None) is not None:
+        yield
+        return
+    _deferred.pending = set()
+    try:
+        yield
+        pending = _deferred.pending
+    finally:
+        _deferred.pending = None
+    if pending:
+        refresh_customer_summaries(pending)
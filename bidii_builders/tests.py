@@ -1,20 +1,44 @@
 # bidii_builders/tests.py
-from django.test import TestCase, Client
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models.signals import pre_save
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 from decimal import Decimal
 from datetime import date
+from io import StringIO
+from unittest import mock
+import json
 from .models import (
+    AuditLog,
+    BackfillCheckpoint,
     Customer,
+    CustomerSummary,
+    DeletionRequest,
     Property,
     Estimate,
     Job,
     Material,
+    MaterialItem,
     JobMaterial,
     Invoice,
     Payment,
+    UnmatchedStatementLine,
 )
+from . import audit
+from .backfill import format_progress, run_backfill
+from .contacts import normalize_email, normalize_phone
+from .dedup import find_duplicates, merge_customers
+from .fields import compress_text
+from .materials import add_job_materials, job_costing, price_comparison
+from .stock import low_stock
+from .transitions import bulk_transition
+from .provisioning import provision_accounts
 
 
 class CustomerModelTest(TestCase):
@@ -342,3 +366,2349 @@ class BusinessLogicTest(TestCase):
         self.assertEqual(invoice.job, job)
         self.assertEqual(invoice.job.estimate, estimate)
         self.assertEqual(invoice.amount, Decimal("48000.00"))
+
+
+class CustomerDetailTabsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_staff=True
+        )
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        for i in range(25):
+            Property.objects.create(
+                customer=self.customer,
+                address=f"{i} Oak Ave",
+                property_type="House",
+                description="Residential property",
+            )
+        self.client.login(username="testuser", password="testpass123")
+
+    def test_detail_renders_counts_only(self):
+        """Test customer detail loads the header and tab counts in one query"""
+        # session + user + customer with counts
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("customer_detail", args=[self.customer.id])
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["tab_counts"]["properties"], 25)
+        self.assertEqual(response.context["tab_counts"]["invoices"], 0)
+        self.assertNotContains(response, "0 Oak Ave")
+
+    def test_tab_fragment_is_paginated(self):
+        """Test tab endpoint returns one page of HTML"""
+        url = reverse("customer_detail_tab", args=[self.customer.id, "properties"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Oak Ave", count=20)
+        self.assertContains(response, "Page 1 of 2")
+
+    def test_tab_json(self):
+        """Test tab endpoint JSON variant"""
+        url = reverse("customer_detail_tab", args=[self.customer.id, "properties"])
+        response = self.client.get(url, {"format": "json", "page": 2})
+        data = response.json()
+        self.assertEqual(data["count"], 25)
+        self.assertEqual(data["page"], 2)
+        self.assertEqual(len(data["results"]), 5)
+        self.assertFalse(data["has_next"])
+
+    def test_unknown_tab(self):
+        """Test unknown tab names return 404"""
+        url = reverse("customer_detail_tab", args=[self.customer.id, "bogus"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_unknown_customer_tab(self):
+        """Test tabs of a customer that doesn't exist return 404"""
+        url = reverse("customer_detail_tab", args=[self.customer.id + 1, "properties"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(url, {"format": "json"})
+        self.assertEqual(response.status_code, 404)
+
+
+class PropertyTimelineTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_staff=True
+        )
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        self.property = Property.objects.create(
+            customer=self.customer,
+            address="456 Oak Ave",
+            property_type="House",
+            description="Residential property",
+        )
+        estimate = Estimate.objects.create(
+            customer=self.customer,
+            property_obj=self.property,
+            visit_date=date(2024, 1, 1),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+            total_cost=Decimal("50000.00"),
+            status="accepted",
+        )
+        job = Job.objects.create(
+            estimate=estimate,
+            start_date=date(2024, 2, 1),
+            scheduled_date=date(2024, 2, 1),
+            status="completed",
+        )
+        material = Material.objects.create(
+            name="Cement", unit_price=Decimal("750.00"), unit="bag", supplier="Bamburi"
+        )
+        JobMaterial.objects.create(
+            job=job, material=material, quantity=Decimal("2"), unit_price=Decimal("750")
+        )
+        invoice = Invoice.objects.create(
+            job=job, amount=Decimal("48000.00"), due_date=date(2024, 3, 1)
+        )
+        Payment.objects.create(
+            invoice=invoice, amount=Decimal("48000.00"), payment_method="mpesa"
+        )
+        self.client.login(username="testuser", password="testpass123")
+
+    def test_timeline_merges_all_event_kinds(self):
+        """Test the timeline returns every related event from one query"""
+        url = reverse("property_timeline", args=[self.property.id])
+        with self.assertNumQueries(3):  # session + user + union
+            response = self.client.get(url)
+        kinds = [event["kind"] for event in response.json()["results"]]
+        # Estimate, invoice and payment are dated today; the job started earlier
+        self.assertEqual(
+            kinds, ["payment", "invoice", "estimate", "job_material", "job"]
+        )
+        payment = next(e for e in response.json()["results"] if e["kind"] == "payment")
+        self.assertEqual(payment["label"], "mpesa")
+        self.assertEqual(payment["amount"], "48000.00")
+        self.assertIsNone(response.json()["next_cursor"])
+
+    def test_timeline_keyset_pagination(self):
+        """Test walking the timeline page by page visits every event once"""
+        from .timeline import property_timeline, decode_cursor
+
+        seen = []
+        events, cursor = property_timeline(self.property.id, limit=2)
+        seen.extend(events)
+        while cursor:
+            events, cursor = property_timeline(
+                self.property.id, cursor=decode_cursor(cursor), limit=2
+            )
+            seen.extend(events)
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len({(e["kind"], e["object_id"]) for e in seen}), 5)
+
+    def test_invalid_cursor(self):
+        """Test malformed cursors are rejected"""
+        url = reverse("property_timeline", args=[self.property.id])
+        for cursor in ["nonsense", "2024-01-01:x:1", "2024-13-01:1:1", "1:2"]:
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+
+    def test_empty_cursor_is_first_page(self):
+        """Test an empty cursor parameter returns the first page"""
+        url = reverse("property_timeline", args=[self.property.id])
+        response = self.client.get(url, {"cursor": ""})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 5)
+
+
+class StreamingListTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_staff=True
+        )
+        customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        estimate = Estimate.objects.create(
+            customer=customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+            total_cost=Decimal("50000.00"),
+            status="accepted",
+        )
+        job = Job.objects.create(
+            estimate=estimate,
+            start_date=date.today(),
+            scheduled_date=date.today(),
+            status="completed",
+        )
+        Invoice.objects.bulk_create(
+            Invoice(job=job, amount=Decimal("100.00"), due_date=date.today())
+            for _ in range(60)
+        )
+        self.client.login(username="testuser", password="testpass123")
+
+    def test_invoice_list_is_paginated(self):
+        """Test the default invoice list renders one page"""
+        response = self.client.get(reverse("invoice_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Page 1 of 2")
+        self.assertEqual(len(response.context["invoices"]), 50)
+
+    def test_invoice_list_show_all_streams(self):
+        """Test ?all=1 streams the shell followed by every row"""
+        response = self.client.get(reverse("invoice_list"), {"all": 1})
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        self.assertIn(b"<thead>", chunks[0])
+        self.assertNotIn(b"Job #", chunks[0])
+        body = b"".join(chunks).decode()
+        self.assertEqual(body.count("Job #"), 60)
+        self.assertTrue(body.rstrip().endswith("</html>"))
+
+
+@override_settings(TEMPLATES=[settings.JINJA2_TEMPLATES, *settings.TEMPLATES])
+class Jinja2TemplatesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123", is_staff=True
+        )
+        customer_user = User.objects.create_user(
+            username="customer", password="customerpass"
+        )
+        self.customer = Customer.objects.create(
+            user=customer_user,
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        estimate = Estimate.objects.create(
+            customer=self.customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+            total_cost=Decimal("50000.00"),
+            status="accepted",
+        )
+        job = Job.objects.create(
+            estimate=estimate,
+            start_date=date.today(),
+            scheduled_date=date.today(),
+            status="completed",
+        )
+        self.invoice = Invoice.objects.create(
+            job=job, amount=Decimal("48000.00"), due_date=date.today()
+        )
+
+    def test_staff_pages_render_with_jinja2(self):
+        """Test ported staff pages are served by the Jinja2 backend"""
+        self.client.login(username="testuser", password="testpass123")
+        for name in ["dashboard", "invoice_list", "job_list", "estimate_list"]:
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("invoice_list"))
+        self.assertContains(response, "KES 48000.00")
+        self.assertContains(response, reverse("invoice_detail", args=[self.invoice.id]))
+
+    def test_streamed_list_renders_with_jinja2(self):
+        """Test the streamed invoice list also works with Jinja2 templates"""
+        self.client.login(username="testuser", password="testpass123")
+        response = self.client.get(reverse("invoice_list"), {"all": 1})
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn("Job #", body)
+        self.assertIn("csrfmiddlewaretoken", body)
+
+    def test_portal_pages_render_with_jinja2(self):
+        """Test ported customer portal pages render"""
+        self.client.login(username="customer", password="customerpass")
+        response = self.client.get(reverse("customer_dashboard"))
+        self.assertContains(response, "Welcome, John!")
+        response = self.client.get(reverse("customer_invoices"))
+        self.assertContains(response, "KES 48000.00")
+
+
+class ScopedQuerySetTest(TestCase):
+    """Customer-facing detail views check ownership within the lookup query"""
+
+    def setUp(self):
+        self.client = Client()
+        self.owner = User.objects.create_user(username="owner", password="ownerpass")
+        self.other = User.objects.create_user(username="other", password="otherpass")
+        self.customer = Customer.objects.create(
+            user=self.owner,
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        Customer.objects.create(
+            user=self.other,
+            first_name="Jane",
+            last_name="Roe",
+            email="jane@example.com",
+            phone="0987654321",
+            address="789 Pine St",
+        )
+        self.estimate = Estimate.objects.create(
+            customer=self.customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+            total_cost=Decimal("50000.00"),
+            status="accepted",
+        )
+        self.job = Job.objects.create(
+            estimate=self.estimate,
+            start_date=date.today(),
+            scheduled_date=date.today(),
+            status="completed",
+        )
+        self.invoice = Invoice.objects.create(
+            job=self.job, amount=Decimal("48000.00"), due_date=date.today()
+        )
+
+    def test_for_user(self):
+        """Test for_user scopes customers to their own rows"""
+        self.assertEqual(list(Invoice.objects.for_user(self.owner)), [self.invoice])
+        self.assertFalse(Invoice.objects.for_user(self.other).exists())
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        self.assertEqual(Job.objects.for_user(staff).count(), 1)
+
+    def test_detail_query_budgets(self):
+        """Test each detail view stays within its query budget"""
+        self.client.login(username="owner", password="ownerpass")
+        # session + user + scoped lookup (+ related lists)
+        budgets = [
+            ("estimate_detail", self.estimate.id, 3),
+            ("job_detail", self.job.id, 5),
+            ("invoice_detail", self.invoice.id, 4),
+        ]
+        for name, pk, budget in budgets:
+            with self.assertNumQueries(budget):
+                response = self.client.get(reverse(name, args=[pk]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_other_customer_is_redirected(self):
+        """Test another customer cannot view the objects"""
+        self.client.login(username="other", password="otherpass")
+        for name, pk in [
+            ("estimate_detail", self.estimate.id),
+            ("job_detail", self.job.id),
+            ("invoice_detail", self.invoice.id),
+        ]:
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse(name, args=[pk]))
+            self.assertRedirects(
+                response, reverse("customer_dashboard"), fetch_redirect_response=False
+            )
+
+
+class CustomerMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="owner", password="ownerpass")
+        self.customer = Customer.objects.create(
+            user=self.user,
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        self.client.login(username="owner", password="ownerpass")
+
+    def test_customer_resolved_from_cache(self):
+        """Test portal pages skip the customer lookup once it is cached"""
+        self.client.get(reverse("customer_profile"))
+        # session + user, customer comes from the cache
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("customer_profile"))
+        self.assertEqual(response.context["customer"].pk, self.customer.pk)
+
+    def test_cache_invalidated_when_link_changes(self):
+        """Test unlinking the customer is seen on the next request"""
+        self.client.get(reverse("customer_profile"))
+        self.customer.user = None
+        self.customer.save()
+        response = self.client.get(reverse("customer_profile"))
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+
+    def test_saves_not_touching_the_link_skip_the_lookup(self):
+        """Test saving other customer fields doesn't read the old user link"""
+        self.customer.phone = "0700000000"
+        with CaptureQueriesContext(connection) as queries:
+            self.customer.save(update_fields=["phone"])
+        self.assertEqual(
+            [q["sql"] for q in queries if q["sql"].startswith("SELECT")], []
+        )
+
+    def test_user_without_customer(self):
+        """Test users without a profile get request.customer as None"""
+        User.objects.create_user(username="lonely", password="lonelypass")
+        self.client.login(username="lonely", password="lonelypass")
+        response = self.client.get(reverse("index"))
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+
+
+class CustomerSummaryTest(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        self.estimate = Estimate.objects.create(
+            customer=self.customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+            total_cost=Decimal("50000.00"),
+            status="accepted",
+        )
+        self.job = Job.objects.create(
+            estimate=self.estimate,
+            start_date=date.today(),
+            scheduled_date=date.today(),
+            status="in_progress",
+        )
+
+    def test_summary_follows_writes(self):
+        """Test signals keep the summary in step with jobs, invoices and payments"""
+        summary = CustomerSummary.objects.get(customer=self.customer)
+        self.assertEqual(summary.open_jobs, 1)
+
+        invoice = Invoice.objects.create(
+            job=self.job, amount=Decimal("1000.00"), due_date=date.today()
+        )
+        payment = Payment.objects.create(
+            invoice=invoice, amount=Decimal("400.00"), payment_method="cash"
+        )
+        summary.refresh_from_db()
+        self.assertEqual(summary.lifetime_revenue, Decimal("400.00"))
+        self.assertEqual(summary.outstanding_balance, Decimal("600.00"))
+
+        payment.delete()
+        self.job.status = "completed"
+        self.job.save()
+        summary.refresh_from_db()
+        self.assertEqual(summary.lifetime_revenue, Decimal("0.00"))
+        self.assertEqual(summary.open_jobs, 0)
+
+    def test_reassigned_rows_refresh_both_customers(self):
+        """Test moving a job or estimate updates the customer it left"""
+        other = Customer.objects.create(
+            first_name="Jane",
+            last_name="Doe",
+            email="jane@example.com",
+            phone="0987654321",
+            address="456 Side St",
+        )
+        other_estimate = Estimate.objects.create(
+            customer=other,
+            visit_date=date.today(),
+            initial_outline="Other work",
+            detailed_estimate="Other estimate",
+        )
+
+        def open_jobs():
+            return dict(CustomerSummary.objects.values_list("customer", "open_jobs"))
+
+        self.job.estimate = other_estimate
+        self.job.save()
+        self.assertEqual(open_jobs(), {self.customer.pk: 0, other.pk: 1})
+
+        other_estimate.customer = self.customer
+        other_estimate.save()
+        self.assertEqual(open_jobs(), {self.customer.pk: 1, other.pk: 0})
+
+    def test_customer_delete_cascades(self):
+        """Test deleting a customer removes its summary cleanly"""
+        self.customer.delete()
+        self.assertFalse(CustomerSummary.objects.exists())
+
+    def test_failed_delete_keeps_summaries_refreshing(self):
+        """Test a customer delete that raises doesn't stop later refreshes"""
+        from django.db.models.signals import post_delete
+
+        def fail(**kwargs):
+            raise RuntimeError("disk full")
+
+        post_delete.connect(fail, sender=Estimate)
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.customer.delete()
+        finally:
+            post_delete.disconnect(fail, sender=Estimate)
+
+        self.job.status = "completed"
+        self.job.save()
+        self.assertEqual(CustomerSummary.objects.get().open_jobs, 0)
+
+    def test_queryset_and_user_deletes_cascade(self):
+        """Test cascades started elsewhere don't recreate the summary"""
+        Invoice.objects.create(
+            job=self.job, amount=Decimal("1000.00"), due_date=date.today()
+        )
+        Customer.objects.filter(pk=self.customer.pk).delete()
+        self.assertFalse(CustomerSummary.objects.exists())
+
+    def test_rebuild_command(self):
+        """Test the rebuild command recreates missing summaries"""
+        CustomerSummary.objects.all().delete()
+        call_command("rebuild_customer_summaries", stdout=StringIO())
+        self.assertEqual(CustomerSummary.objects.get().open_jobs, 1)
+
+    def test_customer_list_sorts_by_summary(self):
+        """Test customer_list can sort and filter on summary columns"""
+        other = Customer.objects.create(
+            first_name="Jane",
+            last_name="Roe",
+            email="jane@example.com",
+            phone="0987654321",
+            address="789 Pine St",
+        )
+        User.objects.create_user(
+            username="testuser", password="testpass123", is_staff=True
+        )
+        self.client.login(username="testuser", password="testpass123")
+        response = self.client.get(reverse("customer_list"), {"sort": "-open_jobs"})
+        self.assertEqual(list(response.context["customers"]), [self.customer, other])
+        response = self.client.get(reverse("customer_list"), {"open_jobs": 1})
+        self.assertEqual(list(response.context["customers"]), [self.customer])
+
+
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username="admin", password="adminpass", email="admin@example.com"
+        )
+        self.client.login(username="admin", password="adminpass")
+        self.material = Material.objects.create(
+            name="Cement", unit_price=Decimal("750.00"), unit="bag", supplier="Bamburi"
+        )
+
+    def _add_rows(self, count):
+        for i in range(count):
+            customer = Customer.objects.create(
+                first_name=f"Customer{i}",
+                last_name="Doe",
+                email=f"c{i}@example.com",
+                phone="1234567890",
+                address="123 Main St",
+            )
+            property_obj = Property.objects.create(
+                customer=customer,
+                address="456 Oak Ave",
+                property_type="House",
+                description="Residential property",
+            )
+            estimate = Estimate.objects.create(
+                customer=customer,
+                property_obj=property_obj,
+                visit_date=date.today(),
+                initial_outline="Initial work",
+                detailed_estimate="Detailed estimate",
+                total_cost=Decimal("50000.00"),
+            )
+            job = Job.objects.create(
+                estimate=estimate, start_date=date.today(), scheduled_date=date.today()
+            )
+            JobMaterial.objects.create(
+                job=job, material=self.material, quantity=1, unit_price=750
+            )
+            invoice = Invoice.objects.create(
+                job=job, amount=Decimal("100.00"), due_date=date.today()
+            )
+            Payment.objects.create(
+                invoice=invoice, amount=Decimal("10.00"), payment_method="cash"
+            )
+
+    def _changelist_queries(self, model):
+        url = reverse(f"admin:bidii_builders_{model}_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_have_no_per_row_queries(self):
+        """Test changelist query counts don't grow with the number of rows"""
+        models = [
+            "customer",
+            "property",
+            "estimate",
+            "job",
+            "material",
+            "jobmaterial",
+            "invoice",
+            "payment",
+        ]
+        self._add_rows(2)
+        before = {model: self._changelist_queries(model) for model in models}
+        self._add_rows(3)
+        after = {model: self._changelist_queries(model) for model in models}
+        self.assertEqual(before, after)
+
+    def test_estimated_count_paginator(self):
+        """Test large unfiltered changelists use the estimated count"""
+        from .admin import EstimatedCountPaginator
+
+        self._add_rows(3)
+        paginator = EstimatedCountPaginator(Customer.objects.order_by("pk"), 10)
+        paginator.exact_count_limit = 1
+        # Without table statistics the rows are counted exactly
+        self.assertEqual(paginator.count, Customer.objects.count())
+
+        total = Customer.objects.count()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        Customer.objects.filter(first_name="Customer0").delete()
+        paginator = EstimatedCountPaginator(Customer.objects.order_by("pk"), 10)
+        paginator.exact_count_limit = 1
+        # The statistics' row count, not the exact count of remaining rows
+        self.assertEqual(paginator.count, total)
+        filtered = EstimatedCountPaginator(Customer.objects.filter(last_name="Doe"), 10)
+        self.assertEqual(filtered.count, 2)
+
+
+class ImportDataTest(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+
+    def test_import_reports_row_errors_and_continues(self):
+        """Test invalid rows are reported by line without stopping the import"""
+        from .importer import import_csv
+
+        csv_data = StringIO(
+            "first_name,last_name,email,phone,address\n"
+            "Jane,Wanjiku,jane@example.com,0712345678,Ngong Road\n"
+            "Bad,Email,not-an-email,0712345678,Ngong Road\n"
+            ",Missing,missing@example.com,0712345678,Ngong Road\n"
+            "Peter,Otieno,peter@example.com,0798765432,Thika Road\n"
+        )
+        result = import_csv("customers", csv_data, batch_size=2)
+        self.assertEqual((result.rows, result.created, result.error_count), (4, 2, 2))
+        self.assertEqual([line for line, _ in result.errors], [3, 4])
+        self.assertIn("email", result.errors[0][1])
+        self.assertTrue(Customer.objects.filter(email="peter@example.com").exists())
+
+    def test_property_import_resolves_customers_per_batch(self):
+        """Test property owners are looked up once per batch"""
+        from .importer import import_csv
+
+        csv_data = StringIO(
+            "customer_id,customer_email,address,property_type,description\n"
+            f"{self.customer.pk},,1 Kilimani,House,Bungalow\n"
+            ",john@example.com,2 Kilimani,House,Maisonette\n"
+            ",nobody@example.com,3 Kilimani,House,Flat\n"
+        )
+        with self.assertNumQueries(5):
+            # Owner lookups by id and email, then the savepoint and insert
+            result = import_csv("properties", csv_data)
+        self.assertEqual((result.created, result.error_count), (2, 1))
+        self.assertEqual(Property.objects.filter(customer=self.customer).count(), 2)
+
+    def test_import_command_and_dry_run(self):
+        """Test the import_data command, including --dry-run"""
+        import os
+        import tempfile
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("name,unit_price,unit,supplier\nCement,750,bag,Bamburi\n")
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command("import_data", "materials", f.name, "--dry-run", stdout=out)
+        self.assertIn("Validated 1 of 1 materials", out.getvalue())
+        self.assertFalse(Material.objects.exists())
+        call_command("import_data", "materials", f.name, stdout=StringIO())
+        self.assertTrue(Material.objects.filter(name="Cement").exists())
+
+    def test_upload_view_is_staff_only(self):
+        """Test the upload view imports for staff and redirects customers"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile(
+            "materials.csv", b"name,unit_price,unit,supplier\nSand,1200,ton,Mlolongo\n"
+        )
+        User.objects.create_user(username="customer", password="customerpass")
+        self.client.login(username="customer", password="customerpass")
+        response = self.client.post(reverse("import_data"))
+        self.assertRedirects(
+            response, reverse("customer_dashboard"), fetch_redirect_response=False
+        )
+
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+        response = self.client.post(
+            reverse("import_data"), {"kind": "materials", "csv_file": upload}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"].created, 1)
+        self.assertTrue(Material.objects.filter(name="Sand").exists())
+
+
+class BulkJobMaterialsTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="staff", password="staffpass", is_staff=True
+        )
+        self.client.login(username="staff", password="staffpass")
+        customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        estimate = Estimate.objects.create(
+            customer=customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        self.job = Job.objects.create(
+            estimate=estimate, start_date=date.today(), scheduled_date=date.today()
+        )
+        self.cement = Material.objects.create(
+            name="Cement", unit_price=Decimal("750.00"), unit="bag", supplier="Bamburi"
+        )
+        self.sand = Material.objects.create(
+            name="Sand", unit_price=Decimal("1200.50"), unit="ton", supplier="Mlolongo"
+        )
+
+    def test_form_adds_many_lines_in_one_insert(self):
+        """Test the add form saves every line with catalogue prices"""
+        lines = 40
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("job_materials_add", args=[self.job.id]),
+                {
+                    "material_id": [self.cement.id, self.sand.id] * (lines // 2) + [""],
+                    "quantity": ["2", "1.5"] * (lines // 2) + [""],
+                },
+            )
+        self.assertRedirects(
+            response,
+            reverse("job_detail", args=[self.job.id]),
+            fetch_redirect_response=False,
+        )
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(JobMaterial.objects.filter(job=self.job).count(), lines)
+        sand_line = JobMaterial.objects.filter(material=self.sand).first()
+        self.assertEqual(sand_line.total_price, Decimal("1800.75"))
+
+    def test_json_endpoint_rejects_whole_batch_on_bad_line(self):
+        """Test one bad line saves nothing and reports the line"""
+        url = reverse("job_materials_bulk", args=[self.job.id])
+        response = self.client.post(
+            url,
+            json.dumps(
+                {
+                    "lines": [
+                        {"material_id": self.cement.id, "quantity": "3"},
+                        {"material_id": 9999, "quantity": "1"},
+                        {"material_id": self.sand.id, "quantity": "-1"},
+                    ]
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()["errors"]), 2)
+        self.assertFalse(JobMaterial.objects.exists())
+
+        response = self.client.post(
+            url,
+            json.dumps({"lines": [{"material_id": self.cement.id, "quantity": "3"}]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["total"], "2250.00")
+
+
+class InvoiceBalanceTest(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        estimate = Estimate.objects.create(
+            customer=customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        self.job = Job.objects.create(
+            estimate=estimate, start_date=date.today(), scheduled_date=date.today()
+        )
+        self.invoice = Invoice.objects.create(
+            job=self.job, amount=Decimal("1000.00"), due_date=date.today()
+        )
+
+    def _pay(self, amount, invoice=None):
+        return Payment.objects.create(
+            invoice=invoice or self.invoice, amount=amount, payment_method="cash"
+        )
+
+    def test_partial_payments_add_up_and_settle(self):
+        """Test partial payments reduce the balance and settle the invoice"""
+        self.assertEqual(self.invoice.balance, Decimal("1000.00"))
+        self._pay(Decimal("400.00"))
+        last = self._pay(Decimal("600.00"))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal("1000.00"))
+        self.assertEqual(self.invoice.balance, Decimal("0.00"))
+        self.assertTrue(self.invoice.is_paid)
+        self.assertIsNotNone(self.invoice.paid_date)
+
+        last.delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.balance, Decimal("600.00"))
+        self.assertFalse(self.invoice.is_paid)
+
+    def test_edited_payment_moves_between_invoices(self):
+        """Test editing a payment reverses the old posting"""
+        other = Invoice.objects.create(
+            job=self.job, amount=Decimal("500.00"), due_date=date.today()
+        )
+        payment = self._pay(Decimal("300.00"))
+        payment.amount = Decimal("500.00")
+        payment.invoice = other
+        payment.save()
+        self.invoice.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.invoice.balance, Decimal("1000.00"))
+        self.assertEqual(other.balance, Decimal("0.00"))
+        self.assertTrue(other.is_paid)
+
+    def test_stale_invoice_save_keeps_balance(self):
+        """Test saving a stale invoice instance doesn't undo payments"""
+        stale = Invoice.objects.get(pk=self.invoice.pk)
+        self._pay(Decimal("250.00"))
+        stale.amount = Decimal("1200.00")
+        stale.save()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal("250.00"))
+        self.assertEqual(self.invoice.balance, Decimal("950.00"))
+
+    def test_invoice_edit_keeps_concurrent_settlement(self):
+        """Test the edit view doesn't write back a stale is_paid flag"""
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+
+        def pay_meanwhile(sender, instance, **kwargs):
+            # Settles the invoice after the view loaded it, before it saves
+            pre_save.disconnect(pay_meanwhile, sender=Invoice)
+            self._pay(Decimal("1000.00"))
+
+        pre_save.connect(pay_meanwhile, sender=Invoice)
+        self.addCleanup(pre_save.disconnect, pay_meanwhile, sender=Invoice)
+        self.client.post(
+            reverse("invoice_update", args=[self.invoice.pk]),
+            {
+                "job": self.job.pk,
+                "amount": "1000.00",
+                "due_date": date.today().isoformat(),
+                "notes": "Edited",
+            },
+        )
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.notes, "Edited")
+        self.assertTrue(self.invoice.is_paid)
+        self.assertIsNotNone(self.invoice.paid_date)
+
+    def test_reconcile_repairs_drift(self):
+        """Test reconcile_invoices recomputes drifted balances"""
+        self._pay(Decimal("1000.00"))
+        Invoice.objects.update(amount_paid=0, balance=Decimal("1000.00"), is_paid=False)
+        out = StringIO()
+        call_command("reconcile_invoices", stdout=out)
+        self.assertIn("Repaired 1", out.getvalue())
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.balance, Decimal("0.00"))
+        self.assertTrue(self.invoice.is_paid)
+        self.assertEqual(
+            CustomerSummary.objects.get().outstanding_balance, Decimal("0.00")
+        )
+
+    def test_cent_payments_settle_exactly(self):
+        """Test payments whose float sums leave crumbs still settle and reconcile"""
+        small = Invoice.objects.create(
+            job=self.job, amount=Decimal("2.12"), due_date=date.today()
+        )
+        self._pay(Decimal("0.01"), small)
+        self._pay(Decimal("2.11"), small)
+        other = Invoice.objects.create(
+            job=self.job, amount=Decimal("0.30"), due_date=date.today()
+        )
+        self._pay(Decimal("0.10"), other)
+        self._pay(Decimal("0.20"), other)
+        for invoice in (small, other):
+            invoice.refresh_from_db()
+            self.assertTrue(invoice.is_paid)
+            self.assertEqual(invoice.balance, Decimal("0.00"))
+        self.assertFalse(Invoice.objects.filter(pk=small.pk, balance__gt=0).exists())
+
+        out = StringIO()
+        call_command("reconcile_invoices", "--dry-run", stdout=out)
+        self.assertIn("Found 0 with drift", out.getvalue())
+
+
+class GenerateInvoicesTest(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        self.estimate = Estimate.objects.create(
+            customer=customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        self.material = Material.objects.create(
+            name="Cement", unit_price=Decimal("750.00"), unit="bag", supplier="Bamburi"
+        )
+
+    def _job(self, status="completed", labour="0.00", bags=0):
+        job = Job.objects.create(
+            estimate=self.estimate,
+            start_date=date.today(),
+            scheduled_date=date.today(),
+            status=status,
+            labour_cost=Decimal(labour),
+        )
+        if bags:
+            JobMaterial.objects.create(
+                job=job, material=self.material, quantity=bags, unit_price=750
+            )
+        return job
+
+    def test_invoices_only_completed_uninvoiced_jobs(self):
+        """Test amounts are materials plus labour and billed jobs are skipped"""
+        billable = self._job(labour="5000.00", bags=2)
+        labour_only = self._job(labour="1200.00")
+        self._job(status="in_progress", bags=1)
+        nothing_to_bill = self._job()
+        invoiced = self._job(bags=1)
+        Invoice.objects.create(job=invoiced, amount=750, due_date=date.today())
+
+        out = StringIO()
+        call_command("generate_invoices", "--dry-run", stdout=out)
+        self.assertIn("Would create 2 invoices", out.getvalue())
+        self.assertEqual(Invoice.objects.count(), 1)
+
+        call_command("generate_invoices", stdout=StringIO())
+        self.assertEqual(Invoice.objects.get(job=billable).balance, Decimal("6500.00"))
+        self.assertEqual(
+            Invoice.objects.get(job=labour_only).amount, Decimal("1200.00")
+        )
+        self.assertFalse(Invoice.objects.filter(job=nothing_to_bill).exists())
+        self.assertEqual(
+            CustomerSummary.objects.get().outstanding_balance, Decimal("8450.00")
+        )
+
+    def test_eligible_jobs_found_in_one_query(self):
+        """Test the anti-join and amount aggregate run as a single query"""
+        from .invoicing import uninvoiced_jobs
+
+        for _ in range(3):
+            self._job(labour="100.00", bags=2)
+        with self.assertNumQueries(1):
+            rows = list(uninvoiced_jobs())
+        self.assertEqual([amount for _, _, amount in rows], [Decimal("1600.00")] * 3)
+
+    def test_job_update_keeps_labour_cost(self):
+        """Test an update form without a labour field leaves the cost alone"""
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+        job = self._job(status="in_progress", labour="500.00")
+        self.client.post(
+            reverse("job_update", args=[job.pk]),
+            {
+                "estimate": self.estimate.pk,
+                "start_date": date.today().isoformat(),
+                "scheduled_date": date.today().isoformat(),
+                "status": "completed",
+            },
+        )
+        job.refresh_from_db()
+        self.assertEqual(
+            (job.status, job.labour_cost), ("completed", Decimal("500.00"))
+        )
+
+    def test_job_update_edits_labour_cost(self):
+        """Test the update form shows the labour cost and can change or clear it"""
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+        job = self._job(status="in_progress", labour="500.00")
+        url = reverse("job_update", args=[job.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'name="labour_cost" value="500.00"')
+
+        data = {
+            "estimate": self.estimate.pk,
+            "start_date": date.today().isoformat(),
+            "scheduled_date": date.today().isoformat(),
+            "status": "in_progress",
+        }
+        for posted, expected in [("650.50", "650.50"), ("", "0.00")]:
+            self.client.post(url, {**data, "labour_cost": posted})
+            job.refresh_from_db()
+            self.assertEqual(job.labour_cost, Decimal(expected))
+
+
+class JobMaterialsTotalTest(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        estimate = Estimate.objects.create(
+            customer=customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        self.job = Job.objects.create(
+            estimate=estimate, start_date=date.today(), scheduled_date=date.today()
+        )
+        self.other_job = Job.objects.create(
+            estimate=estimate, start_date=date.today(), scheduled_date=date.today()
+        )
+        self.cement = Material.objects.create(
+            name="Cement", unit_price=Decimal("750.00"), unit="bag", supplier="Bamburi"
+        )
+
+    def _total(self, job):
+        job.refresh_from_db()
+        return job.materials_total
+
+    def test_saves_edits_and_deletes_apply_deltas(self):
+        """Test single-row writes move materials_total by the line's cost"""
+        line = JobMaterial.objects.create(
+            job=self.job, material=self.cement, quantity=2, unit_price=750
+        )
+        self.assertEqual(self._total(self.job), Decimal("1500.00"))
+        line.quantity = 3
+        line.save()
+        self.assertEqual(self._total(self.job), Decimal("2250.00"))
+        line.job = self.other_job
+        line.save()
+        self.assertEqual(self._total(self.job), Decimal("0.00"))
+        self.assertEqual(self._total(self.other_job), Decimal("2250.00"))
+        line.delete()
+        self.assertEqual(self._total(self.other_job), Decimal("0.00"))
+
+    def test_bulk_add_and_stale_job_save(self):
+        """Test bulk-created lines count and a stale job save keeps the total"""
+        from .materials import add_job_materials
+
+        stale = Job.objects.get(pk=self.job.pk)
+        add_job_materials(self.job, [(self.cement.pk, "2"), (self.cement.pk, "1")])
+        stale.notes = "Roof done"
+        stale.save()
+        self.assertEqual(self._total(self.job), Decimal("2250.00"))
+
+    def test_verify_command_fixes_drift(self):
+        """Test verify_materials_totals recomputes drifted jobs"""
+        JobMaterial.objects.create(
+            job=self.job, material=self.cement, quantity=2, unit_price=750
+        )
+        Job.objects.update(materials_total=Decimal("99.00"))
+        out = StringIO()
+        call_command("verify_materials_totals", "--chunk-size", "1", stdout=out)
+        self.assertIn("Checked 2 jobs. Repaired 2", out.getvalue())
+        self.assertEqual(self._total(self.job), Decimal("1500.00"))
+        self.assertEqual(self._total(self.other_job), Decimal("0.00"))
+
+    def test_cent_lines_add_up_exactly(self):
+        """Test line costs whose float sum leaves crumbs are stored to the cent"""
+        nails = Material.objects.create(
+            name="Nails", unit_price=Decimal("0.10"), unit="piece", supplier="Hardware"
+        )
+        for quantity in (Decimal("1"), Decimal("2")):
+            JobMaterial.objects.create(
+                job=self.job,
+                material=nails,
+                quantity=quantity,
+                unit_price=Decimal("0.10"),
+            )
+        self.assertTrue(
+            Job.objects.filter(pk=self.job.pk, materials_total=Decimal("0.30")).exists()
+        )
+        out = StringIO()
+        call_command("verify_materials_totals", "--dry-run", stdout=out)
+        self.assertIn("Found 0 with drift", out.getvalue())
+
+
+class MaterialPriceUpdateTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+        customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        estimate = Estimate.objects.create(
+            customer=customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        self.open_job = Job.objects.create(
+            estimate=estimate, start_date=date.today(), scheduled_date=date.today()
+        )
+        self.done_job = Job.objects.create(
+            estimate=estimate,
+            start_date=date.today(),
+            scheduled_date=date.today(),
+            status="completed",
+        )
+        self.cement = Material.objects.create(
+            name="Cement", unit_price=Decimal("750.00"), unit="bag", supplier="Bamburi"
+        )
+        self.sand = Material.objects.create(
+            name="Sand", unit_price=Decimal("1200.00"), unit="ton", supplier="Mlolongo"
+        )
+        for job in (self.open_job, self.done_job):
+            JobMaterial.objects.create(
+                job=job, material=self.cement, quantity=2, unit_price=750
+            )
+
+    def _post_prices(self, prices, reprice=False):
+        return self.client.post(
+            reverse("material_prices_api"),
+            json.dumps({"prices": prices, "reprice_open_jobs": reprice}),
+            content_type="application/json",
+        )
+
+    def test_prices_update_without_touching_jobs(self):
+        """Test the catalogue changes in one UPDATE and job lines keep prices"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post_prices(
+                [
+                    {"material_id": self.cement.pk, "unit_price": "800.00"},
+                    {"name": "Sand", "supplier": "Mlolongo", "unit_price": "1250"},
+                ]
+            )
+        self.assertEqual(response.json()["materials"], 2)
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.sand.refresh_from_db()
+        self.assertEqual(self.sand.unit_price, Decimal("1250.00"))
+        self.assertEqual(
+            JobMaterial.objects.filter(unit_price=Decimal("750.00")).count(), 2
+        )
+
+    def test_reprice_open_jobs(self):
+        """Test only open jobs' lines and totals take the new price"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post_prices(
+                [{"material_id": self.cement.pk, "unit_price": "800.50"}],
+                reprice=True,
+            )
+        self.assertEqual(response.json()["job_lines"], 1)
+        # The affected jobs are picked by a subquery, not read into Python
+        line_reads = [
+            q
+            for q in queries
+            if q["sql"].startswith("SELECT")
+            and "bidii_builders_jobmaterial" in q["sql"]
+        ]
+        self.assertEqual(line_reads, [])
+        self.open_job.refresh_from_db()
+        self.done_job.refresh_from_db()
+        self.assertEqual(self.open_job.materials_total, Decimal("1601.00"))
+        self.assertEqual(self.done_job.materials_total, Decimal("1500.00"))
+        line = JobMaterial.objects.get(job=self.open_job)
+        self.assertEqual(line.total_price, Decimal("1601.00"))
+
+    def test_bad_row_changes_nothing(self):
+        """Test any invalid row rejects the whole price list"""
+        response = self._post_prices(
+            [
+                {"material_id": self.cement.pk, "unit_price": "800"},
+                {"material_id": 9999, "unit_price": "1"},
+                {"name": "Gravel", "unit_price": "1"},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()["errors"]), 2)
+        self.cement.refresh_from_db()
+        self.assertEqual(self.cement.unit_price, Decimal("750.00"))
+
+
+class BulkStatusTransitionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        self.estimates = [
+            Estimate.objects.create(
+                customer=self.customer,
+                visit_date=date.today(),
+                initial_outline="Initial work",
+                detailed_estimate="Detailed estimate",
+                status=status,
+            )
+            for status in ["pending", "pending", "completed"]
+        ]
+
+    def test_estimates_sent_in_one_update(self):
+        """Test valid rows move with sent_date stamped; invalid ones are skipped"""
+        ids = [estimate.pk for estimate in self.estimates]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("estimate_bulk_status"), {"ids": ids, "status": "sent"}
+            )
+        updates = [
+            q
+            for q in queries
+            if q["sql"].startswith('UPDATE "bidii_builders_estimate"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertRedirects(response, reverse("estimate_list"))
+        sent = Estimate.objects.filter(status="sent")
+        self.assertEqual(sent.count(), 2)
+        self.assertFalse(sent.filter(sent_date__isnull=True).exists())
+        self.assertEqual(Estimate.objects.filter(status="completed").count(), 1)
+
+    def test_jobs_completed_refresh_dashboard_and_summary(self):
+        """Test completing jobs stamps end_date and expires cached aggregates"""
+        jobs = [
+            Job.objects.create(
+                estimate=self.estimates[0],
+                start_date=date.today(),
+                scheduled_date=date.today(),
+                status="in_progress",
+            )
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            self.client.get(reverse("dashboard")).context["active_jobs"], 3
+        )
+        self.client.post(
+            reverse("job_bulk_status"),
+            {"ids": [job.pk for job in jobs], "status": "completed"},
+        )
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["active_jobs"], 0)
+        self.assertEqual(response.context["completed_jobs"], 3)
+        self.assertEqual(Job.objects.filter(end_date=date.today()).count(), 3)
+        self.assertEqual(CustomerSummary.objects.get().open_jobs, 0)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ProvisionAccountsTest(TestCase):
+    def setUp(self):
+        self.customers = [
+            Customer.objects.create(
+                first_name=f"Customer{i}",
+                last_name="Doe",
+                email=f"customer{i}@example.com",
+                phone="1234567890",
+                address="123 Main St",
+            )
+            for i in range(10)
+        ]
+
+    def test_bulk_provisioning_links_customers(self):
+        """Test users are hashed in a pool, inserted in bulk and linked back"""
+        with CaptureQueriesContext(connection) as queries:
+            run = provision_accounts(Customer.objects.all(), workers=2)
+        inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "auth_user"')]
+        links = [
+            q
+            for q in queries
+            if q["sql"].startswith('UPDATE "bidii_builders_customer"')
+        ]
+        self.assertEqual((len(inserts), len(links)), (1, 1))
+        self.assertEqual(len(run.accounts), 10)
+        for customer in Customer.objects.select_related("user"):
+            self.assertEqual(customer.user.username, customer.email)
+            self.assertTrue(customer.user.has_usable_password())
+
+        # Already linked customers are left alone on a second run
+        again = provision_accounts(Customer.objects.all(), workers=1)
+        self.assertEqual(again.accounts, [])
+        self.assertEqual(User.objects.count(), 10)
+
+    def test_login_link_sets_password_once(self):
+        """Test the one-time link lets the customer choose a password"""
+        customer = self.customers[0]
+        (account,) = provision_accounts(
+            Customer.objects.filter(pk=customer.pk)
+        ).accounts
+        response = self.client.get(account.login_path, follow=True)
+        self.assertTrue(response.context["validlink"])
+        form_url = response.redirect_chain[-1][0]
+        self.client.post(
+            form_url,
+            {"new_password1": "n3w-Passw0rd!", "new_password2": "n3w-Passw0rd!"},
+        )
+        self.assertTrue(
+            self.client.login(username=customer.email, password="n3w-Passw0rd!")
+        )
+        self.client.logout()
+        response = self.client.get(account.login_path, follow=True)
+        self.assertFalse(response.context["validlink"])
+
+    def test_command_reports_skipped_customers(self):
+        """Test customers without a usable email are skipped, not failed"""
+        User.objects.create_user(username="customer1@example.com")
+        Customer.objects.filter(pk=self.customers[2].pk).update(email="")
+        self.customers[3].email = "CUSTOMER0@example.com"
+        self.customers[3].save()
+        out = StringIO()
+        err = StringIO()
+        call_command(
+            "provision_accounts",
+            "--workers=1",
+            "--base-url=https://portal.example.com/",
+            stdout=out,
+            stderr=err,
+        )
+        rows = out.getvalue().splitlines()
+        self.assertEqual(rows[0], "customer_id,username,login_url")
+        self.assertEqual(len(rows), 8)
+        self.assertIn("https://portal.example.com/reset/", rows[1])
+        self.assertIn("a user with this email exists", err.getvalue())
+        self.assertIn("no email address", err.getvalue())
+        self.assertIn("email repeated in this batch", err.getvalue())
+
+
+class CustomerDedupTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Kamau",
+            email="John.Kamau@gmail.com",
+            phone="0712 345 678",
+            address="123 Main St",
+        )
+
+    def test_contact_normalization(self):
+        """Test Kenyan phone spellings and Gmail aliases share one key"""
+        for phone in ["0712345678", "+254 712 345 678", "254712345678", "712345678"]:
+            self.assertEqual(normalize_phone(phone), "254712345678")
+        self.assertEqual(normalize_phone("0112-345-678"), "254112345678")
+        self.assertEqual(normalize_phone("n/a"), "")
+        self.assertEqual(
+            normalize_email(" j.ohnkamau+site@GoogleMail.com "),
+            "johnkamau@gmail.com",
+        )
+        self.assertEqual(self.customer.phone_key, "254712345678")
+
+    def test_find_and_merge_duplicates(self):
+        """Test blocked pairs are scored, clustered and merged in bulk"""
+        duplicate = Customer.objects.create(
+            first_name="John",
+            last_name="Kamau",
+            email="johnkamau@gmail.com",
+            phone="+254712345678",
+            address="",
+        )
+        Customer.objects.create(
+            first_name="Mary",
+            last_name="Kamau",
+            email="mary@example.com",
+            phone="0712345678",
+            address="123 Main St",
+        )
+        prop = Property.objects.create(
+            customer=duplicate, address="Plot 9", property_type="House"
+        )
+        estimate = Estimate.objects.create(
+            customer=duplicate,
+            property_obj=prop,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+
+        run = find_duplicates()
+        self.assertEqual(run.clusters, [[self.customer.pk, duplicate.pk]])
+        self.assertEqual(run.pairs[0].reasons, ["email", "phone", "name"])
+
+        out = StringIO()
+        call_command("dedupe_customers", "--merge", stdout=out)
+        self.assertIn("Merged away 1 customers", out.getvalue())
+        self.assertFalse(Customer.objects.filter(pk=duplicate.pk).exists())
+        prop.refresh_from_db()
+        estimate.refresh_from_db()
+        self.assertEqual(prop.customer_id, self.customer.pk)
+        self.assertEqual(estimate.customer_id, self.customer.pk)
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_create_and_register_check_for_duplicates(self):
+        """Test the create form warns and self-registration is refused"""
+        self.client.login(username="staff", password="staffpass")
+        data = {
+            "first_name": "John",
+            "last_name": "Kamau",
+            "email": "johnkamau@gmail.com",
+            "phone": "254712345678",
+            "address": "123 Main St",
+        }
+        response = self.client.post(reverse("customer_create"), data)
+        self.assertEqual(list(response.context["duplicates"]), [self.customer])
+        self.assertEqual(Customer.objects.count(), 1)
+
+        response = self.client.post(
+            reverse("customer_create"), {**data, "confirm_duplicate": "on"}
+        )
+        self.assertEqual(Customer.objects.count(), 2)
+
+        response = self.client.post(
+            reverse("customer_register"),
+            {**data, "username": "johnk", "password": "secret123"},
+        )
+        self.assertContains(response, "We already have your details on file")
+        self.assertFalse(User.objects.filter(username="johnk").exists())
+
+
+class StatementImportTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="0712 345 678",
+            address="123 Main St",
+        )
+        estimate = Estimate.objects.create(
+            customer=customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        job = Job.objects.create(
+            estimate=estimate, start_date=date.today(), scheduled_date=date.today()
+        )
+        self.first, self.second = [
+            Invoice.objects.create(job=job, amount=amount, due_date=date.today())
+            for amount in (Decimal("1000.00"), Decimal("500.00"))
+        ]
+        self.statement = (
+            "Receipt No.,Completion Time,Paid In,MSISDN,Account Reference\n"
+            f"QA1,2026-10-01 09:00,1000.00,254700000000,INV-{self.first.pk}\n"
+            "QA2,2026-10-01 10:00,500.00,+254712345678,\n"
+            "QA3,2026-10-01 11:00,200.00,0799000000,\n"
+            "QA1,2026-10-01 09:00,1000.00,254700000000,\n"
+            "QA4,2026-10-01 12:00,,0712345678,\n"
+        )
+
+    def test_lines_matched_and_posted_in_bulk(self):
+        """Test matched lines become payments and settle invoices set-based"""
+        from .statements import import_statement
+
+        with CaptureQueriesContext(connection) as queries:
+            result = import_statement(StringIO(self.statement))
+        inserts = [
+            q
+            for q in queries
+            if q["sql"].startswith('INSERT INTO "bidii_builders_payment"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            (result.matched, result.unmatched, result.duplicates), (2, 2, 1)
+        )
+        self.assertEqual(result.total, Decimal("1500.00"))
+        for invoice in (self.first, self.second):
+            invoice.refresh_from_db()
+            self.assertTrue(invoice.is_paid)
+            self.assertEqual(invoice.balance, Decimal("0.00"))
+        self.assertEqual(
+            set(Payment.objects.values_list("reference_number", flat=True)),
+            {"QA1", "QA2"},
+        )
+        self.assertEqual(
+            dict(
+                UnmatchedStatementLine.objects.values_list("transaction_id", "reason")
+            ),
+            {"QA3": "no open invoice for this phone", "QA4": "not a payment in"},
+        )
+        self.assertEqual(
+            CustomerSummary.objects.get().outstanding_balance, Decimal("0.00")
+        )
+
+        # Importing the same statement again posts nothing twice
+        again = import_statement(StringIO(self.statement))
+        self.assertEqual((again.matched, again.duplicates), (0, 5))
+        self.assertEqual(UnmatchedStatementLine.objects.count(), 2)
+
+    def test_cent_lines_settle_exactly(self):
+        """Test statement lines whose float sum leaves crumbs settle the invoice"""
+        from .statements import import_statement
+
+        small = Invoice.objects.create(
+            job=self.first.job, amount=Decimal("2.12"), due_date=date.today()
+        )
+        statement = (
+            "transaction_id,amount,phone,reference\n"
+            f"QD1,0.01,0712345678,INV-{small.pk}\n"
+            f"QD2,2.11,0712345678,INV-{small.pk}\n"
+        )
+        import_statement(StringIO(statement), batch_size=1)
+        small.refresh_from_db()
+        self.assertTrue(small.is_paid)
+        self.assertEqual(small.balance, Decimal("0.00"))
+
+    def test_reference_needs_phone_or_amount(self):
+        """Test a number in a free-text reference can't pay a stranger's invoice"""
+        from .statements import import_statement
+
+        statement = (
+            "transaction_id,amount,phone,reference\n"
+            f"QC1,300.00,0799000000,Plot {self.first.pk}\n"
+            f"QC2,250.00,0712345678,Plot {self.second.pk}\n"
+        )
+        result = import_statement(StringIO(statement))
+        self.assertEqual((result.matched, result.unmatched), (1, 1))
+        self.assertEqual(
+            UnmatchedStatementLine.objects.get().reason,
+            f"no open invoice #{self.first.pk} for this phone or amount",
+        )
+        self.assertEqual(Payment.objects.get().invoice, self.second)
+
+    def test_upload_view(self):
+        """Test staff can upload a statement and a dry run saves nothing"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        self.client.login(username="staff", password="staffpass")
+        upload = SimpleUploadedFile("statement.csv", self.statement.encode())
+        response = self.client.post(
+            reverse("statement_import"), {"csv_file": upload, "dry_run": "1"}
+        )
+        self.assertEqual(response.context["result"].matched, 2)
+        self.assertFalse(Payment.objects.exists())
+
+        upload = SimpleUploadedFile("statement.csv", b"date,amount\n2026-10-01,5\n")
+        response = self.client.post(reverse("statement_import"), {"csv_file": upload})
+        self.assertContains(response, "needs transaction_id and amount columns")
+
+
+class BackgroundDeletionTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        prop = Property.objects.create(
+            customer=self.customer, address="Plot 9", property_type="House"
+        )
+        estimate = Estimate.objects.create(
+            customer=self.customer,
+            property_obj=prop,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        self.job = Job.objects.create(
+            estimate=estimate, start_date=date.today(), scheduled_date=date.today()
+        )
+        material = Material.objects.create(
+            name="Cement", unit_price=Decimal("750.00"), unit="bag", supplier="Bamburi"
+        )
+        JobMaterial.objects.create(
+            job=self.job,
+            material=material,
+            quantity=Decimal("2"),
+            unit_price=material.unit_price,
+            total_price=Decimal("1500.00"),
+        )
+        invoice = Invoice.objects.create(
+            job=self.job, amount=Decimal("1500.00"), due_date=date.today()
+        )
+        Payment.objects.create(
+            invoice=invoice, amount=Decimal("500.00"), payment_method="cash"
+        )
+
+    def test_customer_hidden_then_deleted_in_chunks(self):
+        """Test the delete view only queues; the command removes the graph"""
+        response = self.client.post(reverse("customer_delete", args=[self.customer.pk]))
+        self.assertRedirects(response, reverse("customer_list"))
+        self.assertTrue(Customer.objects.filter(pk=self.customer.pk).exists())
+        response = self.client.get(reverse("customer_list"))
+        self.assertNotContains(response, "john@example.com")
+        response = self.client.get(reverse("customer_detail", args=[self.customer.pk]))
+        self.assertEqual(response.status_code, 404)
+
+        out = StringIO()
+        call_command("process_deletions", "--chunk-size=1", stdout=out)
+        self.assertIn("1 payments (1 rows so far)", out.getvalue())
+        self.assertIn("Finished 1 of 1 queued deletions", out.getvalue())
+        deletion = DeletionRequest.objects.get()
+        self.assertEqual((deletion.status, deletion.rows_deleted), ("done", 8))
+        for model in (Customer, Property, Estimate, Job, JobMaterial, Invoice, Payment):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertTrue(Material.objects.exists())
+
+    def test_job_deletion_refreshes_customer_summary(self):
+        """Test a queued job disappears from lists and its balance from totals"""
+        self.assertEqual(
+            CustomerSummary.objects.get().outstanding_balance, Decimal("1000.00")
+        )
+        self.client.post(reverse("job_delete", args=[self.job.pk]))
+        response = self.client.get(reverse("job_list"))
+        self.assertNotIn(self.job, response.context["jobs"])
+
+        call_command("process_deletions", stdout=StringIO())
+        self.assertFalse(Job.objects.exists())
+        self.assertTrue(Customer.objects.filter(pk=self.customer.pk).exists())
+        self.assertEqual(
+            CustomerSummary.objects.get().outstanding_balance, Decimal("0.00")
+        )
+
+    def test_pending_graph_not_billed_or_paid(self):
+        """Test a customer queued for deletion is no longer invoiced or paid"""
+        from .deletion import request_deletion
+        from .invoicing import generate_invoices
+        from .statements import import_statement
+
+        Job.objects.create(
+            estimate=self.job.estimate,
+            start_date=date.today(),
+            scheduled_date=date.today(),
+            status="completed",
+        )
+        invoice = Invoice.objects.get()
+        request_deletion(self.customer)
+
+        self.assertEqual(generate_invoices().created, [])
+        response = self.client.get(reverse("invoice_list"))
+        self.assertNotIn(invoice, response.context["invoices"])
+        response = self.client.get(reverse("payment_list"))
+        self.assertEqual(len(response.context["payments"]), 0)
+        response = self.client.post(
+            reverse("payment_create"),
+            {"invoice": invoice.pk, "amount": "100", "payment_method": "cash"},
+        )
+        self.assertEqual(response.status_code, 404)
+        result = import_statement(
+            StringIO(
+                "transaction_id,amount,phone,reference\n"
+                f"QX1,100,1234567890,INV-{invoice.pk}\n"
+            )
+        )
+        self.assertEqual((result.matched, result.unmatched), (0, 1))
+        self.assertEqual(Payment.objects.count(), 1)
+
+
+class ArchiveClosedJobsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        estimate = Estimate.objects.create(
+            customer=self.customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        material = Material.objects.create(
+            name="Cement", unit_price=Decimal("750.00"), unit="bag", supplier="Bamburi"
+        )
+        self.jobs = {}
+        for name, status in [
+            ("settled", "completed"),
+            ("unpaid", "completed"),
+            ("uninvoiced", "completed"),
+            ("cancelled", "cancelled"),
+        ]:
+            job = Job.objects.create(
+                estimate=estimate,
+                start_date=date.today(),
+                scheduled_date=date.today(),
+                status=status,
+            )
+            self.jobs[name] = job
+        JobMaterial.objects.create(
+            job=self.jobs["settled"],
+            material=material,
+            quantity=Decimal("2"),
+            unit_price=material.unit_price,
+            total_price=Decimal("1500.00"),
+        )
+        settled = Invoice.objects.create(
+            job=self.jobs["settled"], amount=Decimal("1500.00"), due_date=date.today()
+        )
+        Payment.objects.create(
+            invoice=settled,
+            amount=Decimal("1500.00"),
+            payment_method="M-Pesa",
+            reference_number="QA1",
+        )
+        Invoice.objects.create(
+            job=self.jobs["unpaid"], amount=Decimal("800.00"), due_date=date.today()
+        )
+        Job.objects.update(updated_at=timezone.now() - timezone.timedelta(days=400))
+
+    def test_only_closed_and_settled_jobs_move(self):
+        """Test settled and cancelled jobs are archived with all their rows"""
+        from .models import (
+            ArchivedInvoice,
+            ArchivedJob,
+            ArchivedJobMaterial,
+            ArchivedPayment,
+        )
+
+        revenue = CustomerSummary.objects.get().lifetime_revenue
+        out = StringIO()
+        call_command("archive_closed_jobs", "--chunk-size=1", stdout=out)
+        self.assertIn("Archived 2 jobs", out.getvalue())
+        self.assertEqual(
+            set(ArchivedJob.objects.values_list("pk", flat=True)),
+            {self.jobs["settled"].pk, self.jobs["cancelled"].pk},
+        )
+        self.assertEqual(
+            set(Job.objects.values_list("pk", flat=True)),
+            {self.jobs["unpaid"].pk, self.jobs["uninvoiced"].pk},
+        )
+        self.assertEqual(
+            ArchivedJobMaterial.objects.get().customer_id, self.customer.pk
+        )
+        self.assertEqual(ArchivedInvoice.objects.get().amount, Decimal("1500.00"))
+        self.assertEqual(ArchivedPayment.objects.get().amount, Decimal("1500.00"))
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(CustomerSummary.objects.get().lifetime_revenue, revenue)
+
+        # A second run finds nothing left to move
+        call_command("archive_closed_jobs", stdout=StringIO())
+        self.assertEqual(ArchivedJob.objects.count(), 2)
+
+    def test_merge_moves_archived_history(self):
+        """Test merging customers re-points their archived rows too"""
+        from .models import ArchivedInvoice, ArchivedJob, ArchivedPayment
+
+        survivor = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john.doe@example.com",
+            phone="",
+            address="",
+        )
+        call_command("archive_closed_jobs", stdout=StringIO())
+        merge_customers(survivor, [self.customer])
+
+        for archive_model in (ArchivedJob, ArchivedInvoice, ArchivedPayment):
+            self.assertEqual(
+                set(archive_model.objects.values_list("customer_id", flat=True)),
+                {survivor.pk},
+            )
+        self.assertEqual(
+            CustomerSummary.objects.get(customer=survivor).lifetime_revenue,
+            Decimal("1500.00"),
+        )
+
+    def test_statement_skips_archived_payments(self):
+        """Test re-importing a statement does not repost archived payments"""
+        from .statements import import_statement
+
+        call_command("archive_closed_jobs", stdout=StringIO())
+        result = import_statement(
+            StringIO(
+                "Receipt No.,Completion Time,Paid In,MSISDN,Account Reference\n"
+                "QA1,2026-10-01 09:00,1500.00,254700000000,\n"
+            )
+        )
+        self.assertEqual((result.matched, result.duplicates), (0, 1))
+        self.assertFalse(Payment.objects.exists())
+
+    def test_chunk_rechecks_jobs_and_reads_late_rows(self):
+        """Test a chunk moves rows added after selection and skips reopened jobs"""
+        from .archive import _archive_chunk, archivable_jobs
+        from .models import ArchivedJob, ArchivedJobMaterial
+
+        cutoff = timezone.now() - timezone.timedelta(days=365)
+        job_ids = list(archivable_jobs(cutoff).values_list("pk", flat=True))
+        JobMaterial.objects.create(
+            job=self.jobs["cancelled"],
+            material=Material.objects.get(),
+            quantity=Decimal("1"),
+            unit_price=Decimal("750.00"),
+            total_price=Decimal("750.00"),
+        )
+        Invoice.objects.filter(job=self.jobs["settled"]).update(is_paid=False)
+
+        self.assertEqual(_archive_chunk(job_ids, cutoff), (1, 2, {self.customer.pk}))
+        self.assertEqual(ArchivedJob.objects.get().pk, self.jobs["cancelled"].pk)
+        self.assertEqual(
+            ArchivedJobMaterial.objects.get().job_id, self.jobs["cancelled"].pk
+        )
+        self.assertTrue(Job.objects.filter(pk=self.jobs["settled"].pk).exists())
+
+    def test_reports_include_archive(self):
+        """Test job lists show live jobs only while reports see the union"""
+        call_command("archive_closed_jobs", stdout=StringIO())
+        response = self.client.get(reverse("job_list"))
+        self.assertEqual(len(response.context["jobs"]), 2)
+
+        response = self.client.get(reverse("reports"))
+        self.assertEqual(response.context["total_jobs"], 4)
+        self.assertEqual(response.context["total_revenue"], Decimal("1500.00"))
+        self.assertEqual(response.context["job_status_counts"]["Completed"], 3)
+        self.assertEqual(
+            self.client.get(reverse("dashboard")).context["completed_jobs"], 3
+        )
+        charts = self.client.get(reverse("charts_data")).json()
+        self.assertEqual(
+            sum(item["revenue"] for item in charts["revenue_data"]), 1500.0
+        )
+
+
+class AuditLogTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(
+            username="staff", password="staffpass", is_staff=True
+        )
+        self.client.login(username="staff", password="staffpass")
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        self.estimate = Estimate.objects.create(
+            customer=self.customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+
+    def test_create_update_delete(self):
+        """Test saves and deletes are logged with their field changes"""
+        with self.captureOnCommitCallbacks(execute=True):
+            job = Job.objects.create(
+                estimate=self.estimate,
+                start_date=date.today(),
+                scheduled_date=date.today(),
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            job = Job.objects.get(pk=job.pk)
+            job.notes = "Roof first"
+            job.labour_cost = "2500"
+            job.save()
+            # Saving again with nothing changed adds no entry
+            job.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            job.delete()
+        audit.flush()
+
+        entries = list(AuditLog.objects.filter(model_name="job").order_by("pk"))
+        self.assertEqual([e.action for e in entries], ["create", "update", "delete"])
+        self.assertEqual(entries[0].changes["status"], "scheduled")
+        self.assertEqual(
+            entries[1].changes,
+            {"notes": ["", "Roof first"], "labour_cost": ["0.00", "2500"]},
+        )
+        self.assertEqual(entries[2].changes["notes"], "Roof first")
+
+    def test_bulk_settlement_archive_and_deletion_are_logged(self):
+        """Test the paths that bypass signals still leave audit entries"""
+        from .archive import archive_closed_jobs
+        from .deletion import process_deletion, request_deletion
+        from .statements import import_statement
+
+        archived, deleted = [
+            Job.objects.create(
+                estimate=self.estimate,
+                start_date=date.today(),
+                scheduled_date=date.today(),
+                status="completed",
+            )
+            for _ in range(2)
+        ]
+        paid = Invoice.objects.create(
+            job=archived, amount=Decimal("1000.00"), due_date=date.today()
+        )
+        Invoice.objects.create(
+            job=deleted, amount=Decimal("500.00"), due_date=date.today()
+        )
+        audit.flush()
+        AuditLog.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            import_statement(
+                StringIO(
+                    "transaction_id,amount,phone,reference\n"
+                    f"QB1,1000,1234567890,INV-{paid.pk}\n"
+                )
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_closed_jobs(cutoff=timezone.now() + timezone.timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            process_deletion(request_deletion(deleted))
+        audit.flush()
+
+        entries = {
+            (e.model_name, e.object_id, e.action): e.changes
+            for e in AuditLog.objects.all()
+        }
+        self.assertEqual(
+            entries[("invoice", paid.pk, "update")],
+            {"is_paid": [False, True], "paid_date": [None, date.today().isoformat()]},
+        )
+        deletes = {
+            model: {
+                pk
+                for name, pk, action in entries
+                if (name, action) == (model, "delete")
+            }
+            for model in ("job", "invoice", "payment")
+        }
+        self.assertEqual(deletes["job"], {archived.pk, deleted.pk})
+        self.assertEqual(len(deletes["invoice"]), 2)
+        self.assertEqual(len(deletes["payment"]), 1)
+        self.assertEqual(entries[("job", deleted.pk, "delete")]["status"], "completed")
+
+    def test_rolled_back_writes_are_not_logged(self):
+        """Test entries are only buffered once their transaction commits"""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Job.objects.create(
+                        estimate=self.estimate,
+                        start_date=date.today(),
+                        scheduled_date=date.today(),
+                    )
+                    raise ValueError
+            except ValueError:
+                pass
+        audit.flush()
+        self.assertFalse(AuditLog.objects.filter(model_name="job").exists())
+
+    def test_bulk_transition_is_logged_with_one_insert(self):
+        """Test a bulk status change is attributed and flushed in one INSERT"""
+        jobs = [
+            Job.objects.create(
+                estimate=self.estimate,
+                start_date=date.today(),
+                scheduled_date=date.today(),
+            )
+            for _ in range(3)
+        ]
+        audit.flush()
+        AuditLog.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("job_bulk_status"),
+                {"ids": [job.pk for job in jobs], "status": "in_progress"},
+            )
+        with CaptureQueriesContext(connection) as queries:
+            audit.flush()
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        entries = AuditLog.objects.all()
+        self.assertEqual(len(entries), 3)
+        for entry in entries:
+            self.assertEqual(entry.action, "update")
+            self.assertEqual(entry.changes, {"status": ["scheduled", "in_progress"]})
+            self.assertEqual(entry.user, self.staff)
+
+    def test_audit_view_pages_by_key(self):
+        """Test the audit page filters and follows the ``before`` cursor"""
+        AuditLog.objects.bulk_create(
+            AuditLog(model_name="job", object_id=pk, action="update", changes={})
+            for pk in range(1, 6)
+        )
+        AuditLog.objects.create(model_name="invoice", object_id=1, action="create")
+        with mock.patch("bidii_builders.views.AUDIT_PAGE_SIZE", 2):
+            response = self.client.get(reverse("audit_log"), {"model": "job"})
+            self.assertEqual([e.object_id for e in response.context["entries"]], [5, 4])
+            response = self.client.get(
+                reverse("audit_log") + "?" + response.context["next_query"]
+            )
+            self.assertEqual([e.object_id for e in response.context["entries"]], [3, 2])
+            response = self.client.get(
+                reverse("audit_log") + "?" + response.context["next_query"]
+            )
+            self.assertEqual([e.object_id for e in response.context["entries"]], [1])
+            self.assertIsNone(response.context["next_query"])
+
+
+class CompressedTextFieldTest(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+
+    def _stored(self, model, pk, column):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {column} FROM {model._meta.db_table} WHERE id = %s", [pk]
+            )
+            return cursor.fetchone()[0]
+
+    def test_long_text_is_stored_compressed(self):
+        """Test long text is compressed on disk and read back unchanged"""
+        detail = "Replace the roof sheets and fascia boards.\n" * 50
+        estimate = Estimate.objects.create(
+            customer=self.customer,
+            visit_date=date.today(),
+            initial_outline="Roof",
+            detailed_estimate=detail,
+        )
+        stored = self._stored(Estimate, estimate.pk, "detailed_estimate")
+        self.assertTrue(stored.startswith("\x1bz:"))
+        self.assertLess(len(stored), len(detail) / 5)
+        self.assertEqual(self._stored(Estimate, estimate.pk, "initial_outline"), "Roof")
+        self.assertEqual(Estimate.objects.get(pk=estimate.pk).detailed_estimate, detail)
+        self.assertTrue(Estimate.objects.filter(detailed_estimate=detail).exists())
+        self.assertEqual(
+            self._stored(Customer, self.customer.pk, "address"), "123 Main St"
+        )
+
+    def test_marker_lookalikes_round_trip(self):
+        """Test plain text starting with the marker can't be misread"""
+        for text in ["\x1bz:not compressed", "\x1b", "x" * 300, ""]:
+            self.customer.address = text
+            self.customer.save()
+            self.customer.refresh_from_db()
+            self.assertEqual(self.customer.address, text)
+        self.assertEqual(compress_text("short"), "short")
+
+
+class BackfillTest(TestCase):
+    def setUp(self):
+        self.customers = [
+            Customer.objects.create(
+                first_name=f"Customer{i}",
+                last_name="Doe",
+                email=f"customer{i}@example.com",
+                phone="1234567890",
+                address="123 Main St",
+            )
+            for i in range(5)
+        ]
+
+    def test_chunks_resume_from_checkpoint(self):
+        """Test a failed run keeps its finished chunks and resumes after them"""
+        done = []
+        interrupt = [True]
+
+        def process(chunk):
+            if interrupt[0] and done:
+                raise RuntimeError("interrupted")
+            ids = list(chunk.values_list("pk", flat=True))
+            done.extend(ids)
+            return len(ids)
+
+        with self.assertRaises(RuntimeError):
+            run_backfill(Customer.objects.all(), process, name="test", chunk_size=2)
+        checkpoint = BackfillCheckpoint.objects.get(name="test")
+        self.assertEqual(checkpoint.last_pk, self.customers[1].pk)
+        self.assertEqual(checkpoint.rows_done, 2)
+
+        interrupt[0] = False
+        run = run_backfill(Customer.objects.all(), process, name="test", chunk_size=2)
+        self.assertEqual(done, [c.pk for c in self.customers])
+        self.assertEqual(run.resumed_from, checkpoint.last_pk)
+        self.assertEqual((run.total, run.chunks, run.changed), (3, 2, 3))
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.rows_done, 5)
+        self.assertIsNotNone(checkpoint.finished_at)
+
+    def test_progress_line(self):
+        """Test progress reports rows done, rate and time left"""
+        lines = []
+        run = run_backfill(
+            Customer.objects.all(),
+            lambda chunk: None,
+            chunk_size=2,
+            progress=lambda run: lines.append(format_progress(run)),
+        )
+        self.assertEqual(run.rows, 5)
+        self.assertEqual(len(lines), 3)
+        self.assertIn("2/5 (40%)", lines[0])
+        self.assertIn("ETA", lines[0])
+        self.assertIn("5/5 (100%)", lines[-1])
+
+    def test_summary_rebuild_command_resumes(self):
+        """Test rebuild_customer_summaries checkpoints and can restart"""
+        CustomerSummary.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_customer_summaries", "--chunk-size=2", stdout=out)
+        self.assertIn("Rebuilt 5 customer summaries", out.getvalue())
+        self.assertEqual(CustomerSummary.objects.count(), 5)
+        self.assertEqual(
+            BackfillCheckpoint.objects.get(name="rebuild_customer_summaries").rows_done,
+            5,
+        )
+
+
+class MaterialStockTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+        customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        self.estimate = Estimate.objects.create(
+            customer=customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        self.cement = Material.objects.create(
+            name="Cement",
+            unit_price=Decimal("750.00"),
+            unit="bag",
+            supplier="Bamburi",
+            quantity_on_hand=Decimal("100"),
+            reorder_level=Decimal("20"),
+        )
+        self.sand = Material.objects.create(
+            name="Sand",
+            unit_price=Decimal("3000.00"),
+            unit="tonne",
+            supplier="Quarry",
+            quantity_on_hand=Decimal("5"),
+        )
+
+    def _job(self, status="scheduled"):
+        return Job.objects.create(
+            estimate=self.estimate,
+            start_date=date.today(),
+            scheduled_date=date.today(),
+            status=status,
+        )
+
+    def _stock(self, material):
+        material.refresh_from_db()
+        return material.quantity_on_hand, material.quantity_reserved
+
+    def test_lines_reserve_and_release(self):
+        """Test adding, editing and deleting lines moves the reservations"""
+        job = self._job()
+        line, _ = add_job_materials(job, [(self.cement.pk, "30"), (self.sand.pk, "2")])
+        self.assertEqual(self._stock(self.cement), (Decimal("100"), Decimal("30")))
+        self.assertEqual(self._stock(self.sand), (Decimal("5"), Decimal("2")))
+
+        line.quantity = Decimal("40")
+        line.save()
+        self.assertEqual(self._stock(self.cement), (Decimal("100"), Decimal("40")))
+        line.material = self.sand
+        line.save()
+        self.assertEqual(self._stock(self.cement)[1], Decimal("0"))
+        self.assertEqual(self._stock(self.sand)[1], Decimal("42"))
+
+        job.delete()
+        self.assertEqual(self._stock(self.sand), (Decimal("5"), Decimal("0")))
+
+    def test_status_changes_release_or_use_stock(self):
+        """Test cancelling releases a reservation and completing uses it up"""
+        cancelled, completed = self._job(), self._job()
+        add_job_materials(cancelled, [(self.cement.pk, "10")])
+        add_job_materials(completed, [(self.cement.pk, "25")])
+        self.assertEqual(self._stock(self.cement)[1], Decimal("35"))
+
+        bulk_transition(Job, [cancelled.pk], "cancelled")
+        self.assertEqual(self._stock(self.cement), (Decimal("100"), Decimal("25")))
+        completed.status = "completed"
+        completed.save()
+        self.assertEqual(self._stock(self.cement), (Decimal("75"), Decimal("0")))
+
+        # Deleting a finished job's history doesn't put the stock back
+        completed.delete()
+        self.assertEqual(self._stock(self.cement), (Decimal("75"), Decimal("0")))
+
+    def test_background_deletion_releases_reservations(self):
+        """Test chunked job deletion gives back what the job had reserved"""
+        from .deletion import process_deletion, request_deletion
+
+        job = self._job()
+        add_job_materials(job, [(self.cement.pk, "30")])
+        process_deletion(request_deletion(job))
+        self.assertEqual(self._stock(self.cement), (Decimal("100"), Decimal("0")))
+
+    def test_stale_material_save_keeps_stock(self):
+        """Test editing a material never overwrites concurrent stock moves"""
+        stale = Material.objects.get(pk=self.cement.pk)
+        add_job_materials(self._job(), [(self.cement.pk, "30")])
+        stale.unit_price = Decimal("800.00")
+        stale.save()
+        self.assertEqual(self._stock(self.cement), (Decimal("100"), Decimal("30")))
+        self.assertEqual(self.cement.unit_price, Decimal("800.00"))
+
+    def test_low_stock_report(self):
+        """Test the low stock report is one query and lists what is short"""
+        job = self._job()
+        add_job_materials(job, [(self.cement.pk, "85"), (self.sand.pk, "8")])
+        with self.assertNumQueries(1):
+            report = {m.name: m for m in low_stock()}
+        self.assertEqual(set(report), {"Cement", "Sand"})
+        self.assertEqual(report["Cement"].available, Decimal("15"))
+        self.assertEqual(report["Sand"].available, Decimal("-3"))
+        self.assertEqual(report["Sand"].open_jobs, 1)
+
+        response = self.client.post(
+            reverse("material_receive", args=[self.sand.pk]), {"quantity": "10"}
+        )
+        self.assertRedirects(response, reverse("material_low_stock"))
+        response = self.client.get(reverse("material_low_stock"))
+        self.assertEqual([m.name for m in response.context["materials"]], ["Cement"])
+
+
+class MaterialPriceComparisonTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username="staff", password="staffpass", is_staff=True)
+        self.client.login(username="staff", password="staffpass")
+        self.bamburi = Material.objects.create(
+            name="Cement", unit_price=Decimal("750.00"), unit="bag", supplier="Bamburi"
+        )
+        self.savannah = Material.objects.create(
+            name=" cement ",
+            unit_price=Decimal("700.00"),
+            unit="bag",
+            supplier="Savannah",
+        )
+        self.mombasa = Material.objects.create(
+            name="CEMENT", unit_price=Decimal("720.00"), unit="bag", supplier="Mombasa"
+        )
+        self.sand = Material.objects.create(
+            name="Sand", unit_price=Decimal("3000.00"), unit="tonne", supplier="Quarry"
+        )
+
+    def test_materials_grouped_by_name(self):
+        """Test suppliers' spellings of a name share one item, also on import"""
+        from .importer import import_csv
+
+        self.assertEqual(
+            {self.bamburi.item_id, self.savannah.item_id, self.mombasa.item_id},
+            {self.bamburi.item_id},
+        )
+        self.assertNotEqual(self.sand.item_id, self.bamburi.item_id)
+
+        import_csv(
+            "materials",
+            StringIO(
+                "name,unit_price,unit,supplier\n"
+                "Cement,690,bag,Simba\n"
+                "Ballast,1500,tonne,Quarry\n"
+            ),
+        )
+        simba = Material.objects.get(supplier="Simba")
+        self.assertEqual(simba.item_id, self.bamburi.item_id)
+        self.assertEqual(MaterialItem.objects.count(), 3)
+
+        self.sand.name = "River Sand"
+        self.sand.save(update_fields=["name"])
+        self.sand.refresh_from_db()
+        self.assertEqual(self.sand.item.key, "river sand")
+
+    def test_price_comparison(self):
+        """Test the comparison report finds the cheapest supplier in one query"""
+        with self.assertNumQueries(1):
+            rows = {row["item__name"]: row for row in price_comparison()}
+        self.assertEqual(rows["Cement"]["suppliers"], 3)
+        self.assertEqual(rows["Cement"]["lowest_price"], Decimal("700.00"))
+        self.assertEqual(rows["Cement"]["highest_price"], Decimal("750.00"))
+        self.assertEqual(rows["Cement"]["cheapest_supplier"], "Savannah")
+        self.assertEqual(rows["Sand"]["cheapest_supplier"], "Quarry")
+
+        response = self.client.get(reverse("material_price_comparison"))
+        self.assertContains(response, "Savannah")
+
+    def test_job_costing(self):
+        """Test a job's lines are compared with the cheapest suppliers at once"""
+        customer = Customer.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            address="123 Main St",
+        )
+        estimate = Estimate.objects.create(
+            customer=customer,
+            visit_date=date.today(),
+            initial_outline="Initial work",
+            detailed_estimate="Detailed estimate",
+        )
+        job = Job.objects.create(
+            estimate=estimate,
+            start_date=date.today(),
+            scheduled_date=date.today(),
+            status="scheduled",
+        )
+        add_job_materials(job, [(self.bamburi.pk, "10"), (self.sand.pk, "2")])
+
+        with self.assertNumQueries(1):
+            costing = job_costing(job)
+        self.assertEqual(costing.total, Decimal("13500.00"))
+        self.assertEqual(costing.cheapest_total, Decimal("13000.00"))
+        self.assertEqual(costing.savings, Decimal("500.00"))
+        self.assertEqual(costing.lines[0].cheapest_supplier, "Savannah")
+
+        response = self.client.get(reverse("job_materials_add", args=[job.pk]))
+        self.assertContains(response, "cheapest: KES 700.00 from Savannah")
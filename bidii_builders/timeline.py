@@ -0,0 +1,120 @@
+# bidii_builders/timeline.py
+from datetime import date
+from django.db.models import (
+    Case,
+    CharField,
+    DecimalField,
+    F,
+    IntegerField,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast
+from .models import Estimate, Job, JobMaterial, Invoice, Payment
+
+TIMELINE_PAGE_SIZE = 50
+
+# Each branch of the UNION: (kind, queryset filter to the property, date field,
+# amount field, label expression). The position in this list is the kind's rank,
+# which breaks ties between events on the same day.
+TIMELINE_BRANCHES = [
+    ("estimate", Estimate, "property_obj", "estimate_date", "total_cost", F("status")),
+    ("job", Job, "estimate__property_obj", "start_date", "actual_cost", F("status")),
+    (
+        "job_material",
+        JobMaterial,
+        "job__estimate__property_obj",
+        "job__start_date",
+        "total_price",
+        F("material__name"),
+    ),
+    (
+        "invoice",
+        Invoice,
+        "job__estimate__property_obj",
+        "issue_date",
+        "amount",
+        Case(When(is_paid=True, then=Value("paid")), default=Value("unpaid")),
+    ),
+    (
+        "payment",
+        Payment,
+        "invoice__job__estimate__property_obj",
+        "payment_date",
+        "amount",
+        F("payment_method"),
+    ),
+]
+
+
+def encode_cursor(event):
+    """Build the opaque keyset cursor pointing just past ``event``"""
+    return (
+        f"{event['event_date'].isoformat()}:{event['kind_rank']}:{event['object_id']}"
+    )
+
+
+def decode_cursor(cursor):
+    """Parse a cursor produced by ``encode_cursor``; raises ValueError if malformed"""
+    event_date, rank, object_id = cursor.split(":")
+    return date.fromisoformat(event_date), int(rank), int(object_id)
+
+
+def _keyset_filter(rank, date_field, cursor):
+    """Rows of one branch that sort strictly after the cursor.
+
+    The timeline is ordered by (date, rank, id) descending. Since every row in a
+    branch shares the same rank, the tuple comparison collapses to a date
+    comparison, plus an id tie-break for the branch the cursor came from.
+    """
+    cursor_date, cursor_rank, cursor_id = cursor
+    if rank < cursor_rank:
+        return Q(**{f"{date_field}__lte": cursor_date})
+    if rank > cursor_rank:
+        return Q(**{f"{date_field}__lt": cursor_date})
+    return Q(**{f"{date_field}__lt": cursor_date}) | Q(
+        **{date_field: cursor_date, "pk__lt": cursor_id}
+    )
+
+
+def property_timeline(property_id, cursor=None, limit=TIMELINE_PAGE_SIZE):
+    """One page of a property's history, newest first, from a single UNION query.
+
+    Returns ``(events, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    branches = []
+    for rank, branch in enumerate(TIMELINE_BRANCHES):
+        kind, model, property_field, date_field, amount_field, label = branch
+        queryset = model.objects.filter(**{f"{property_field}_id": property_id})
+        if cursor is not None:
+            queryset = queryset.filter(_keyset_filter(rank, date_field, cursor))
+        branches.append(
+            queryset.order_by()
+            .annotate(
+                event_date=F(date_field),
+                kind_rank=Value(rank, output_field=IntegerField()),
+                kind=Value(kind, output_field=CharField()),
+                object_id=F("pk"),
+                event_amount=Cast(
+                    amount_field, DecimalField(max_digits=12, decimal_places=2)
+                ),
+                event_label=Cast(label, CharField()),
+            )
+            .values(
+                "event_date",
+                "kind_rank",
+                "kind",
+                "object_id",
+                "event_amount",
+                "event_label",
+            )
+        )
+
+    events = list(
+        branches[0]
+        .union(*branches[1:], all=True)
+        .order_by("-event_date", "-kind_rank", "-object_id")[: limit + 1]
+    )
+    next_cursor = encode_cursor(events[limit - 1]) if len(events) > limit else None
+    return events[:limit], next_cursor
@@ -0,0 +1,98 @@
+# bidii_builders/transitions.py
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .audit import record_many
+from .dashboard import invalidate_dashboard_stats
+from .models import Estimate, Job
+from .stock import move_job_stock
+from .summaries import refresh_customer_summaries
+
+# Allowed moves: current status -> statuses it may move to
+ESTIMATE_TRANSITIONS = {
+    "pending": {"sent", "accepted", "rejected"},
+    "sent": {"accepted", "rejected"},
+    "accepted": {"in_progress", "rejected"},
+    "in_progress": {"completed"},
+}
+JOB_TRANSITIONS = {
+    "scheduled": {"in_progress", "completed", "cancelled"},
+    "in_progress": {"completed", "cancelled"},
+}
+
+# Date column stamped (if still empty) when a row enters a status
+ESTIMATE_STAMPS = {"sent": "sent_date", "accepted": "accepted_date"}
+JOB_STAMPS = {"completed": "end_date"}
+
+WORKFLOWS = {
+    Estimate: (ESTIMATE_TRANSITIONS, ESTIMATE_STAMPS, "customer_id"),
+    Job: (JOB_TRANSITIONS, JOB_STAMPS, "estimate__customer_id"),
+}
+
+
+@dataclass
+class TransitionResult:
+    updated: int = 0
+    rejected: list = field(default_factory=list)
+
+
+def allowed_sources(model, target):
+    """Statuses from which ``model`` rows may move to ``target``"""
+    transitions = WORKFLOWS[model][0]
+    return [source for source, targets in transitions.items() if target in targets]
+
+
+def bulk_transition(model, ids, target):
+    """Move the ``model`` rows in ``ids`` to ``target`` with one UPDATE.
+
+    Rows whose current status can't move to ``target`` are left alone and
+    returned in ``rejected`` as ``(id, status)``. The date column for the
+    target status is stamped in the same statement, and the dashboard and
+    customer summaries are refreshed once for the whole batch.
+    """
+    _, stamps, customer_field = WORKFLOWS[model]
+    sources = allowed_sources(model, target)
+    result = TransitionResult()
+
+    with transaction.atomic():
+        # Locked until the UPDATE commits, so the statuses read here are the
+        # ones the audit trail and stock moves below are based on
+        rows = (
+            model.objects.select_for_update()
+            .filter(pk__in=ids)
+            .values_list("pk", "status", customer_field)
+        )
+        by_status = defaultdict(list)
+        customer_ids = set()
+        entries = []
+        for pk, status, customer_id in rows:
+            if status in sources:
+                by_status[status].append(pk)
+                entries.append((pk, "update", {"status": [status, target]}))
+                customer_ids.add(customer_id)
+            else:
+                result.rejected.append((pk, status))
+        if not by_status:
+            return result
+
+        changes = {"status": target, "updated_at": timezone.now()}
+        if target in stamps:
+            changes[stamps[target]] = Coalesce(F(stamps[target]), Value(date.today()))
+        valid_ids = [pk for pks in by_status.values() for pk in pks]
+        result.updated = model.objects.filter(
+            pk__in=valid_ids, status__in=sources
+        ).update(**changes)
+        # update() sends no signals, so the audit trail and the stock moves
+        # the Job signals would make are applied here
+        record_many(model._meta.model_name, entries)
+        if model is Job:
+            for status, pks in by_status.items():
+                move_job_stock(pks, status, target)
+
+    invalidate_dashboard_stats()
+    refresh_customer_summaries(customer_ids)
+    return result
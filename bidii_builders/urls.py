@@ -15,29 +15,59 @@ urlpatterns = [
     path("customers/", views.customer_list, name="customer_list"),
     path("customers/create/", views.customer_create, name="customer_create"),
     path("customers/<int:pk>/", views.customer_detail, name="customer_detail"),
+    path(
+        "customers/<int:pk>/tabs/<str:tab>/",
+        views.customer_detail_tab,
+        name="customer_detail_tab",
+    ),
     path("customers/<int:pk>/edit/", views.customer_update, name="customer_update"),
     path("customers/<int:pk>/delete/", views.customer_delete, name="customer_delete"),
     # Property CRUD
     path("properties/", views.property_list, name="property_list"),
     path("properties/create/", views.property_create, name="property_create"),
     path("properties/<int:pk>/", views.property_detail, name="property_detail"),
+    path(
+        "properties/<int:pk>/timeline/",
+        views.property_timeline_data,
+        name="property_timeline",
+    ),
     path("properties/<int:pk>/edit/", views.property_update, name="property_update"),
     path("properties/<int:pk>/delete/", views.property_delete, name="property_delete"),
     # Estimate CRUD
     path("estimates/", views.estimate_list, name="estimate_list"),
     path("estimates/create/", views.estimate_create, name="estimate_create"),
+    path(
+        "estimates/bulk-status/",
+        views.estimate_bulk_status,
+        name="estimate_bulk_status",
+    ),
     path("estimates/<int:pk>/", views.estimate_detail, name="estimate_detail"),
     path("estimates/<int:pk>/edit/", views.estimate_update, name="estimate_update"),
     path("estimates/<int:pk>/delete/", views.estimate_delete, name="estimate_delete"),
     # Job CRUD
     path("jobs/", views.job_list, name="job_list"),
     path("jobs/create/", views.job_create, name="job_create"),
+    path("jobs/bulk-status/", views.job_bulk_status, name="job_bulk_status"),
     path("jobs/<int:pk>/", views.job_detail, name="job_detail"),
     path("jobs/<int:pk>/edit/", views.job_update, name="job_update"),
     path("jobs/<int:pk>/delete/", views.job_delete, name="job_delete"),
     # Material CRUD
     path("materials/", views.material_list, name="material_list"),
     path("materials/create/", views.material_create, name="material_create"),
+    path(
+        "materials/prices/",
+        views.material_prices_update,
+        name="material_prices_update",
+    ),
+    path(
+        "materials/compare/",
+        views.material_price_comparison,
+        name="material_price_comparison",
+    ),
+    path("materials/low-stock/", views.material_low_stock, name="material_low_stock"),
+    path(
+        "materials/<int:pk>/receive/", views.material_receive, name="material_receive"
+    ),
     path("materials/<int:pk>/", views.material_detail, name="material_detail"),
     path("materials/<int:pk>/edit/", views.material_update, name="material_update"),
     path("materials/<int:pk>/delete/", views.material_delete, name="material_delete"),
@@ -68,6 +98,7 @@ urlpatterns = [
     # Payment CRUD
     path("payments/", views.payment_list, name="payment_list"),
     path("payments/create/", views.payment_create, name="payment_create"),
+    path("payments/import/", views.statement_import, name="statement_import"),
     path("payments/<int:pk>/", views.payment_detail, name="payment_detail"),
     path("payments/<int:pk>/edit/", views.payment_update, name="payment_update"),
     path("payments/<int:pk>/delete/", views.payment_delete, name="payment_delete"),
@@ -80,6 +111,9 @@ urlpatterns = [
     path(
         "api/create-property/", views.create_property_ajax, name="create_property_ajax"
     ),
+    path(
+        "api/materials/prices/", views.material_prices_api, name="material_prices_api"
+    ),
     # Jobs schedule (existing)
     path("jobs/schedule/", views.job_schedule, name="job_schedule"),
     path(
@@ -87,8 +121,15 @@ urlpatterns = [
         views.job_materials_add,
         name="job_materials_add",
     ),
+    path(
+        "api/jobs/<int:job_id>/materials/",
+        views.job_materials_bulk,
+        name="job_materials_bulk",
+    ),
     # Reports and backup
     path("reports/", views.reports, name="reports"),
     path("backup/", views.backup, name="backup"),
+    path("import/", views.import_data, name="import_data"),
+    path("audit/", views.audit_log, name="audit_log"),
     path("api/charts-data/", views.dashboard_charts_data, name="charts_data"),
 ]
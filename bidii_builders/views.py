@@ -3,9 +3,14 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Sum, Count, Q
-from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, F, Q, Func, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.http import urlencode
 from .models import (
+    AuditLog,
     Customer,
     Property,
     Estimate,
@@ -15,7 +20,33 @@ from .models import (
     Invoice,
     Payment,
 )
+from .audit import AUDITED_MODELS
+from .dashboard import dashboard_stats
+from .dedup import matching_customers
+from .deletion import request_deletion
+from .importer import IMPORT_SPECS, import_csv
+from .materials import (
+    add_job_materials,
+    job_costing,
+    price_comparison,
+    resolve_price_rows,
+    update_material_prices,
+    with_cheapest_supplier,
+)
+from .reporting import (
+    jobs_by_status,
+    revenue_by_calendar_month,
+    total_jobs,
+    total_revenue,
+)
+from .statements import import_statement
+from .stock import low_stock, receive_stock
+from .streaming import stream_table
+from .timeline import property_timeline, decode_cursor
+from .transitions import allowed_sources, bulk_transition
 from django.http import JsonResponse, HttpResponse, Http404
+import csv
+import io
 import json
 import os
 import zipfile
@@ -29,16 +60,14 @@ def index(request):
             return redirect("dashboard")
         else:
             # Check if user is linked to a customer profile
-            try:
-                customer = Customer.objects.get(user=request.user)
+            if request.customer:
                 return redirect("customer_dashboard")
-            except Customer.DoesNotExist:
-                # If user exists but no customer profile, show login again
-                messages.warning(
-                    request,
-                    "Your account is not linked to a customer profile. Please contact support.",
-                )
-                return redirect("login")
+            # If user exists but no customer profile, show login again
+            messages.warning(
+                request,
+                "Your account is not linked to a customer profile. Please contact support.",
+            )
+            return redirect("login")
     else:
         return redirect("login")
 
@@ -49,34 +78,13 @@ def dashboard(request):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    # Dashboard statistics
-    total_customers = Customer.objects.count()
-    pending_estimates = Estimate.objects.filter(status="pending").count()
-    accepted_estimates = Estimate.objects.filter(status="accepted").count()
-    active_jobs = Job.objects.filter(status="in_progress").count()
-    completed_jobs = Job.objects.filter(status="completed").count()
-
-    # Revenue statistics
-    total_revenue = (
-        Invoice.objects.filter(is_paid=True).aggregate(Sum("amount"))["amount__sum"]
-        or 0
-    )
-    overdue_invoices = Invoice.objects.filter(
-        due_date__lt=datetime.now().date(), is_paid=False
-    ).count()
-
     # Recent activities
-    recent_customers = Customer.objects.order_by("-created_at")[:5]
-    recent_jobs = Job.objects.order_by("-created_at")[:5]
+    recent_customers = Customer.objects.active().order_by("-created_at")[:5]
+    recent_jobs = Job.objects.active().order_by("-created_at")[:5]
 
     context = {
-        "total_customers": total_customers,
-        "pending_estimates": pending_estimates,
-        "accepted_estimates": accepted_estimates,
-        "active_jobs": active_jobs,
-        "completed_jobs": completed_jobs,
-        "total_revenue": total_revenue,
-        "overdue_invoices": overdue_invoices,
+        # Cached; expired by the write signals and by bulk status changes
+        **dashboard_stats(),
         "recent_customers": recent_customers,
         "recent_jobs": recent_jobs,
     }
@@ -86,9 +94,8 @@ def dashboard(request):
 @login_required
 def customer_dashboard(request):
     """Customer dashboard - only accessible to customers"""
-    try:
-        customer = Customer.objects.get(user=request.user)
-    except Customer.DoesNotExist:
+    customer = request.customer
+    if not customer:
         messages.error(
             request,
             "Your account is not linked to a customer profile. Please contact support.",
@@ -103,19 +110,23 @@ def customer_dashboard(request):
     accepted_estimates = Estimate.objects.filter(
         customer=customer, status="accepted"
     ).count()
-    active_jobs = Job.objects.filter(
-        estimate__customer=customer, status="in_progress"
-    ).count()
-    completed_jobs = Job.objects.filter(
-        estimate__customer=customer, status="completed"
-    ).count()
+    active_jobs = (
+        Job.objects.active()
+        .filter(estimate__customer=customer, status="in_progress")
+        .count()
+    )
+    completed_jobs = (
+        Job.objects.active()
+        .filter(estimate__customer=customer, status="completed")
+        .count()
+    )
 
     # Recent activities for this customer
     recent_estimates = Estimate.objects.filter(customer=customer).order_by(
         "-created_at"
     )[:5]
-    recent_jobs = Job.objects.filter(estimate__customer=customer).order_by(
-        "-created_at"
+    recent_jobs = (
+        Job.objects.active().filter(estimate__customer=customer).order_by("-created_at")
     )[:5]
 
     context = {
@@ -132,6 +143,16 @@ def customer_dashboard(request):
 
 
 # Customer CRUD Operations
+# Sort keys accepted by customer_list, backed by indexed CustomerSummary columns
+CUSTOMER_SORTS = {
+    "revenue": "summary__lifetime_revenue",
+    "balance": "summary__outstanding_balance",
+    "open_jobs": "summary__open_jobs",
+    "last_activity": "summary__last_activity",
+    "name": "last_name",
+}
+
+
 @login_required
 def customer_list(request):
     """Admin view - list all customers"""
@@ -140,17 +161,41 @@ def customer_list(request):
 
     query = request.GET.get("q")
     if query:
-        customers = Customer.objects.filter(
+        customers = Customer.objects.active().filter(
             Q(first_name__icontains=query)
             | Q(last_name__icontains=query)
             | Q(email__icontains=query)
             | Q(phone__icontains=query)
         )
     else:
-        customers = Customer.objects.all()
+        customers = Customer.objects.active()
+    # The list never shows the long text columns, so they aren't fetched
+    customers = customers.defer("address").annotate(
+        lifetime_revenue=F("summary__lifetime_revenue"),
+        outstanding_balance=F("summary__outstanding_balance"),
+        open_jobs=F("summary__open_jobs"),
+        last_activity=F("summary__last_activity"),
+    )
+
+    if request.GET.get("outstanding"):
+        customers = customers.filter(summary__outstanding_balance__gt=0)
+    if request.GET.get("open_jobs"):
+        customers = customers.filter(summary__open_jobs__gt=0)
+
+    sort = request.GET.get("sort", "")
+    field = CUSTOMER_SORTS.get(sort.lstrip("-"))
+    if field:
+        order = (
+            F(field).desc(nulls_last=True)
+            if sort.startswith("-")
+            else F(field).asc(nulls_last=True)
+        )
+        customers = customers.order_by(order, "pk")
 
     return render(
-        request, "bidii_builders/customers/list.html", {"customers": customers}
+        request,
+        "bidii_builders/customers/list.html",
+        {"customers": customers, "sort": sort},
     )
 
 
@@ -161,6 +206,17 @@ def customer_create(request):
         return redirect("customer_dashboard")
 
     if request.method == "POST":
+        duplicates = matching_customers(
+            request.POST.get("email"),
+            request.POST.get("phone"),
+            request.POST.get("first_name"),
+            request.POST.get("last_name"),
+        )
+        if duplicates and not request.POST.get("confirm_duplicate"):
+            messages.warning(request, "This customer may already exist.")
+            context = {"duplicates": duplicates, "values": request.POST}
+            return render(request, "bidii_builders/customers/create.html", context)
+
         # Create customer logic
         customer = Customer.objects.create(
             first_name=request.POST.get("first_name"),
@@ -195,35 +251,147 @@ def customer_create(request):
     return render(request, "bidii_builders/customers/create.html")
 
 
+# Page size for paginated list pages; ?all=1 streams the full table instead
+LIST_PAGE_SIZE = 50
+
+# Page size for the lazily loaded tabs on the customer detail page
+CUSTOMER_TAB_PAGE_SIZE = 20
+
+
+def _customer_tab_querysets(customer_id):
+    """Querysets backing each tab of the customer detail page"""
+    return {
+        "properties": Property.objects.filter(customer_id=customer_id).order_by(
+            "-created_at", "-id"
+        ),
+        "estimates": Estimate.objects.filter(customer_id=customer_id)
+        .select_related("property_obj")
+        .order_by("-created_at", "-id"),
+        "jobs": Job.objects.filter(
+            estimate__customer_id=customer_id, pending_deletion=False
+        )
+        .select_related("estimate")
+        .order_by("-created_at", "-id"),
+        "invoices": Invoice.objects.filter(job__estimate__customer_id=customer_id)
+        .select_related("job")
+        .order_by("-issue_date", "-id"),
+    }
+
+
+def _customer_tab_rows(tab, objects):
+    """Serialize a page of tab objects for the JSON variant of the tab endpoint"""
+    if tab == "properties":
+        return [
+            {"id": p.id, "property_type": p.property_type, "address": p.address}
+            for p in objects
+        ]
+    if tab == "estimates":
+        return [
+            {
+                "id": e.id,
+                "status": e.get_status_display(),
+                "total_cost": str(e.total_cost),
+                "estimate_date": e.estimate_date.isoformat(),
+                "property": e.property_obj.address if e.property_obj else None,
+            }
+            for e in objects
+        ]
+    if tab == "jobs":
+        return [
+            {
+                "id": j.id,
+                "status": j.get_status_display(),
+                "start_date": j.start_date.isoformat(),
+                "scheduled_date": j.scheduled_date.isoformat(),
+                "estimate_id": j.estimate_id,
+            }
+            for j in objects
+        ]
+    return [
+        {
+            "id": i.id,
+            "job_id": i.job_id,
+            "amount": str(i.amount),
+            "balance": str(i.balance),
+            "is_paid": i.is_paid,
+            "due_date": i.due_date.isoformat(),
+        }
+        for i in objects
+    ]
+
+
 @login_required
 def customer_detail(request, pk):
-    """Admin view customer details"""
+    """Admin view customer details.
+
+    Only the customer header and per-tab counts are loaded here; the tab
+    contents are fetched on demand from ``customer_detail_tab``.
+    """
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    customer = get_object_or_404(Customer, pk=pk)
-    properties = Property.objects.filter(customer=customer)
-    estimates = Estimate.objects.filter(customer=customer)
-    jobs = Job.objects.filter(estimate__customer=customer)
-    invoices = Invoice.objects.filter(job__estimate__customer=customer)
+    tabs = _customer_tab_querysets(OuterRef("pk"))
+    counts = {
+        f"{tab}_count": Coalesce(
+            Subquery(
+                queryset.order_by()
+                .annotate(total=Func("pk", function="COUNT"))
+                .values("total")
+            ),
+            0,
+        )
+        for tab, queryset in tabs.items()
+    }
+    customer = get_object_or_404(Customer.objects.active().annotate(**counts), pk=pk)
 
     context = {
         "customer": customer,
-        "properties": properties,
-        "estimates": estimates,
-        "jobs": jobs,
-        "invoices": invoices,
+        "tab_counts": {tab: getattr(customer, f"{tab}_count") for tab in tabs},
     }
     return render(request, "bidii_builders/customers/detail.html", context)
 
 
+@login_required
+def customer_detail_tab(request, pk, tab):
+    """Paginated HTML fragment (or JSON with ?format=json) for one customer tab"""
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
+    customer = get_object_or_404(Customer.objects.active(), pk=pk)
+    querysets = _customer_tab_querysets(customer.pk)
+    if tab not in querysets:
+        raise Http404("Unknown tab")
+
+    paginator = Paginator(querysets[tab], CUSTOMER_TAB_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get("page"))
+
+    if request.GET.get("format") == "json":
+        return JsonResponse(
+            {
+                "tab": tab,
+                "page": page.number,
+                "num_pages": paginator.num_pages,
+                "count": paginator.count,
+                "has_next": page.has_next(),
+                "has_previous": page.has_previous(),
+                "results": _customer_tab_rows(tab, page.object_list),
+            }
+        )
+
+    return render(
+        request,
+        f"bidii_builders/customers/tabs/{tab}.html",
+        {"customer_id": customer.pk, "tab": tab, "page": page},
+    )
+
+
 @login_required
 def customer_update(request, pk):
     """Admin update customer"""
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    customer = get_object_or_404(Customer, pk=pk)
+    customer = get_object_or_404(Customer.objects.active(), pk=pk)
 
     if request.method == "POST":
         customer.first_name = request.POST.get("first_name")
@@ -247,10 +415,11 @@ def customer_delete(request, pk):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    customer = get_object_or_404(Customer, pk=pk)
+    customer = get_object_or_404(Customer.objects.active(), pk=pk)
 
     if request.method == "POST":
-        customer.delete()
+        # The customer is hidden now; process_deletions removes its rows
+        request_deletion(customer, request.user)
         messages.success(request, "Customer deleted successfully!")
         return redirect("customer_list")
 
@@ -266,7 +435,7 @@ def property_list(request):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    properties = Property.objects.all()
+    properties = Property.objects.active().defer("description")
     return render(
         request, "bidii_builders/properties/list.html", {"properties": properties}
     )
@@ -308,6 +477,42 @@ def property_detail(request, pk):
     )
 
 
+@login_required
+def property_timeline_data(request, pk):
+    """JSON history of a property (estimates, jobs, materials, invoices, payments)
+
+    Keyset paginated: pass the returned ``next_cursor`` as ``?cursor=`` to get
+    the next (older) page.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
+    # An empty ?cursor= means the first page, like no cursor at all
+    cursor = request.GET.get("cursor") or None
+    if cursor:
+        try:
+            cursor = decode_cursor(cursor)
+        except ValueError:
+            return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    events, next_cursor = property_timeline(pk, cursor=cursor)
+    results = [
+        {
+            "kind": event["kind"],
+            "id": event["object_id"],
+            "date": event["event_date"].isoformat(),
+            "amount": (
+                f"{event['event_amount']:.2f}"
+                if event["event_amount"] is not None
+                else None
+            ),
+            "label": event["event_label"],
+        }
+        for event in events
+    ]
+    return JsonResponse({"results": results, "next_cursor": next_cursor})
+
+
 @login_required
 def property_update(request, pk):
     """Update property - staff only"""
@@ -361,12 +566,43 @@ def estimate_list(request):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    estimates = Estimate.objects.all()
+    estimates = Estimate.objects.active().defer("initial_outline", "detailed_estimate")
     return render(
         request, "bidii_builders/estimates/list.html", {"estimates": estimates}
     )
 
 
+def _bulk_status_change(request, model, label):
+    """Apply the status chosen on a list page to the ticked rows"""
+    target = request.POST.get("status")
+    ids = [pk for pk in request.POST.getlist("ids") if pk.isdigit()]
+    if not ids or not allowed_sources(model, target):
+        messages.error(request, f"Select some {label}s and a new status.")
+        return
+
+    result = bulk_transition(model, ids, target)
+    status_label = dict(model._meta.get_field("status").choices)[target]
+    if result.updated:
+        messages.success(
+            request, f"Moved {result.updated} {label}(s) to {status_label}."
+        )
+    if result.rejected:
+        skipped = ", ".join(f"#{pk} ({status})" for pk, status in result.rejected)
+        messages.error(
+            request, f"Can't move these {label}s to {status_label}: {skipped}"
+        )
+
+
+@login_required
+def estimate_bulk_status(request):
+    """Move the selected estimates to a new status - staff only"""
+    if not request.user.is_staff:
+        return redirect("customer_dashboard")
+    if request.method == "POST":
+        _bulk_status_change(request, Estimate, "estimate")
+    return redirect("estimate_list")
+
+
 @login_required
 def estimate_create(request):
     """Create estimate - staff only"""
@@ -419,23 +655,18 @@ def estimate_create(request):
 @login_required
 def estimate_detail(request, pk):
     """View estimate detail - accessible to both staff and customer"""
-    estimate = get_object_or_404(Estimate, pk=pk)
-
-    # Check if user has permission to view this estimate
-    if not request.user.is_staff:
-        try:
-            customer = Customer.objects.get(user=request.user)
-            if estimate.customer != customer:
-                messages.error(
-                    request, "You do not have permission to view this estimate."
-                )
-                return redirect("customer_dashboard")
-        except Customer.DoesNotExist:
-            messages.error(
-                request,
-                "You need to be linked to a customer profile to view this estimate.",
-            )
-            return redirect("login")
+    # The ownership check is folded into the lookup query
+    estimate = (
+        Estimate.objects.for_user(request.user)
+        .select_related("customer", "property_obj")
+        .filter(pk=pk)
+        .first()
+    )
+    if estimate is None:
+        if request.user.is_staff:
+            raise Http404("Estimate not found")
+        messages.error(request, "You do not have permission to view this estimate.")
+        return redirect("customer_dashboard")
 
     return render(
         request, "bidii_builders/estimates/detail.html", {"estimate": estimate}
@@ -521,20 +752,30 @@ def job_list(request):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    jobs = Job.objects.all()
+    jobs = Job.objects.active().defer("notes")
     return render(request, "bidii_builders/jobs/list.html", {"jobs": jobs})
 
 
+@login_required
+def job_bulk_status(request):
+    """Move the selected jobs to a new status - staff only"""
+    if not request.user.is_staff:
+        return redirect("customer_dashboard")
+    if request.method == "POST":
+        _bulk_status_change(request, Job, "job")
+    return redirect("job_list")
+
+
 @login_required
 def job_create(request):
     """Create job - staff only"""
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    estimates = Estimate.objects.filter(status="accepted")
+    estimates = Estimate.objects.active().filter(status="accepted")
 
     if request.method == "POST":
-        estimate = get_object_or_404(Estimate, pk=request.POST.get("estimate"))
+        estimate = get_object_or_404(estimates, pk=request.POST.get("estimate"))
 
         job = Job.objects.create(
             estimate=estimate,
@@ -542,6 +783,7 @@ def job_create(request):
             end_date=request.POST.get("end_date"),
             scheduled_date=request.POST.get("scheduled_date"),
             status=request.POST.get("status", "scheduled"),
+            labour_cost=request.POST.get("labour_cost") or 0,
             notes=request.POST.get("notes", ""),
         )
         messages.success(request, "Job created successfully!")
@@ -553,22 +795,21 @@ def job_create(request):
 @login_required
 def job_detail(request, pk):
     """View job detail - accessible to both staff and customer"""
-    job = get_object_or_404(Job, pk=pk)
-
-    # Check if user has permission to view this job
-    if not request.user.is_staff:
-        try:
-            customer = Customer.objects.get(user=request.user)
-            if job.estimate.customer != customer:
-                messages.error(request, "You do not have permission to view this job.")
-                return redirect("customer_dashboard")
-        except Customer.DoesNotExist:
-            messages.error(
-                request, "You need to be linked to a customer profile to view this job."
-            )
-            return redirect("login")
+    # The ownership check is folded into the lookup query
+    job = (
+        Job.objects.for_user(request.user)
+        .active()
+        .select_related("estimate__customer", "estimate__property_obj")
+        .filter(pk=pk)
+        .first()
+    )
+    if job is None:
+        if request.user.is_staff:
+            raise Http404("Job not found")
+        messages.error(request, "You do not have permission to view this job.")
+        return redirect("customer_dashboard")
 
-    materials = JobMaterial.objects.filter(job=job)
+    materials = JobMaterial.objects.filter(job=job).select_related("material")
     invoice = Invoice.objects.filter(job=job).first()
 
     context = {"job": job, "materials": materials, "invoice": invoice}
@@ -581,7 +822,7 @@ def job_update(request, pk):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    job = get_object_or_404(Job, pk=pk)
+    job = get_object_or_404(Job.objects.active(), pk=pk)
     estimates = Estimate.objects.all()
 
     if request.method == "POST":
@@ -590,6 +831,8 @@ def job_update(request, pk):
         job.end_date = request.POST.get("end_date")
         job.scheduled_date = request.POST.get("scheduled_date")
         job.status = request.POST.get("status", "scheduled")
+        # Blank clears the cost, as on create; a form without the field keeps it
+        job.labour_cost = request.POST.get("labour_cost", job.labour_cost) or 0
         job.notes = request.POST.get("notes", "")
         job.save()
 
@@ -607,10 +850,10 @@ def job_delete(request, pk):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    job = get_object_or_404(Job, pk=pk)
+    job = get_object_or_404(Job.objects.active(), pk=pk)
 
     if request.method == "POST":
-        job.delete()
+        request_deletion(job, request.user)
         messages.success(request, "Job deleted successfully!")
         return redirect("job_list")
 
@@ -642,6 +885,8 @@ def material_create(request):
             unit_price=request.POST.get("unit_price"),
             unit=request.POST.get("unit"),
             supplier=request.POST.get("supplier"),
+            quantity_on_hand=request.POST.get("quantity_on_hand") or 0,
+            reorder_level=request.POST.get("reorder_level") or 0,
         )
         messages.success(request, "Material created successfully!")
         return redirect("material_detail", pk=material.id)
@@ -674,6 +919,9 @@ def material_update(request, pk):
         material.unit_price = request.POST.get("unit_price")
         material.unit = request.POST.get("unit")
         material.supplier = request.POST.get("supplier")
+        material.reorder_level = request.POST.get(
+            "reorder_level", material.reorder_level
+        )
         material.save()
 
         messages.success(request, "Material updated successfully!")
@@ -702,7 +950,134 @@ def material_delete(request, pk):
     )
 
 
+@login_required
+def material_price_comparison(request):
+    """Each material item's suppliers compared by price - staff only"""
+    if not request.user.is_staff:
+        return redirect("customer_dashboard")
+
+    return render(
+        request,
+        "bidii_builders/materials/compare.html",
+        {"items": price_comparison()},
+    )
+
+
+@login_required
+def material_low_stock(request):
+    """Materials to reorder, and a form to book in deliveries - staff only"""
+    if not request.user.is_staff:
+        return redirect("customer_dashboard")
+
+    return render(
+        request, "bidii_builders/materials/low_stock.html", {"materials": low_stock()}
+    )
+
+
+@login_required
+def material_receive(request, pk):
+    """Add a delivery to a material's stock on hand - staff only"""
+    if not request.user.is_staff:
+        return redirect("customer_dashboard")
+
+    material = get_object_or_404(Material, pk=pk)
+    if request.method == "POST":
+        try:
+            quantity = Material._meta.get_field("quantity_on_hand").clean(
+                request.POST.get("quantity", "").strip(), None
+            )
+        except ValidationError:
+            quantity = None
+        if quantity is None or quantity <= 0:
+            messages.error(request, "Enter the quantity received.")
+        else:
+            receive_stock(material.pk, quantity)
+            messages.success(
+                request, f"Received {quantity} {material.unit} of {material.name}."
+            )
+    return redirect("material_low_stock")
+
+
 # Job Material CRUD Operations
+def _price_update_message(result):
+    message = f"Updated the price of {result.materials} materials."
+    if result.job_lines:
+        message += (
+            f" Re-priced {result.job_lines} material lines on {result.jobs} open jobs."
+        )
+    return message
+
+
+@login_required
+def material_prices_update(request):
+    """Apply a supplier price list (CSV upload) to the materials - staff only"""
+    if not request.user.is_staff:
+        return redirect("customer_dashboard")
+
+    if request.method == "POST":
+        upload = request.FILES.get("csv_file")
+        if not upload:
+            messages.error(request, "Choose a CSV price list to upload.")
+            return render(request, "bidii_builders/materials/prices.html")
+
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            prices = resolve_price_rows(csv.DictReader(stream))
+        except UnicodeDecodeError:
+            messages.error(request, "The file is not UTF-8 encoded CSV.")
+            return render(request, "bidii_builders/materials/prices.html")
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+            return render(request, "bidii_builders/materials/prices.html")
+        finally:
+            stream.detach()
+
+        result = update_material_prices(
+            prices, reprice_open_jobs=bool(request.POST.get("reprice_open_jobs"))
+        )
+        messages.success(request, _price_update_message(result))
+        return redirect("material_list")
+
+    return render(request, "bidii_builders/materials/prices.html")
+
+
+@login_required
+def material_prices_api(request):
+    """AJAX endpoint to apply a price list in one request"""
+    if not request.user.is_staff:
+        return JsonResponse(
+            {"success": False, "error": "Permission denied"}, status=403
+        )
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Invalid request"})
+
+    try:
+        data = json.loads(request.body)
+        rows = [dict(row) for row in data["prices"]]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {"success": False, "error": 'Expected {"prices": [...]}'}, status=400
+        )
+
+    try:
+        prices = resolve_price_rows(rows)
+    except ValidationError as e:
+        return JsonResponse({"success": False, "errors": e.messages}, status=400)
+
+    result = update_material_prices(
+        prices, reprice_open_jobs=bool(data.get("reprice_open_jobs"))
+    )
+    return JsonResponse(
+        {
+            "success": True,
+            "materials": result.materials,
+            "job_lines": result.job_lines,
+            "jobs": result.jobs,
+        }
+    )
+
+
 @login_required
 def job_material_list(request):
     """List all job materials - staff only"""
@@ -816,8 +1191,22 @@ def invoice_list(request):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    invoices = Invoice.objects.all()
-    return render(request, "bidii_builders/invoices/list.html", {"invoices": invoices})
+    invoices = Invoice.objects.active().order_by("-issue_date", "-id")
+    if request.GET.get("all"):
+        return stream_table(
+            request,
+            "bidii_builders/invoices/list.html",
+            "bidii_builders/invoices/_row.html",
+            invoices,
+            "invoice",
+        )
+
+    page_obj = Paginator(invoices, LIST_PAGE_SIZE).get_page(request.GET.get("page"))
+    return render(
+        request,
+        "bidii_builders/invoices/list.html",
+        {"invoices": page_obj, "page_obj": page_obj},
+    )
 
 
 @login_required
@@ -826,17 +1215,17 @@ def invoice_create(request, job_id=None):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    jobs = Job.objects.filter(
+    jobs = Job.objects.active().filter(
         status="completed"
     )  # Only completed jobs can have invoices
 
     if job_id:
-        job = get_object_or_404(Job, pk=job_id)
+        job = get_object_or_404(Job.objects.active(), pk=job_id)
     else:
         job = None
 
     if request.method == "POST":
-        job = get_object_or_404(Job, pk=request.POST.get("job"))
+        job = get_object_or_404(Job.objects.active(), pk=request.POST.get("job"))
 
         invoice = Invoice.objects.create(
             job=job,
@@ -855,23 +1244,18 @@ def invoice_create(request, job_id=None):
 @login_required
 def invoice_detail(request, pk):
     """View invoice detail - accessible to both staff and customer"""
-    invoice = get_object_or_404(Invoice, pk=pk)
-
-    # Check if user has permission to view this invoice
-    if not request.user.is_staff:
-        try:
-            customer = Customer.objects.get(user=request.user)
-            if invoice.job.estimate.customer != customer:
-                messages.error(
-                    request, "You do not have permission to view this invoice."
-                )
-                return redirect("customer_dashboard")
-        except Customer.DoesNotExist:
-            messages.error(
-                request,
-                "You need to be linked to a customer profile to view this invoice.",
-            )
-            return redirect("login")
+    # The ownership check is folded into the lookup query
+    invoice = (
+        Invoice.objects.for_user(request.user)
+        .select_related("job__estimate__customer")
+        .filter(pk=pk)
+        .first()
+    )
+    if invoice is None:
+        if request.user.is_staff:
+            raise Http404("Invoice not found")
+        messages.error(request, "You do not have permission to view this invoice.")
+        return redirect("customer_dashboard")
 
     payments = Payment.objects.filter(invoice=invoice)
 
@@ -893,7 +1277,9 @@ def invoice_update(request, pk):
         invoice.amount = request.POST.get("amount")
         invoice.due_date = request.POST.get("due_date")
         invoice.notes = request.POST.get("notes", "")
-        invoice.save()
+        # is_paid and paid_date belong to the payment path; a payment that
+        # settled the invoice since it was loaded must not be undone
+        invoice.save(update_fields=["job", "amount", "due_date", "notes"])
 
         messages.success(request, "Invoice updated successfully!")
         return redirect("invoice_detail", pk=invoice.id)
@@ -928,8 +1314,22 @@ def payment_list(request):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    payments = Payment.objects.all()
-    return render(request, "bidii_builders/payments/list.html", {"payments": payments})
+    payments = Payment.objects.active().order_by("-payment_date", "-id")
+    if request.GET.get("all"):
+        return stream_table(
+            request,
+            "bidii_builders/payments/list.html",
+            "bidii_builders/payments/_row.html",
+            payments,
+            "payment",
+        )
+
+    page_obj = Paginator(payments, LIST_PAGE_SIZE).get_page(request.GET.get("page"))
+    return render(
+        request,
+        "bidii_builders/payments/list.html",
+        {"payments": page_obj, "page_obj": page_obj},
+    )
 
 
 @login_required
@@ -938,25 +1338,21 @@ def payment_create(request):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    invoices = Invoice.objects.filter(
-        is_paid=False
-    )  # Only unpaid invoices can receive payments
+    # Only unpaid invoices can receive payments, and none queued for deletion
+    invoices = Invoice.objects.active().filter(is_paid=False)
 
     if request.method == "POST":
-        invoice = get_object_or_404(Invoice, pk=request.POST.get("invoice"))
-
-        payment = Payment.objects.create(
-            invoice=invoice,
-            amount=request.POST.get("amount"),
-            payment_method=request.POST.get("payment_method"),
-            reference_number=request.POST.get("reference_number", ""),
-        )
-
-        # Update invoice status if payment covers full amount
-        if payment.amount >= invoice.amount:
-            invoice.is_paid = True
-            invoice.paid_date = datetime.now().date()
-            invoice.save()
+        invoice = get_object_or_404(invoices, pk=request.POST.get("invoice"))
+
+        # The payment and its posting to the invoice balance (see signals.py)
+        # commit together; the invoice is settled once its balance hits zero
+        with transaction.atomic():
+            payment = Payment.objects.create(
+                invoice=invoice,
+                amount=request.POST.get("amount"),
+                payment_method=request.POST.get("payment_method"),
+                reference_number=request.POST.get("reference_number", ""),
+            )
 
         messages.success(request, "Payment created successfully!")
         return redirect("payment_detail", pk=payment.id)
@@ -990,7 +1386,8 @@ def payment_update(request, pk):
         payment.amount = request.POST.get("amount")
         payment.payment_method = request.POST.get("payment_method")
         payment.reference_number = request.POST.get("reference_number", "")
-        payment.save()
+        with transaction.atomic():
+            payment.save()
 
         messages.success(request, "Payment updated successfully!")
         return redirect("payment_detail", pk=payment.id)
@@ -1011,7 +1408,8 @@ def payment_delete(request, pk):
     payment = get_object_or_404(Payment, pk=pk)
 
     if request.method == "POST":
-        payment.delete()
+        with transaction.atomic():
+            payment.delete()
         messages.success(request, "Payment deleted successfully!")
         return redirect("payment_list")
 
@@ -1079,7 +1477,9 @@ def job_schedule(request):
 
     if request.method == "POST":
         estimate = get_object_or_404(
-            Estimate, pk=request.POST.get("estimate_id"), status="accepted"
+            Estimate.objects.active(),
+            pk=request.POST.get("estimate_id"),
+            status="accepted",
         )
 
         job = Job.objects.create(
@@ -1091,7 +1491,7 @@ def job_schedule(request):
         messages.success(request, "Job scheduled successfully!")
         return redirect("job_detail", pk=job.id)
 
-    accepted_estimates = Estimate.objects.filter(status="accepted")
+    accepted_estimates = Estimate.objects.active().filter(status="accepted")
     return render(
         request, "bidii_builders/jobs/schedule.html", {"estimates": accepted_estimates}
     )
@@ -1099,60 +1499,107 @@ def job_schedule(request):
 
 @login_required
 def job_materials_add(request, job_id):
-    """Admin add material to job"""
+    """Admin add one or more material lines to a job"""
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    job = get_object_or_404(Job, pk=job_id)
-    materials = Material.objects.all()
+    job = get_object_or_404(Job.objects.select_related("estimate__customer"), pk=job_id)
+    # Suppliers of the same item sit together, cheapest first
+    materials = with_cheapest_supplier(Material.objects.all()).order_by(
+        "name", "unit", "unit_price"
+    )
 
     if request.method == "POST":
-        material_id = request.POST.get("material_id")
-        quantity = request.POST.get("quantity")
-        material = get_object_or_404(Material, pk=material_id)
-
-        JobMaterial.objects.create(
-            job=job,
-            material=material,
-            quantity=quantity,
-            unit_price=material.unit_price,
-        )
-        messages.success(request, "Material added to job successfully!")
-        return redirect("job_detail", pk=job_id)
+        # Rows of the form left completely empty are ignored
+        lines = [
+            (material_id, quantity)
+            for material_id, quantity in zip(
+                request.POST.getlist("material_id"), request.POST.getlist("quantity")
+            )
+            if material_id or quantity
+        ]
+        try:
+            created = add_job_materials(job, lines)
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+        else:
+            messages.success(
+                request, f"{len(created)} material line(s) added to job successfully!"
+            )
+            short = Material.objects.filter(
+                pk__in={line.material_id for line in created},
+                quantity_reserved__gt=F("quantity_on_hand"),
+            )
+            if short:
+                messages.warning(
+                    request,
+                    "Not enough stock on hand for: "
+                    + ", ".join(material.name for material in short),
+                )
+            return redirect("job_detail", pk=job_id)
 
     return render(
         request,
         "bidii_builders/job_materials/add.html",
-        {"job": job, "materials": materials},
+        {"job": job, "materials": materials, "costing": job_costing(job)},
     )
 
 
 @login_required
-def dashboard_charts_data(request):
-    """API endpoint for chart data"""
-    # Revenue by month
-    revenue_data = []
-    for i in range(12):
-        month = (
-            datetime.now().date().replace(month=i + 1)
-            if i + 1 <= datetime.now().month
-            else datetime.now()
-            .date()
-            .replace(year=datetime.now().year - 1, month=i + 1)
+def job_materials_bulk(request, job_id):
+    """AJAX endpoint to add many material lines to a job in one request"""
+    if not request.user.is_staff:
+        return JsonResponse(
+            {"success": False, "error": "Permission denied"}, status=403
         )
-        revenue = (
-            Invoice.objects.filter(
-                issue_date__month=month.month, issue_date__year=month.year, is_paid=True
-            ).aggregate(Sum("amount"))["amount__sum"]
-            or 0
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Invalid request"})
+
+    job = get_object_or_404(Job, pk=job_id)
+    try:
+        lines = [
+            (line.get("material_id"), line.get("quantity"))
+            for line in json.loads(request.body)["lines"]
+        ]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse(
+            {"success": False, "error": 'Expected {"lines": [...]}'}, status=400
         )
-        revenue_data.append({"month": month.strftime("%B"), "revenue": float(revenue)})
 
-    # Job status distribution
-    job_status_data = []
-    for status, label in Job.JOB_STATUS_CHOICES:
-        count = Job.objects.filter(status=status).count()
-        job_status_data.append({"status": label, "count": count})
+    try:
+        created = add_job_materials(job, lines)
+    except ValidationError as e:
+        return JsonResponse({"success": False, "errors": e.messages}, status=400)
+
+    return JsonResponse(
+        {
+            "success": True,
+            "created": [
+                {
+                    "id": job_material.id,
+                    "material_id": job_material.material_id,
+                    "quantity": str(job_material.quantity),
+                    "unit_price": str(job_material.unit_price),
+                    "total_price": str(job_material.total_price),
+                }
+                for job_material in created
+            ],
+            "total": str(sum(jm.total_price for jm in created)),
+        }
+    )
+
+
+@login_required
+def dashboard_charts_data(request):
+    """API endpoint for chart data"""
+    # Both include archived jobs and invoices
+    revenue_data = revenue_by_calendar_month()
+    status_counts = jobs_by_status()
+    job_status_data = [
+        {"status": label, "count": status_counts[status]}
+        for status, label in Job.JOB_STATUS_CHOICES
+    ]
 
     data = {"revenue_data": revenue_data, "job_status_data": job_status_data}
     return JsonResponse(data)
@@ -1164,39 +1611,18 @@ def reports(request):
     if not request.user.is_staff:
         return redirect("customer_dashboard")
 
-    # Monthly revenue report
-    monthly_revenue = []
-    for i in range(12):
-        month = (
-            datetime.now().replace(month=i + 1)
-            if i + 1 <= datetime.now().month
-            else datetime.now().replace(year=datetime.now().year - 1, month=i + 1)
-        )
-        revenue = (
-            Invoice.objects.filter(
-                issue_date__month=month.month, issue_date__year=month.year, is_paid=True
-            ).aggregate(Sum("amount"))["amount__sum"]
-            or 0
-        )
-        monthly_revenue.append(
-            {"month": month.strftime("%B"), "revenue": float(revenue)}
-        )
-
-    # Job status report
-    job_status_counts = {}
-    for status, label in Job.JOB_STATUS_CHOICES:
-        count = Job.objects.filter(status=status).count()
-        job_status_counts[label] = count
+    # Reports cover the archive as well as the live tables
+    status_counts = jobs_by_status()
+    job_status_counts = {
+        label: status_counts[status] for status, label in Job.JOB_STATUS_CHOICES
+    }
 
     context = {
-        "monthly_revenue": monthly_revenue,
+        "monthly_revenue": revenue_by_calendar_month(),
         "job_status_counts": job_status_counts,
-        "total_customers": Customer.objects.count(),
-        "total_jobs": Job.objects.count(),
-        "total_revenue": Invoice.objects.filter(is_paid=True).aggregate(Sum("amount"))[
-            "amount__sum"
-        ]
-        or 0,
+        "total_customers": Customer.objects.active().count(),
+        "total_jobs": total_jobs(),
+        "total_revenue": total_revenue(),
     }
     return render(request, "bidii_builders/reports.html", context)
 
@@ -1231,6 +1657,128 @@ def backup(request):
     return render(request, "bidii_builders/backup.html")
 
 
+@login_required
+def import_data(request):
+    """Admin bulk CSV import of customers, properties or materials"""
+    if not request.user.is_staff:
+        return redirect("customer_dashboard")
+
+    context = {"kinds": sorted(IMPORT_SPECS)}
+    if request.method == "POST":
+        kind = request.POST.get("kind")
+        upload = request.FILES.get("csv_file")
+        if kind not in IMPORT_SPECS or not upload:
+            messages.error(request, "Choose what to import and a CSV file.")
+            return render(request, "bidii_builders/import.html", context)
+
+        # Parse straight from the uploaded file rather than reading it into memory
+        dry_run = bool(request.POST.get("dry_run"))
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            result = import_csv(kind, stream, dry_run=dry_run)
+        except UnicodeDecodeError:
+            messages.error(request, "The file is not UTF-8 encoded CSV.")
+            return render(request, "bidii_builders/import.html", context)
+        finally:
+            stream.detach()
+
+        if result.error_count:
+            messages.error(
+                request,
+                f"{result.error_count} of {result.rows} rows were not imported.",
+            )
+        verb = "Validated" if dry_run else "Imported"
+        messages.success(request, f"{verb} {result.created} {kind}.")
+        context.update({"result": result, "dry_run": dry_run})
+
+    return render(request, "bidii_builders/import.html", context)
+
+
+@login_required
+def statement_import(request):
+    """Admin import of an M-Pesa or bank statement as payments"""
+    if not request.user.is_staff:
+        return redirect("customer_dashboard")
+
+    context = {}
+    if request.method == "POST":
+        upload = request.FILES.get("csv_file")
+        if not upload:
+            messages.error(request, "Choose a statement CSV file.")
+            return render(request, "bidii_builders/payments/import.html", context)
+
+        dry_run = bool(request.POST.get("dry_run"))
+        method = request.POST.get("payment_method") or "M-Pesa"
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            result = import_statement(stream, payment_method=method, dry_run=dry_run)
+        except UnicodeDecodeError:
+            messages.error(request, "The file is not UTF-8 encoded CSV.")
+            return render(request, "bidii_builders/payments/import.html", context)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return render(request, "bidii_builders/payments/import.html", context)
+        finally:
+            stream.detach()
+
+        if result.unmatched:
+            messages.warning(
+                request,
+                f"{result.unmatched} lines could not be matched and are queued "
+                "for review.",
+            )
+        verb = "Matched" if dry_run else "Recorded"
+        messages.success(
+            request,
+            f"{verb} {result.matched} payments totalling KES {result.total:,.2f}.",
+        )
+        context.update({"result": result, "dry_run": dry_run})
+
+    return render(request, "bidii_builders/payments/import.html", context)
+
+
+AUDIT_PAGE_SIZE = 50
+
+
+@login_required
+def audit_log(request):
+    """Admin view of the audit trail, newest first"""
+    if not request.user.is_staff:
+        return redirect("customer_dashboard")
+
+    entries = AuditLog.objects.select_related("user").order_by("-pk")
+    model_name = request.GET.get("model", "")
+    object_id = request.GET.get("object_id", "")
+    action = request.GET.get("action", "")
+    if model_name:
+        entries = entries.filter(model_name=model_name)
+    if object_id.isdigit():
+        entries = entries.filter(object_id=object_id)
+    if action:
+        entries = entries.filter(action=action)
+    # Keyset pagination: the table only grows, so OFFSET pages would get
+    # slower the further back they go
+    before = request.GET.get("before", "")
+    if before.isdigit():
+        entries = entries.filter(pk__lt=before)
+
+    page = list(entries[: AUDIT_PAGE_SIZE + 1])
+    filters = {"model": model_name, "object_id": object_id, "action": action}
+    next_query = None
+    if len(page) > AUDIT_PAGE_SIZE:
+        next_query = urlencode(
+            {**{k: v for k, v in filters.items() if v}, "before": page[-2].pk}
+        )
+    context = {
+        "entries": page[:AUDIT_PAGE_SIZE],
+        "next_query": next_query,
+        "filters": filters,
+        "model_names": [model._meta.model_name for model in AUDITED_MODELS],
+        "actions": AuditLog.ACTION_CHOICES,
+    }
+    return render(request, "bidii_builders/audit/list.html", context)
+
+
 # Customer-specific views
 @login_required
 def customer_register(request):
@@ -1253,6 +1801,16 @@ def customer_register(request):
             messages.error(request, "Email already exists")
             return render(request, "bidii_builders/customer_register.html")
 
+        # Customers entered by staff have no account yet; registering again
+        # would split their history across two customer records
+        if matching_customers(email, phone, first_name, last_name):
+            messages.error(
+                request,
+                "We already have your details on file. Please contact us to "
+                "get access to your account.",
+            )
+            return render(request, "bidii_builders/customer_register.html")
+
         # Create user
         user = User.objects.create_user(
             username=username, email=email, password=password
@@ -1277,9 +1835,8 @@ def customer_register(request):
 @login_required
 def customer_profile(request):
     """Customer profile page - only accessible to customers"""
-    try:
-        customer = Customer.objects.get(user=request.user)
-    except Customer.DoesNotExist:
+    customer = request.customer
+    if not customer:
         messages.error(request, "Your account is not linked to a customer profile.")
         return redirect("login")
 
@@ -1301,13 +1858,16 @@ def customer_profile(request):
 @login_required
 def customer_estimates(request):
     """Customer view of their estimates"""
-    try:
-        customer = Customer.objects.get(user=request.user)
-    except Customer.DoesNotExist:
+    customer = request.customer
+    if not customer:
         messages.error(request, "Your account is not linked to a customer profile.")
         return redirect("login")
 
-    estimates = Estimate.objects.filter(customer=customer).order_by("-created_at")
+    estimates = (
+        Estimate.objects.owned_by(request.user)
+        .select_related("property_obj")
+        .order_by("-created_at")
+    )
 
     context = {"estimates": estimates}
     return render(request, "bidii_builders/customer_estimates.html", context)
@@ -1316,13 +1876,17 @@ def customer_estimates(request):
 @login_required
 def customer_jobs(request):
     """Customer view of their jobs"""
-    try:
-        customer = Customer.objects.get(user=request.user)
-    except Customer.DoesNotExist:
+    customer = request.customer
+    if not customer:
         messages.error(request, "Your account is not linked to a customer profile.")
         return redirect("login")
 
-    jobs = Job.objects.filter(estimate__customer=customer).order_by("-created_at")
+    jobs = (
+        Job.objects.owned_by(request.user)
+        .active()
+        .select_related("estimate")
+        .order_by("-created_at")
+    )
 
     context = {"jobs": jobs}
     return render(request, "bidii_builders/customer_jobs.html", context)
@@ -1331,14 +1895,15 @@ def customer_jobs(request):
 @login_required
 def customer_invoices(request):
     """Customer view of their invoices"""
-    try:
-        customer = Customer.objects.get(user=request.user)
-    except Customer.DoesNotExist:
+    customer = request.customer
+    if not customer:
         messages.error(request, "Your account is not linked to a customer profile.")
         return redirect("login")
 
-    invoices = Invoice.objects.filter(job__estimate__customer=customer).order_by(
-        "-issue_date"
+    invoices = (
+        Invoice.objects.owned_by(request.user)
+        .select_related("job")
+        .order_by("-issue_date")
     )
 
     context = {"invoices": invoices}
@@ -0,0 +1,29 @@
+# bidii_project/jinja2.py
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment
+
+
+def url(viewname, *args, **kwargs):
+    """Jinja2 counterpart of the {% url %} tag"""
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def environment(**options):
+    """Jinja2 environment for the templates under jinja2/.
+
+    Exposes ``url()``/``static()`` and the Django filters the ported
+    templates use, so they render the same output as their DTL originals.
+    """
+    env = Environment(**options)
+    env.globals.update({"url": url, "static": static})
+    env.filters.update(
+        {
+            "date": defaultfilters.date,
+            "floatformat": defaultfilters.floatformat,
+            "truncatechars": defaultfilters.truncatechars,
+            "yesno": defaultfilters.yesno,
+        }
+    )
+    return env
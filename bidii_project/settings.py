@@ -24,6 +24,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'bidii_builders.middleware.CustomerMiddleware',
+    'bidii_builders.middleware.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -46,6 +48,26 @@ TEMPLATES = [
     },
 ]
 
+# Optional Jinja2 backend for the high-volume list, dashboard and customer
+# portal templates ported to jinja2/. Enable with BIDII_JINJA2_TEMPLATES=1;
+# templates that have not been ported keep rendering with DjangoTemplates.
+JINJA2_TEMPLATES = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [BASE_DIR / 'jinja2'],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'bidii_project.jinja2.environment',
+        'context_processors': [
+            'django.template.context_processors.request',
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+        ],
+    },
+}
+
+if os.environ.get('BIDII_JINJA2_TEMPLATES'):
+    TEMPLATES.insert(0, JINJA2_TEMPLATES)
+
 WSGI_APPLICATION = 'bidii_project.wsgi.application'
 
 DATABASES = {
@@ -55,6 +77,35 @@ DATABASES = {
     }
 }
 
+# Optional separate SQLite file for archived jobs, invoices and payments (see
+# bidii_builders/routers.py). Set BIDII_ARCHIVE_DATABASE to its path, then run
+# "manage.py migrate --database=archive" once to create the archive tables.
+if os.environ.get('BIDII_ARCHIVE_DATABASE'):
+    DATABASES['archive'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BIDII_ARCHIVE_DATABASE'],
+    }
+
+DATABASE_ROUTERS = ['bidii_builders.routers.ArchiveRouter']
+
+# Each user's customer profile and the dashboard stats are cached, and the
+# signals invalidate them when they change. The default in-memory cache is
+# per process, so with more than one worker the others keep serving stale
+# entries until they time out. Set BIDII_CACHE_DIR to a directory all the
+# workers can write to, so they share one cache.
+if os.environ.get('BIDII_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['BIDII_CACHE_DIR'],
+        }
+    }
+
+# Codec for long free-text columns (bidii_builders/fields.py): 'zlib', or
+# 'zstd' if the zstandard package is installed. Rows already written with
+# either codec stay readable.
+BIDII_TEXT_COMPRESSION = os.environ.get('BIDII_TEXT_COMPRESSION', 'zlib')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',